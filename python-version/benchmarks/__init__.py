@@ -0,0 +1,6 @@
+"""
+Benchmark harness for the Python security audit.
+
+Run from python-version/: `python -m benchmarks.run_benchmarks --help`.
+Fixtures are generated on the fly by benchmarks.fixtures.
+"""
@@ -0,0 +1,430 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import shutil
+import socketserver
+import stat
+import sys
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Dict
+
+
+SCALES: Dict[str, Dict[str, int]] = {
+  "small": {"fs_depth": 3, "fs_fanout": 4, "fs_files": 20, "sshd_lines": 500, "sudoers_files": 20, "pods": 2_000, "containers": 20, "packages": 200, "sockets": 2_000, "processes": 100, "firewall_rules": 2_000, "accounts": 200, "image_files": 2_000, "history_findings": 10_000},
+  "medium": {"fs_depth": 4, "fs_fanout": 6, "fs_files": 40, "sshd_lines": 5_000, "sudoers_files": 200, "pods": 20_000, "containers": 100, "packages": 2_000, "sockets": 20_000, "processes": 500, "firewall_rules": 20_000, "accounts": 5_000, "image_files": 20_000, "history_findings": 100_000},
+  "large": {"fs_depth": 5, "fs_fanout": 8, "fs_files": 50, "sshd_lines": 50_000, "sudoers_files": 1_000, "pods": 100_000, "containers": 300, "packages": 20_000, "sockets": 100_000, "processes": 2_000, "firewall_rules": 100_000, "accounts": 50_000, "image_files": 200_000, "history_findings": 1_000_000},
+}
+
+
+def make_tree(root: Path, depth: int, fanout: int, files: int) -> int:
+  """Create a directory tree; every 7th dir is world-writable, every 97th file SUID. Returns entry count."""
+  count = 0
+  level = [root]
+  root.mkdir(parents=True, exist_ok=True)
+  for _ in range(depth):
+    next_level = []
+    for parent in level:
+      for index in range(fanout):
+        child = parent / f"d{index}"
+        child.mkdir()
+        count += 1
+        if count % 7 == 0:
+          child.chmod(0o777)
+        next_level.append(child)
+    level = next_level
+  for directory in [root, *level]:
+    for index in range(files):
+      path = directory / f"f{index}"
+      path.write_bytes(b"")
+      count += 1
+      if count % 97 == 0:
+        path.chmod(0o755 | stat.S_ISUID)
+  return count
+
+
+def write_sshd_config(path: Path, lines: int) -> None:
+  """sshd_config with `lines` directives spread over the main file, drop-ins and a Match block."""
+  body = ["# generated sshd_config", "Include sshd_config.d/*.conf", "Port 22", "Protocol 2"]
+  body.extend(f"# comment line {index}" if index % 3 else f"AcceptEnv VAR{index}" for index in range(lines // 2))
+  body.extend(["PermitRootLogin prohibit-password", "PasswordAuthentication no", "PermitEmptyPasswords no"])
+  body.extend(["Match Group sftp", "  ForceCommand internal-sftp", "  PasswordAuthentication yes"])
+  path.parent.mkdir(parents=True, exist_ok=True)
+  path.write_text("\n".join(body) + "\n", encoding="utf-8")
+  drop_ins = path.parent / "sshd_config.d"
+  drop_ins.mkdir(exist_ok=True)
+  per_file = max(1, lines // 20)
+  for index in range(10):
+    rules = [f"# drop-in {index}"]
+    rules.extend(f"SetEnv DROPIN{index}_{line}=1" for line in range(per_file))
+    (drop_ins / f"{index:02d}-app.conf").write_text("\n".join(rules) + "\n", encoding="utf-8")
+
+
+def write_accounts(directory: Path, accounts: int) -> tuple:
+  """passwd and shadow files with `accounts` users, a mix of locked and active."""
+  directory.mkdir(parents=True, exist_ok=True)
+  passwd, shadow = directory / "passwd", directory / "shadow"
+  with passwd.open("w", encoding="utf-8") as p_handle, shadow.open("w", encoding="utf-8") as s_handle:
+    p_handle.write("root:x:0:0:root:/root:/bin/bash\n")
+    s_handle.write("root:!:19000:0:99999:7:::\n")
+    for index in range(accounts):
+      p_handle.write(f"user{index}:x:{10000 + index}:{10000 + index}::/home/user{index}:/bin/bash\n")
+      s_handle.write(f"user{index}:{'!' if index % 4 == 0 else '$6$salt$hash'}:19000:0:99999:7:::\n")
+  return passwd, shadow
+
+
+def _layer(entries) -> bytes:
+  """gzip'ed layer tar from (name, type, mode, data-or-linkname) tuples."""
+  buffer = io.BytesIO()
+  with tarfile.open(fileobj=buffer, mode="w:gz", compresslevel=1) as archive:
+    for name, kind, mode, payload in entries:
+      info = tarfile.TarInfo(name)
+      info.type = kind
+      info.mode = mode
+      if kind == tarfile.SYMTYPE:
+        info.linkname = payload
+        archive.addfile(info)
+      elif kind == tarfile.REGTYPE:
+        info.size = len(payload)
+        archive.addfile(info, io.BytesIO(payload))
+      else:
+        archive.addfile(info)
+  return buffer.getvalue()
+
+
+def write_image_tarball(path: Path, files: int) -> Path:
+  """`docker save` style tarball: a base layer with `files` binaries, then a layer with whiteouts and config."""
+  base = [
+    ("etc", tarfile.DIRTYPE, 0o755, b""),
+    ("etc/os-release", tarfile.SYMTYPE, 0o777, "../usr/lib/os-release"),
+    ("usr/lib/os-release", tarfile.REGTYPE, 0o644, b'PRETTY_NAME="Synthetic Linux 1.0"\n'),
+    ("etc/passwd", tarfile.REGTYPE, 0o644, b"root:x:0:0:root:/root:/bin/sh\ntoor:x:0:0::/root:/bin/sh\n"),
+    ("etc/shadow", tarfile.REGTYPE, 0o640, b"root:!:19000::::::\ntoor::19000::::::\n"),
+    ("tmp", tarfile.DIRTYPE, 0o1777, b""),
+    ("tmp/open", tarfile.DIRTYPE, 0o777, b""),
+    ("usr/bin", tarfile.DIRTYPE, 0o755, b""),
+  ]
+  base.extend((f"usr/bin/tool{index}", tarfile.REGTYPE, 0o4755 if index % 500 == 0 else 0o755, b"#!/bin/sh\n") for index in range(files))
+  top = [
+    ("tmp/.wh.open", tarfile.REGTYPE, 0o644, b""),
+    ("usr/bin/.wh.tool0", tarfile.REGTYPE, 0o644, b""),
+    ("etc/ssh", tarfile.DIRTYPE, 0o755, b""),
+    ("etc/ssh/sshd_config", tarfile.REGTYPE, 0o644, b"Include /etc/ssh/sshd_config.d/*.conf\nPermitRootLogin no\n"),
+    ("etc/ssh/sshd_config.d/10-root.conf", tarfile.REGTYPE, 0o644, b"PermitRootLogin yes\n"),
+    ("etc/sudoers", tarfile.REGTYPE, 0o440, b"root ALL=(ALL) ALL\n@includedir /etc/sudoers.d\n"),
+    ("etc/sudoers.d/app", tarfile.REGTYPE, 0o440, b"app ALL=(ALL) NOPASSWD: ALL\n"),
+  ]
+  layers = {"base/layer.tar": _layer(base), "top/layer.tar": _layer(top)}
+  manifest = [{"Config": "config.json", "RepoTags": [f"synthetic/{path.stem}:latest"], "Layers": list(layers)}]
+  path.parent.mkdir(parents=True, exist_ok=True)
+  with tarfile.open(path, "w") as archive:
+    for name, data in [("manifest.json", json.dumps(manifest).encode()), ("config.json", b"{}"), *layers.items()]:
+      info = tarfile.TarInfo(name)
+      info.size = len(data)
+      archive.addfile(info, io.BytesIO(data))
+  return path
+
+
+def history_records(count: int, salt: str = "") -> list:
+  """Finding records shaped like Finding.to_dict(), spread over checks, rules and severities."""
+  checks = ("OS", "SSH", "sudo/users", "filesystem", "network/firewall")
+  return [
+    {
+      "check": checks[index % len(checks)],
+      "severity": ("INFO", "WARN", "CRIT")[index % 3],
+      "rule": f"synthetic.rule{index % 50}",
+      "message": f"synthetic finding {index}{salt}",
+      "attrs": {"index": index},
+    }
+    for index in range(count)
+  ]
+
+
+def write_history(path: Path, findings: int, per_run: int = 1_000, hosts: int = 100) -> Path:
+  """History database holding `findings` findings in runs of `per_run` across `hosts` hosts."""
+  from security_audit.history import History
+
+  path.parent.mkdir(parents=True, exist_ok=True)
+  with History(path) as history:
+    for run in range(max(1, findings // per_run)):
+      # Every seventh finding changes between runs so diffs have something to report.
+      records = history_records(per_run, salt=f" r{run % 3}")
+      for record in records[::7]:
+        record["message"] += f" v{run}"
+      history.record_run(f"host{run % hosts}", 1_700_000_000 + run * 900, 2, ["OS", "SSH"], records)
+  return path
+
+
+def write_os_files(root: Path) -> None:
+  """/etc/os-release and a pending-reboot flag below `root`."""
+  (root / "etc").mkdir(parents=True, exist_ok=True)
+  (root / "etc" / "os-release").write_text('PRETTY_NAME="Debian GNU/Linux 12 (bookworm)"\nNAME="Debian GNU/Linux"\nID=debian\n', encoding="utf-8")
+  (root / "var" / "run").mkdir(parents=True, exist_ok=True)
+  (root / "var" / "run" / "reboot-required").write_text("*** System restart required ***\n", encoding="utf-8")
+
+
+def write_sudoers(root: Path, files: int) -> Path:
+  """`root`/etc/sudoers including `files` drop-ins from /etc/sudoers.d (resolved inside `root`)."""
+  directory = root / "etc"
+  directory.mkdir(parents=True, exist_ok=True)
+  (directory / "sudoers").write_text(
+    "Defaults env_reset\nroot ALL=(ALL:ALL) ALL\n%sudo ALL=(ALL:ALL) ALL\n@includedir /etc/sudoers.d\n", encoding="utf-8"
+  )
+  drop_ins = directory / "sudoers.d"
+  drop_ins.mkdir(exist_ok=True)
+  for index in range(files):
+    rules = [f"# drop-in {index}", f"Cmnd_Alias SVC{index} = /bin/systemctl restart app{index}"]
+    rules.append(f"deploy{index} ALL=(root) NOPASSWD: SVC{index}")
+    if index % 50 == 0:
+      rules.append(f"ops{index} ALL=(ALL) NOPASSWD: ALL")
+    (drop_ins / f"app{index}").write_text("\n".join(rules) + "\n", encoding="utf-8")
+  return directory / "sudoers"
+
+
+# Fake binaries run with PATH limited to their own directory.
+_CAT = shutil.which("cat") or "/bin/cat"
+
+
+def _write_script(path: Path, body: str) -> None:
+  path.write_text(body, encoding="utf-8")
+  path.chmod(0o755)
+
+
+def write_fake_kubectl(bin_dir: Path, pods: int) -> None:
+  """kubectl stand-in that serves `pods` synthetic pods through paginated `get --raw`."""
+  _write_script(
+    bin_dir / "kubectl",
+    f"""#!{sys.executable}
+import json, sys, urllib.parse
+TOTAL = {pods}
+args = sys.argv[1:]
+if args[:1] in (["cluster-info"], ["version"]):
+  print("Kubernetes control plane is running"); sys.exit(0)
+if args == ["config", "current-context"]:
+  print("bench"); sys.exit(0)
+if args[:2] == ["get", "--raw"]:
+  query = urllib.parse.parse_qs(urllib.parse.urlparse(args[2]).query)
+  start = int(query.get("continue", ["0"])[0]); end = min(TOTAL, start + int(query["limit"][0]))
+  out = sys.stdout
+  out.write('{{"kind":"PodList","apiVersion":"v1","metadata":{{"continue":"%s"}},"items":[' % (end if end < TOTAL else ""))
+  for i in range(start, end):
+    if i > start: out.write(",")
+    json.dump({{"metadata": {{"namespace": "ns%d" % (i % 50), "name": "pod-%d" % i, "labels": {{"app": "svc%d" % (i % 300)}}}},
+               "spec": {{"containers": [{{"name": "app", "image": "registry/app:%d" % (i % 20),
+                                         "securityContext": {{"privileged": i % 997 == 0}}}}]}}}}, out)
+  out.write("]}}")
+  sys.exit(0)
+sys.exit(1)
+""",
+  )
+
+
+def write_fake_systemctl(bin_dir: Path, inactive: tuple = ("auditd",)) -> None:
+  """systemctl stand-in answering `show` for any unit: active unless listed in `inactive`."""
+  _write_script(
+    bin_dir / "systemctl",
+    f"""#!/bin/sh
+[ "$1" = show ] || exit 1
+shift 2
+[ "$1" = -- ] && shift
+for unit in "$@"; do
+  case " {' '.join(inactive)} " in
+    *" $unit "*) state=inactive; sub=dead ;;
+    *) state=active; sub=running ;;
+  esac
+  printf 'Id=%s.service\\nLoadState=loaded\\nActiveState=%s\\nSubState=%s\\n\\n' "$unit" "$state" "$sub"
+done
+""",
+  )
+
+
+def write_fake_iptables(bin_dir: Path, ruleset: Path) -> None:
+  """iptables-save stand-in printing `ruleset` (no nft, ufw or firewalld next to it)."""
+  _write_script(bin_dir / "iptables-save", f"#!/bin/sh\nexec {_CAT} {ruleset}\n")
+
+
+def write_fake_docker(bin_dir: Path, containers: int) -> None:
+  ids = " ".join(f"{index:012x}" for index in range(containers))
+  _write_script(
+    bin_dir / "docker",
+    f"""#!/bin/sh
+case "$1" in
+  info) echo "Server Version: 24.0.0" ;;
+  ps) for id in {ids}; do echo "$id registry/app c$id"; done ;;
+  inspect) echo '[{{"Config":{{"User":""}},"HostConfig":{{"Privileged":false}}}}]' ;;
+  *) exit 1 ;;
+esac
+""",
+  )
+
+
+def write_fake_apt(bin_dir: Path, packages: int) -> None:
+  listing = bin_dir / "apt-upgradable.txt"
+  lines = ["Listing... Done"]
+  lines.extend(f"pkg{index}/stable-security 1.{index}-2 amd64 [upgradable from: 1.{index}-1]" for index in range(packages))
+  listing.write_text("\n".join(lines) + "\n", encoding="utf-8")
+  _write_script(bin_dir / "apt", f"#!/bin/sh\nexec {_CAT} {listing}\n")
+  _write_script(bin_dir / "apt-get", "#!/bin/sh\nexit 0\n")
+
+
+def _deb_stanza(name: str, version: str, extra: str = "") -> str:
+  return (
+    f"Package: {name}\n{extra}Priority: optional\nSection: misc\nInstalled-Size: 1024\n"
+    f"Maintainer: Bench <bench@example.invalid>\nArchitecture: amd64\nVersion: {version}\n"
+    f"Depends: libc6 (>= 2.36)\nDescription: synthetic package {name}\n"
+    " Long description line one.\n .\n Long description line two.\n\n"
+  )
+
+
+def write_deb_database(root: Path, packages: int) -> tuple:
+  """`root`/var/lib/dpkg/status with 3x`packages` installed and apt lists in which `packages` of them (a quarter via -security) have newer versions."""
+  installed = packages * 3
+  status = root / "var" / "lib" / "dpkg" / "status"
+  lists = root / "var" / "lib" / "apt" / "lists"
+  status.parent.mkdir(parents=True, exist_ok=True)
+  lists.mkdir(parents=True, exist_ok=True)
+  with status.open("w", encoding="utf-8") as handle:
+    for index in range(installed):
+      handle.write(_deb_stanza(f"pkg{index}", f"1.{index}-1", "Status: install ok installed\n"))
+  with (lists / "deb.example.invalid_debian_dists_stable_main_binary-amd64_Packages").open("w", encoding="utf-8") as handle:
+    for index in range(installed * 2):
+      revision = 2 if index < packages and index % 4 else 1
+      handle.write(_deb_stanza(f"pkg{index}", f"1.{index}-{revision}"))
+  with (lists / "security.example.invalid_debian-security_dists_stable-security_main_binary-amd64_Packages").open("w", encoding="utf-8") as handle:
+    for index in range(0, packages, 4):
+      handle.write(_deb_stanza(f"pkg{index}", f"1.{index}-1+deb12u1"))
+  return status, lists
+
+
+def write_fake_dnf(bin_dir: Path, packages: int) -> None:
+  listing = bin_dir / "dnf-security.txt"
+  severities = ("Moderate/Sec.", "Important/Sec.", "Low/Sec.")
+  lines = [f"RHSA-2024:{index:04d} {severities[index % 3]} pkg{index}-1.{index}-2.el9.x86_64" for index in range(packages)]
+  listing.write_text("\n".join(lines) + "\n", encoding="utf-8")
+  _write_script(bin_dir / "dnf", f"#!/bin/sh\nexec {_CAT} {listing}\n")
+
+
+def write_fake_proc(root: Path, sockets: int, processes: int) -> Path:
+  """A /proc stand-in: `sockets` TCP sockets (1 in 500 listening) spread over `processes` pids' fd dirs."""
+  header = "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+  (root / "net").mkdir(parents=True, exist_ok=True)
+  with (root / "net" / "tcp").open("w", encoding="ascii") as handle:
+    handle.write(header)
+    for index in range(sockets):
+      inode = 10_000 + index
+      if index % 500 == 0:
+        local, remote, state = f"00000000:{1024 + index // 500:04X}", "00000000:0000", "0A"
+      else:
+        local, remote, state = f"0100007F:{20000 + index % 40000:04X}", f"0100007F:{1024 + index % 50:04X}", "01"
+      handle.write(f"{index:6d}: {local} {remote} {state} 00000000:00000000 00:00000000 00000000  1000        0 {inode} 1 0000000000000000 100 0 0 10 0\n")
+  (root / "net" / "udp").write_text(header, encoding="ascii")
+  per_process = max(1, sockets // processes)
+  for pid in range(1, processes + 1):
+    fd_dir = root / str(pid) / "fd"
+    fd_dir.mkdir(parents=True)
+    (root / str(pid) / "comm").write_text(f"proc{pid}\n", encoding="ascii")
+    os.symlink(f"/usr/bin/proc{pid}", root / str(pid) / "exe")
+    os.symlink("/dev/null", fd_dir / "0")
+    first = (pid - 1) * per_process
+    for offset in range(per_process):
+      os.symlink(f"socket:[{10_000 + first + offset}]", fd_dir / str(offset + 3))
+  return root
+
+
+def write_rulesets(root: Path, rules: int) -> tuple:
+  """kube-proxy style `iptables-save` text and the equivalent `nft -j list ruleset` JSON with `rules` rules."""
+  root.mkdir(parents=True, exist_ok=True)
+  services = max(1, rules // 4)
+  save = root / "iptables-save.txt"
+  with save.open("w", encoding="utf-8") as handle:
+    handle.write("*filter\n:INPUT DROP [0:0]\n:FORWARD ACCEPT [0:0]\n:OUTPUT ACCEPT [0:0]\n:KUBE-SERVICES - [0:0]\n")
+    handle.write("-A INPUT -i lo -j ACCEPT\n-A INPUT -j KUBE-SERVICES\n")
+    for index in range(services):
+      handle.write(f'-A KUBE-SERVICES -d 10.96.{index // 250}.{index % 250}/32 -p tcp -m comment --comment "ns/svc{index}" -m tcp --dport 443 -j KUBE-SVC-{index:08X}\n')
+    handle.write("COMMIT\n*nat\n:PREROUTING ACCEPT [0:0]\n:POSTROUTING ACCEPT [0:0]\n")
+    for index in range(rules - services - 2):
+      handle.write(f":KUBE-SEP-{index:08X} - [0:0]\n" if index % 3 == 0 else f"-A KUBE-SEP-{index - index % 3:08X} -p tcp -m tcp -j DNAT --to-destination 10.244.{index // 250 % 250}.{index % 250}:8443\n")
+    handle.write("COMMIT\n")
+
+  nft = root / "nft.json"
+  with nft.open("w", encoding="utf-8") as handle:
+    handle.write('{"nftables": [{"metainfo": {"version": "1.0.6", "json_schema_version": 1}}')
+    handle.write(', {"table": {"family": "inet", "name": "filter", "handle": 1}}')
+    handle.write(', {"chain": {"family": "inet", "table": "filter", "name": "input", "handle": 1, "type": "filter", "hook": "input", "prio": 0, "policy": "drop"}}')
+    handle.write(', {"chain": {"family": "inet", "table": "filter", "name": "services", "handle": 2}}')
+    for index in range(rules):
+      rule = {
+        "family": "inet", "table": "filter", "chain": "services", "handle": index + 3,
+        "expr": [
+          {"match": {"op": "==", "left": {"payload": {"protocol": "ip", "field": "daddr"}}, "right": f"10.96.{index // 250 % 250}.{index % 250}"}},
+          {"match": {"op": "==", "left": {"payload": {"protocol": "tcp", "field": "dport"}}, "right": 443}},
+          {"counter": {"packets": 0, "bytes": 0}},
+          {"accept": None},
+        ],
+      }
+      handle.write(', {"rule": ' + json.dumps(rule) + "}")
+    handle.write("]}\n")
+  return save, nft
+
+
+class _DockerHandler(BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+  containers = 0
+
+  def log_message(self, format, *args):  # noqa: A002
+    return
+
+  def do_GET(self):  # noqa: N802
+    if self.path == "/info":
+      body = {"ServerVersion": "24.0.0"}
+    elif self.path == "/containers/json":
+      body = [{"Id": f"{index:064x}", "Image": "registry/app", "Names": [f"/c{index}"]} for index in range(self.containers)]
+    elif self.path.startswith("/containers/"):
+      index = int(self.path.split("/")[2], 16)
+      body = {"Config": {"User": "" if index % 2 else "app"}, "HostConfig": {"Privileged": index % 101 == 0}}
+    else:
+      self.send_response(404)
+      self.send_header("Content-Length", "0")
+      self.end_headers()
+      return
+    data = json.dumps(body).encode()
+    self.send_response(200)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+  daemon_threads = True
+
+  def get_request(self):
+    request, _ = super().get_request()
+    return request, ("fake-docker", 0)
+
+
+class FakeDockerDaemon:
+  """Docker Engine API stand-in on a unix socket, serving `containers` containers."""
+
+  def __init__(self, socket_path: Path, containers: int):
+    handler = type("Handler", (_DockerHandler,), {"containers": containers})
+    if socket_path.exists():
+      socket_path.unlink()
+    self.socket_path = socket_path
+    self.server = _UnixServer(str(socket_path), handler)
+    self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+  def __enter__(self) -> "FakeDockerDaemon":
+    self.thread.start()
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.server.shutdown()
+    self.server.server_close()
+    if self.socket_path.exists():
+      os.unlink(self.socket_path)
+    return False
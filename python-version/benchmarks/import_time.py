@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Start-up guard: `--list-checks` must stay cheap and must not import check modules.
+
+Usage (from python-version/):
+  python -m benchmarks.import_time --budget-ms 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ENTRY_POINT = Path(__file__).resolve().parents[1] / "security_orchestrator.py"
+
+# Loading any of these for --list-checks means a lazy import regressed.
+FORBIDDEN = ("asyncio", "concurrent.futures", "security_audit.orchestrator", "security_audit.checks")
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile(args: list) -> tuple:
+  """Return (top-level cumulative microseconds, imported module names) for one run."""
+  proc = subprocess.run(
+    [sys.executable, "-X", "importtime", str(ENTRY_POINT), *args],
+    capture_output=True,
+    text=True,
+    check=False,
+  )
+  if proc.returncode != 0:
+    raise RuntimeError(f"{ENTRY_POINT.name} exited {proc.returncode}: {proc.stderr.strip()[-500:]}")
+  total = 0
+  modules = []
+  for line in proc.stderr.splitlines():
+    match = _LINE_RE.match(line)
+    if not match:
+      continue
+    modules.append(match.group(4))
+    if len(match.group(3)) == 1:
+      total += int(match.group(2))
+  return total, modules
+
+
+def parse_args() -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description="Check CLI start-up import time.")
+  parser.add_argument("--budget-ms", type=float, default=60.0, help="Fail when imports take longer (default: 60).")
+  parser.add_argument("--repeat", type=int, default=3, help="Keep the best of N runs (default: 3).")
+  return parser.parse_args()
+
+
+def main() -> int:
+  args = parse_args()
+  best = None
+  modules: list = []
+  for _ in range(max(1, args.repeat)):
+    total, modules = profile(["--list-checks"])
+    best = total if best is None else min(best, total)
+
+  print(f"--list-checks imports: {best / 1000:.1f} ms across {len(modules)} modules (budget {args.budget_ms:.0f} ms)")
+  failures = []
+  for name in modules:
+    if any(name == forbidden or name.startswith(forbidden + ".") for forbidden in FORBIDDEN):
+      failures.append(f"{name} imported at start-up")
+  if best / 1000 > args.budget_ms:
+    failures.append(f"import time {best / 1000:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+  for line in failures:
+    print(f"REGRESSION {line}", file=sys.stderr)
+  return 1 if failures else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Time and memory benchmarks for every check module and the full orchestrator.
+
+Usage (from python-version/):
+  python -m benchmarks.run_benchmarks --scale medium --save-baseline bench.json
+  python -m benchmarks.run_benchmarks --scale medium --baseline bench.json --threshold 0.25
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import inspect
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+from security_audit import accounts, debpkg, firewall, fswalk, history, image, procnet, registry, sshconfig, sudoers
+from security_audit.checks import (
+  check_docker,
+  check_filesystem,
+  check_k8s,
+  check_logging,
+  check_network,
+  check_os,
+  check_ssh,
+  check_sudo,
+  check_updates,
+)
+from security_audit.config import RunOptions
+from security_audit.facts import HostFacts
+from security_audit.logging_utils import CheckContext, LogBuffer
+from security_audit.orchestrator import run_checks
+
+from . import fixtures
+
+
+# Timings below this many seconds of absolute growth are treated as noise.
+MIN_TIME_DELTA = 0.005
+
+
+@dataclass
+class Benchmark:
+  """A named workload plus the environment it needs; `setup` runs once, untimed, before it."""
+
+  name: str
+  run: Callable[[], object]
+  env: Dict[str, str] = field(default_factory=dict)
+  setup: Callable[[], object] | None = None
+
+
+@contextlib.contextmanager
+def _patched_env(env: Dict[str, str]) -> Iterator[None]:
+  saved = {key: os.environ.get(key) for key in env}
+  os.environ.update(env)
+  try:
+    yield
+  finally:
+    for key, value in saved.items():
+      if value is None:
+        os.environ.pop(key, None)
+      else:
+        os.environ[key] = value
+
+
+def _check(module, options: RunOptions | None = None) -> Callable[[], CheckContext]:
+  def _run() -> CheckContext:
+    run_options = options or RunOptions()
+    context = CheckContext(module.__name__.rsplit(".", 1)[-1], LogBuffer(), options=run_options, facts=HostFacts(root=run_options.root))
+    if inspect.iscoroutinefunction(module.run):
+      asyncio.run(module.run(context))
+    else:
+      module.run(context)
+    return context
+
+  return _run
+
+
+def _parse_file(parser: Callable, path: Path):
+  with path.open(encoding="utf-8") as handle:
+    return parser(handle)
+
+
+def _orchestrator(options: RunOptions, checks=None) -> Callable[[], int]:
+  def _run() -> int:
+    with contextlib.redirect_stdout(io.StringIO()):
+      return run_checks(checks, options)
+
+  return _run
+
+
+def build(work: Path, sizes: Dict[str, int]) -> List[Benchmark]:
+  # `work` doubles as the audited root filesystem (RunOptions(root=work)), so
+  # check benchmarks read the fixtures below work/etc, work/var and work/proc,
+  # never the machine running them.
+  tree = work / "home"
+  fixtures.make_tree(tree, sizes["fs_depth"], sizes["fs_fanout"], sizes["fs_files"])
+  targets = {str(tree): (fswalk.WORLD_WRITABLE, fswalk.SUID_SGID)}
+  # The index only serves directory-only predicates (SUID/SGID scans always list).
+  dir_targets = {str(tree): (fswalk.WORLD_WRITABLE,)}
+  index_path = work / "fs_index.json"
+  warm = fswalk.DirIndex(index_path)
+  fswalk.scan(dir_targets, index=warm)
+  warm.save()
+
+  dpkg_status, apt_lists = fixtures.write_deb_database(work, sizes["packages"])
+  iptables_save, nft_json = fixtures.write_rulesets(work / "firewall", sizes["firewall_rules"])
+  fake_proc = str(fixtures.write_fake_proc(work / "proc", sizes["sockets"], sizes["processes"]))
+
+  fixtures.write_os_files(work)
+  sshd_config = work / "etc" / "ssh" / "sshd_config"
+  fixtures.write_sshd_config(sshd_config, sizes["sshd_lines"])
+  sudoers_file = fixtures.write_sudoers(work, sizes["sudoers_files"])
+  passwd, shadow = fixtures.write_accounts(work / "etc", sizes["accounts"])
+  rooted = RunOptions(root=work)
+  sudo_cache = work / "cache" / "sudoers.json"
+  image_tar = fixtures.write_image_tarball(work / "images" / "app.tar", sizes["image_files"])
+  image_targets = {root: (fswalk.SUID_SGID,) for root in check_filesystem.SUID_ROOTS}
+  history_db = fixtures.write_history(work / "history.sqlite3", sizes["history_findings"])
+  history_run = fixtures.history_records(500)
+
+  bins = {name: work / f"bin-{name}" for name in ("k8s", "docker", "apt", "dnf", "net", "logging", "all")}
+  for path in bins.values():
+    path.mkdir()
+  fixtures.write_fake_kubectl(bins["k8s"], sizes["pods"])
+  fixtures.write_fake_docker(bins["docker"], sizes["containers"])
+  fixtures.write_fake_apt(bins["apt"], sizes["packages"])
+  fixtures.write_fake_dnf(bins["dnf"], sizes["packages"])
+  fixtures.write_fake_iptables(bins["net"], iptables_save)
+  fixtures.write_fake_systemctl(bins["logging"])
+  fixtures.write_fake_kubectl(bins["all"], sizes["pods"])
+  fixtures.write_fake_apt(bins["all"], sizes["packages"])
+
+  host_path = os.environ.get("PATH", "")
+  docker_sock = work / "docker.sock"
+  no_sock = f"unix://{work / 'missing.sock'}"
+  cache_env = {"SECURITY_AUDIT_CACHE_DIR": str(work / "cache"), "LOG_DIR": str(work / "logs")}
+  orchestrator_env = {"PATH": f"{bins['all']}{os.pathsep}{host_path}", "DOCKER_HOST": f"unix://{docker_sock}", **cache_env}
+
+  def _history_record() -> int:
+    with history.History(history_db) as store:
+      run_id = store.record_run("bench", time.time(), 2, ["OS", "SSH"], history_run)
+      return len(store.diff(run_id, store.previous_run(run_id)).new)
+
+  def _history_query() -> int:
+    with history.History(history_db) as store:
+      found = list(store.query(host="host7", severity="CRIT", rule="synthetic.rule4"))
+      found += list(store.query(check="SSH", limit=1000))
+      found += list(store.query(since=0, limit=100))
+      return len(found)
+
+  def _sudo_cached() -> sudoers.Policy:
+    cache = sudoers.ParseCache.load(sudo_cache)
+    policy = sudoers.load(sudoers_file, cache, root=work)
+    cache.save()
+    return policy
+
+  cached = _orchestrator(RunOptions(), [spec for spec in registry.CHECKS if spec.cache_ttl])
+
+  return [
+    Benchmark("fswalk.scan", lambda: fswalk.scan(targets)),
+    Benchmark("fswalk.scan_indexed", lambda: fswalk.scan(dir_targets, index=fswalk.DirIndex.load(index_path))),
+    Benchmark("checks.os", _check(check_os, rooted)),
+    Benchmark("checks.filesystem", _check(check_filesystem, RunOptions(full_rescan=True)), cache_env),
+    Benchmark("procnet.listeners", lambda: procnet.listeners(fake_proc)),
+    Benchmark("firewall.iptables_save", lambda: _parse_file(firewall.parse_iptables_save, iptables_save)),
+    Benchmark("firewall.nft_json", lambda: _parse_file(firewall.parse_nft_json, nft_json)),
+    Benchmark("checks.network", _check(check_network, rooted), {"PATH": str(bins["net"])}),
+    Benchmark("checks.logging", _check(check_logging), {"PATH": str(bins["logging"])}),
+    Benchmark("sshconfig.parse", lambda: sshconfig.parse(sshd_config)),
+    Benchmark("sshconfig.load_cached", lambda: sshconfig.load(sshd_config, work / "cache" / "sshd_config.json")),
+    Benchmark("checks.ssh", _check(check_ssh, rooted)),
+    Benchmark("accounts.read_files", lambda: accounts.read_files(passwd, shadow)),
+    Benchmark("sudoers.parse", lambda: sudoers.load(sudoers_file, root=work)),
+    Benchmark("sudoers.load_cached", _sudo_cached),
+    Benchmark("checks.sudo", _check(check_sudo, rooted)),
+    Benchmark("image.read", lambda: image.read_image(image_tar, image_targets)),
+    Benchmark("image.audit", lambda: image.audit_image(str(image_tar), ["os", "filesystem", "ssh", "sudo"], RunOptions())),
+    Benchmark("history.record_diff", _history_record),
+    Benchmark("history.query", _history_query),
+    Benchmark("debpkg.upgradable", lambda: debpkg.upgradable(dpkg_status, apt_lists)),
+    Benchmark("checks.updates.apt", _check(check_updates), {"PATH": str(bins["apt"])}),
+    Benchmark("checks.updates.dnf", _check(check_updates), {"PATH": str(bins["dnf"])}),
+    Benchmark("checks.k8s", _check(check_k8s), {"PATH": str(bins["k8s"])}),
+    Benchmark("checks.docker.cli", _check(check_docker), {"PATH": str(bins["docker"]), "DOCKER_HOST": no_sock}),
+    Benchmark("checks.docker.api", _check(check_docker), {"DOCKER_HOST": f"unix://{docker_sock}"}),
+    # Offline checks against the fixture root; the live-host checks have their own benchmarks above.
+    Benchmark("orchestrator", _orchestrator(RunOptions(root=work, use_cache=False)), orchestrator_env),
+    # The result cache only serves live-host runs: replay the cacheable checks after an untimed warm-up run.
+    Benchmark("orchestrator.cached", cached, orchestrator_env, setup=cached),
+  ]
+
+
+def measure(bench: Benchmark, repeats: int) -> Dict[str, float]:
+  with _patched_env(bench.env):
+    if bench.setup is not None:
+      bench.setup()
+    times = []
+    for _ in range(max(1, repeats)):
+      start = time.perf_counter()
+      bench.run()
+      times.append(time.perf_counter() - start)
+    # A separate traced run: tracemalloc would distort the timings.
+    tracemalloc.start()
+    try:
+      bench.run()
+      _, peak = tracemalloc.get_traced_memory()
+    finally:
+      tracemalloc.stop()
+  return {"time_s": min(times), "peak_kb": peak // 1024}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+  regressions = []
+  for name, result in results.items():
+    base = baseline.get(name)
+    if not base:
+      continue
+    if result["time_s"] > base["time_s"] * (1 + threshold) and result["time_s"] - base["time_s"] > MIN_TIME_DELTA:
+      regressions.append(f"{name}: time {base['time_s'] * 1000:.1f}ms -> {result['time_s'] * 1000:.1f}ms")
+    if result["peak_kb"] > base["peak_kb"] * (1 + threshold) and result["peak_kb"] - base["peak_kb"] > 1024:
+      regressions.append(f"{name}: peak memory {base['peak_kb']}KB -> {result['peak_kb']}KB")
+  return regressions
+
+
+def parse_args() -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description="Benchmark security_audit checks against synthetic fixtures.")
+  parser.add_argument("--scale", choices=sorted(fixtures.SCALES), default="small", help="Fixture size (default: small).")
+  parser.add_argument("--only", action="append", default=[], metavar="PREFIX", help="Run benchmarks whose name starts with PREFIX.")
+  parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark; the fastest is kept (default: 3).")
+  parser.add_argument("--save-baseline", type=Path, metavar="FILE", help="Write results as a baseline JSON file.")
+  parser.add_argument("--baseline", type=Path, metavar="FILE", help="Compare against a saved baseline.")
+  parser.add_argument(
+    "--threshold",
+    type=float,
+    default=0.25,
+    help="Allowed relative slowdown/memory growth before failing (default: 0.25).",
+  )
+  return parser.parse_args()
+
+
+def main() -> int:
+  args = parse_args()
+  baseline: Dict[str, Dict[str, float]] = {}
+  if args.baseline:
+    data = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if data.get("scale") != args.scale:
+      print(f"Baseline was recorded at scale '{data.get('scale')}', not '{args.scale}'.", file=sys.stderr)
+      return 2
+    baseline = data["results"]
+
+  results: Dict[str, Dict[str, float]] = {}
+  with tempfile.TemporaryDirectory(prefix="security-audit-bench-") as tmp:
+    work = Path(tmp)
+    # Checks benchmarked without their own cache_env still keep logs and caches out of the source tree.
+    run_env = {"LOG_DIR": str(work / "run-logs"), "SECURITY_AUDIT_CACHE_DIR": str(work / "run-logs" / "cache")}
+    with _patched_env(run_env), fixtures.FakeDockerDaemon(work / "docker.sock", fixtures.SCALES[args.scale]["containers"]):
+      for bench in build(work, fixtures.SCALES[args.scale]):
+        if args.only and not any(bench.name.startswith(prefix) for prefix in args.only):
+          continue
+        results[bench.name] = measure(bench, args.repeat)
+        base = baseline.get(bench.name)
+        delta = f"{(results[bench.name]['time_s'] / base['time_s'] - 1) * 100:+7.1f}%" if base and base["time_s"] else ""
+        print(f"{bench.name:<24} {results[bench.name]['time_s'] * 1000:10.1f} ms {results[bench.name]['peak_kb']:10d} KB {delta}")
+
+  if args.save_baseline:
+    args.save_baseline.write_text(json.dumps({"scale": args.scale, "results": results}, indent=2) + "\n", encoding="utf-8")
+
+  regressions = compare(results, baseline, args.threshold)
+  for line in regressions:
+    print(f"REGRESSION {line}", file=sys.stderr)
+  return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -6,6 +6,13 @@ Modules under security_audit.checks mirror the Bash checks and expose a
 structured logging plus WARN/CRIT tracking.
 """
 
-from .orchestrator import run_checks  # re-export for convenience
-
 __all__ = ["run_checks"]
+
+
+def __getattr__(name: str):
+  # Re-export lazily so importing the package (e.g. for the registry) stays cheap.
+  if name == "run_checks":
+    from .orchestrator import run_checks
+
+    return run_checks
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
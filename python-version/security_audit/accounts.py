@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import pwd
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+
+PASSWD = Path("/etc/passwd")
+SHADOW = Path("/etc/shadow")
+
+# Password state from the shadow password field.
+LOCKED = "locked"
+EMPTY = "empty"
+SET = "set"
+
+
+class Account:
+  """One passwd entry plus its shadow password state (None when unknown)."""
+
+  __slots__ = ("name", "uid", "gid", "home", "shell", "password", "source")
+
+  def __init__(self, name: str, uid: int, gid: int, home: str, shell: str, source: str = "files"):
+    self.name = name
+    self.uid = uid
+    self.gid = gid
+    self.home = home
+    self.shell = shell
+    self.password: str | None = None
+    self.source = source
+
+  def __repr__(self) -> str:
+    return f"Account({self.name!r}, uid={self.uid}, password={self.password!r}, source={self.source!r})"
+
+
+@dataclass
+class AccountTable:
+  """Accounts keyed by name, in file order.
+
+  `shadow` is None once /etc/shadow was read, otherwise "missing" or
+  "unreadable". `nss` is None unless NSS enumeration was requested; then it
+  is "complete", "timeout" or "error".
+  """
+
+  accounts: Dict[str, Account] = field(default_factory=dict)
+  shadow: str | None = None
+  nss: str | None = None
+
+  def __len__(self) -> int:
+    return len(self.accounts)
+
+  def uid0(self) -> List[str]:
+    return [account.name for account in self.accounts.values() if account.uid == 0]
+
+  def with_password(self, state: str) -> List[str]:
+    return [account.name for account in self.accounts.values() if account.password == state]
+
+  def name_of(self, uid: int) -> str | None:
+    for account in self.accounts.values():
+      if account.uid == uid:
+        return account.name
+    return None
+
+
+def _password_state(field_value: str) -> str:
+  if not field_value:
+    return EMPTY
+  return LOCKED if field_value.startswith(("!", "*")) else SET
+
+
+def read_files(passwd: Path = PASSWD, shadow: Path = SHADOW) -> AccountTable:
+  """Stream the local passwd and shadow files; never consults NSS."""
+  table = AccountTable()
+  try:
+    with passwd.open(encoding="utf-8", errors="ignore") as handle:
+      for line in handle:
+        parts = line.rstrip("\n").split(":")
+        # `+`/`-` lines are NIS compat markers, not accounts.
+        if len(parts) < 7 or not parts[0] or parts[0][0] in "+-":
+          continue
+        try:
+          table.accounts.setdefault(parts[0], Account(parts[0], int(parts[2]), int(parts[3]), parts[5], parts[6]))
+        except ValueError:
+          continue
+  except FileNotFoundError:
+    pass
+
+  try:
+    with shadow.open(encoding="utf-8", errors="ignore") as handle:
+      for line in handle:
+        name, _, rest = line.partition(":")
+        account = table.accounts.get(name)
+        if account is not None and account.password is None:
+          account.password = _password_state(rest.split(":", 1)[0].rstrip("\n"))
+  except FileNotFoundError:
+    table.shadow = "missing"
+  except PermissionError:
+    table.shadow = "unreadable"
+  return table
+
+
+def add_nss(table: AccountTable, timeout: float) -> AccountTable:
+  """Add accounts only known to NSS (LDAP, SSSD, ...) if `pwd.getpwall()` finishes within `timeout` seconds.
+
+  The enumeration runs on a daemon thread, so a hung directory lookup is
+  abandoned rather than holding up the audit.
+  """
+  result: List[list] = []
+  errors: List[Exception] = []
+
+  def _enumerate() -> None:
+    try:
+      result.append(pwd.getpwall())
+    except Exception as exc:  # pylint: disable=broad-except
+      errors.append(exc)
+
+  worker = threading.Thread(target=_enumerate, name="nss-getpwall", daemon=True)
+  worker.start()
+  worker.join(timeout)
+  if not result:
+    table.nss = "error" if errors else "timeout"
+    return table
+  for entry in result[0]:
+    if entry.pw_name not in table.accounts:
+      table.accounts[entry.pw_name] = Account(entry.pw_name, entry.pw_uid, entry.pw_gid, entry.pw_dir, entry.pw_shell, source="nss")
+  table.nss = "complete"
+  return table
+
+
+__all__ = ["Account", "AccountTable", "EMPTY", "LOCKED", "SET", "add_nss", "read_files"]
@@ -1,86 +1,138 @@
 from __future__ import annotations
 
+import asyncio
 import json
-import pwd
 import grp
+import os
 from pathlib import Path
+from typing import List, Tuple
 
+from ..docker_api import DockerClient, socket_from_env
 from ..logging_utils import CheckContext
-from ..utils import command_exists, run_command
+from ..utils import run_command_async
 
 
-def _docker_sock_info(ctx: CheckContext) -> None:
-  sock = Path("/var/run/docker.sock")
+DOCKER_TIMEOUT = 30
+
+Container = Tuple[str, str, str]
+
+
+def _docker_sock_info(ctx: CheckContext, socket_path: str) -> None:
+  """Permissions of the socket the daemon was reached through (DOCKER_HOST=unix://... or the default)."""
+  sock = Path(socket_path)
   if not sock.exists():
     return
   try:
     stat_result = sock.stat()
     perms = oct(stat_result.st_mode & 0o777)
-    owner = pwd.getpwuid(stat_result.st_uid).pw_name
+    owner = ctx.facts.accounts().name_of(stat_result.st_uid) or str(stat_result.st_uid)
     group = grp.getgrgid(stat_result.st_gid).gr_name
-    ctx.info(f"docker.sock perms: {perms} {owner}:{group}")
+    ctx.info(f"{sock.name} perms: {perms} {owner}:{group}", path=str(sock))
   except Exception:  # pylint: disable=broad-except
-    ctx.warn("Unable to read docker.sock permissions.")
+    ctx.warn(f"Unable to read {sock.name} permissions.", rule="docker.sock_unreadable", path=str(sock))
 
 
-def _inspect_container(container_id: str) -> dict:
-  result = run_command(["docker", "inspect", container_id])
+async def _inspect_container(container_id: str) -> dict:
+  result = await run_command_async(["docker", "inspect", container_id], timeout=DOCKER_TIMEOUT)
   data = json.loads(result.stdout)
   if isinstance(data, list):
     return data[0]
   return data
 
 
-def run(ctx: CheckContext) -> None:
-  ctx.section("Docker / container runtime")
+def _collect_via_api(client: DockerClient) -> Tuple[List[Container], List[dict | Exception]]:
+  client.info()
+  entries = client.containers()
+  containers: List[Container] = []
+  for entry in entries:
+    names = entry.get("Names") or [""]
+    # Same columns as `docker ps --format '{{.ID}} {{.Image}} {{.Names}}'`.
+    containers.append((entry.get("Id", "")[:12], entry.get("Image", ""), names[0].lstrip("/")))
+  return containers, client.inspect_many([entry.get("Id", "") for entry in entries])
 
-  if not command_exists("docker"):
-    ctx.info("Docker CLI not found – skipping Docker checks.")
-    return
 
+async def _collect_via_cli(ctx: CheckContext) -> Tuple[List[Container], List[dict | Exception]] | None:
   try:
-    info_result = run_command(["docker", "info"], check=False)
+    info_result = await run_command_async(["docker", "info"], timeout=DOCKER_TIMEOUT)
   except Exception as exc:  # pylint: disable=broad-except
-    ctx.warn(f"Docker CLI present but 'docker info' failed: {exc}")
-    return
+    ctx.warn(f"Docker CLI present but 'docker info' failed: {exc}", rule="docker.info_failed")
+    return None
 
   if info_result.returncode != 0:
-    ctx.warn("Docker CLI present but 'docker info' failed (daemon not running or insufficient permissions).")
-    return
+    ctx.warn("Docker CLI present but 'docker info' failed (daemon not running or insufficient permissions).", rule="docker.info_failed")
+    return None
 
   ctx.info("Docker daemon reachable.")
-  _docker_sock_info(ctx)
+  # A tcp:// or ssh:// DOCKER_HOST reaches the daemon without a local socket.
+  if (os.environ.get("DOCKER_HOST") or "unix://").startswith("unix://"):
+    _docker_sock_info(ctx, socket_from_env())
 
   try:
-    running = run_command(["docker", "ps", "--format", "{{.ID}} {{.Image}} {{.Names}}"])
+    running = await run_command_async(
+      ["docker", "ps", "--format", "{{.ID}} {{.Image}} {{.Names}}"], timeout=DOCKER_TIMEOUT
+    )
   except Exception as exc:  # pylint: disable=broad-except
-    ctx.warn(f"Failed to list running containers: {exc}")
-    return
+    ctx.warn(f"Failed to list running containers: {exc}", rule="docker.list_failed")
+    return None
 
   lines = [line.strip() for line in running.stdout.splitlines() if line.strip()]
-  if not lines:
+  containers = [tuple(parts) for parts in (line.split(maxsplit=2) for line in lines) if len(parts) == 3]
+  # Inspect concurrently (bounded by the global process cap), report in listing order.
+  inspections = await asyncio.gather(
+    *(_inspect_container(container_id) for container_id, _, _ in containers),
+    return_exceptions=True,
+  )
+  return containers, list(inspections)
+
+
+def _report(ctx: CheckContext, containers: List[Container], inspections: List[dict | Exception]) -> None:
+  if not containers:
     ctx.info("No running containers.")
     return
 
   ctx.info("Running containers:")
-  for line in lines:
-    ctx.info(f"  {line}")
+  for container_id, image, name in containers:
+    ctx.info(f"  {container_id} {image} {name}", container_id=container_id, image=image, container=name)
 
-  for line in lines:
-    parts = line.split(maxsplit=2)
-    if len(parts) < 3:
-      continue
-    container_id, image, name = parts
-    try:
-      inspect = _inspect_container(container_id)
-    except Exception as exc:  # pylint: disable=broad-except
-      ctx.warn(f"Failed to inspect container {name}: {exc}")
+  for (_, image, name), inspect in zip(containers, inspections):
+    if isinstance(inspect, Exception):
+      ctx.warn(f"Failed to inspect container {name}: {inspect}", rule="docker.inspect_failed", container=name)
       continue
 
     user = (inspect.get("Config", {}) or {}).get("User") or "(default/root)"
     privileged = (inspect.get("HostConfig", {}) or {}).get("Privileged", False)
 
     if user in {"0", "root", "", "(default/root)"}:
-      ctx.warn(f"Container {name} ({image}) is running as root (User={user}). Consider using non-root user.")
+      ctx.warn(f"Container {name} ({image}) is running as root (User={user}). Consider using non-root user.", rule="docker.container_root", container=name, image=image, user=user)
     if privileged:
-      ctx.crit(f"Container {name} ({image}) is running in privileged mode.")
+      ctx.crit(f"Container {name} ({image}) is running in privileged mode.", rule="docker.container_privileged", container=name, image=image)
+
+
+async def run(ctx: CheckContext) -> None:
+  ctx.section("Docker / container runtime")
+
+  # Prefer the Engine API over the socket: one pooled connection set instead
+  # of a CLI process (and daemon connect) per container.
+  with DockerClient() as client:
+    if client.available():
+      try:
+        collected = await asyncio.to_thread(_collect_via_api, client)
+      except Exception as exc:  # pylint: disable=broad-except
+        collected = None
+        if not ctx.facts.has_command("docker"):
+          ctx.warn(f"Docker API at {client.socket_path} failed and no Docker CLI is available: {exc}", rule="docker.api_failed", path=client.socket_path)
+          return
+        ctx.info(f"Docker API at {client.socket_path} unavailable ({exc}); falling back to the docker CLI.")
+      if collected is not None:
+        ctx.info("Docker daemon reachable.")
+        _docker_sock_info(ctx, client.socket_path)
+        _report(ctx, *collected)
+        return
+
+  if not ctx.facts.has_command("docker"):
+    ctx.info("Docker CLI not found – skipping Docker checks.")
+    return
+
+  collected = await _collect_via_cli(ctx)
+  if collected is not None:
+    _report(ctx, *collected)
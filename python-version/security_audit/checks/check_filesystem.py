@@ -1,71 +1,72 @@
 from __future__ import annotations
 
-from pathlib import Path
+from typing import Dict, List, Tuple
 
+from .. import fswalk
+from ..config import cache_dir
 from ..logging_utils import CheckContext
-from ..utils import command_exists, run_command
 
 
-def _existing_paths(paths):
-  return [path for path in paths if Path(path).exists()]
+WORLD_WRITABLE_ROOTS = ("/tmp", "/var/tmp", "/home")
+SUID_ROOTS = ("/bin", "/sbin", "/usr/bin", "/usr/sbin")
 
 
-def _check_world_writable(ctx: CheckContext) -> None:
-  ctx.info("Scanning for world-writable dirs without sticky bit under /tmp /var/tmp /home...")
-  if not command_exists("find"):
-    ctx.warn("find not available; skipping world-writable directory scan.")
-    return
+INDEX_NAME = "fs_index.json"
 
-  targets = _existing_paths(["/tmp", "/var/tmp", "/home"])
-  if not targets:
-    ctx.info("Target directories missing; skipping scan.")
-    return
 
-  args = ["find", *targets, "-xdev", "-type", "d", "-perm", "-0002", "!", "-perm", "-1000"]
+def _scan(ctx: CheckContext) -> Tuple[Dict[str, List[str]], fswalk.DirIndex | None]:
+  # One walk covers both scans; each root only runs the predicates it needs.
+  targets = {root: (fswalk.WORLD_WRITABLE,) for root in WORLD_WRITABLE_ROOTS}
+  targets.update({root: (fswalk.SUID_SGID,) for root in SUID_ROOTS})
+  if ctx.facts.image is not None:
+    return ctx.facts.image.scan(targets), None
+  if ctx.options.root is not None:
+    # Report paths as they appear inside the root; the live host's index is left alone.
+    prefix = len(str(ctx.options.root).rstrip("/"))
+    found = fswalk.scan({str(ctx.path(root)): predicates for root, predicates in targets.items()})
+    return {name: [path[prefix:] for path in paths] for name, paths in found.items()}, None
+
+  index_path = cache_dir() / INDEX_NAME
+  # --full-rescan ignores the previous index but still writes a fresh one.
+  index = fswalk.DirIndex(index_path) if ctx.options.full_rescan else fswalk.DirIndex.load(index_path)
+  found = fswalk.scan(targets, index=index)
   try:
-    result = run_command(args)
-  except Exception as exc:  # pylint: disable=broad-except
-    ctx.warn(f"Failed to run find for world-writable dirs: {exc}")
-    return
+    index.save()
+  except OSError as exc:
+    ctx.info(f"Could not save directory index {index_path}: {exc}")
+  return found, index
+
 
-  lines = [line for line in result.stdout.splitlines() if line.strip()][:30]
+def _check_world_writable(ctx: CheckContext, found: List[str]) -> None:
+  ctx.info("Scanning for world-writable dirs without sticky bit under /tmp /var/tmp /home...")
+  lines = found[:30]
   if lines:
-    ctx.warn("World-writable dirs without sticky bit (first 30):")
+    ctx.warn("World-writable dirs without sticky bit (first 30):", rule="fs.world_writable_dir", count=len(found))
     for line in lines:
-      ctx.info(f"  {line}")
+      ctx.info(f"  {line}", rule="fs.world_writable_dir", path=line)
   else:
     ctx.info("No obvious world-writable dirs without sticky bit in target paths.")
 
 
-def _check_suid_sgid(ctx: CheckContext) -> None:
+def _check_suid_sgid(ctx: CheckContext, binaries: List[str]) -> None:
   ctx.info("Scanning for SUID/SGID binaries in /bin /sbin /usr/bin /usr/sbin...")
-  if not command_exists("find"):
-    ctx.warn("find not available; skipping SUID/SGID scan.")
-    return
-
-  targets = _existing_paths(["/bin", "/sbin", "/usr/bin", "/usr/sbin"])
-  if not targets:
-    ctx.info("Standard binary directories missing; skipping scan.")
-    return
-
-  args = ["find", *targets, "-xdev", "(", "-perm", "-4000", "-o", "-perm", "-2000", ")", "-type", "f"]
-  try:
-    result = run_command(args)
-  except Exception as exc:  # pylint: disable=broad-except
-    ctx.warn(f"Failed to run find for SUID/SGID binaries: {exc}")
-    return
-
-  binaries = [line for line in result.stdout.splitlines() if line.strip()]
   ctx.info(f"Found {len(binaries)} SUID/SGID binaries in standard paths.")
 
   custom = [line for line in binaries if line.startswith("/usr/local") or line.startswith("/opt")]
   if custom:
-    ctx.warn("SUID/SGID binaries in /usr/local or /opt (review carefully):")
+    ctx.warn("SUID/SGID binaries in /usr/local or /opt (review carefully):", rule="fs.suid_sgid_custom", count=len(custom))
     for line in custom[:30]:
-      ctx.info(f"  {line}")
+      ctx.info(f"  {line}", rule="fs.suid_sgid_custom", path=line)
 
 
 def run(ctx: CheckContext) -> None:
   ctx.section("Filesystem & permissions")
-  _check_world_writable(ctx)
-  _check_suid_sgid(ctx)
+  try:
+    found, index = _scan(ctx)
+  except Exception as exc:  # pylint: disable=broad-except
+    ctx.warn(f"Filesystem scan failed: {exc}", rule="fs.scan_failed")
+    return
+  _check_world_writable(ctx, found[fswalk.WORLD_WRITABLE.name])
+  _check_suid_sgid(ctx, found[fswalk.SUID_SGID.name])
+  if index is not None and index.reused:
+    ctx.info(f"Directory index: {index.reused} of {index.visited} directories unchanged since last scan.")
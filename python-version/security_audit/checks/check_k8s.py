@@ -1,44 +1,74 @@
 from __future__ import annotations
 
-import json
+from typing import Iterable, Iterator
+from urllib.parse import quote
 
+from ..jsonstream import iter_array_items
 from ..logging_utils import CheckContext
-from ..utils import command_exists, run_command
+from ..utils import run_command, stream_command
 
 
-def _privileged_containers(cluster_json: str) -> list[str]:
-  try:
-    data = json.loads(cluster_json)
-  except json.JSONDecodeError:
-    return []
+PAGE_SIZE = 500
+PAGE_TIMEOUT = 120
+
+
+class _PodListError(Exception):
+  """kubectl could not return a page of the pod list."""
+
+
+def _iter_pods(page_size: int = PAGE_SIZE) -> Iterator[dict]:
+  # `kubectl get pods -o json` merges all chunks into one document before
+  # printing, so pages are requested from the API directly with limit/continue
+  # and each page's items are decoded one pod at a time.
+  token = ""
+  while True:
+    path = f"/api/v1/pods?limit={page_size}"
+    if token:
+      path += f"&continue={quote(token, safe='')}"
+    meta: dict = {}
+    stream = stream_command(["kubectl", "get", "--raw", path], timeout=PAGE_TIMEOUT)
+    try:
+      with stream:
+        yield from iter_array_items(stream.stdout, "items", meta)
+    except ValueError as exc:
+      if stream.returncode:
+        raise _PodListError(f"kubectl exited with {stream.returncode}") from exc
+      raise
+    if stream.returncode:
+      raise _PodListError(f"kubectl exited with {stream.returncode}")
+    token = (meta.get("metadata") or {}).get("continue") or ""
+    if not token:
+      return
 
-  hits: list[str] = []
-  for item in data.get("items", []):
+
+def _privileged_containers(pods: Iterable[dict]) -> list[tuple[str, str, str]]:
+  hits: list[tuple[str, str, str]] = []
+  for item in pods:
     ns = item.get("metadata", {}).get("namespace", "default")
     pod_name = item.get("metadata", {}).get("name", "")
     containers = item.get("spec", {}).get("containers", [])
     for container in containers:
       security = container.get("securityContext") or {}
       if security.get("privileged") is True:
-        hits.append(f"{ns} {pod_name} {container.get('name', '')}")
+        hits.append((ns, pod_name, container.get("name", "")))
   return hits
 
 
 def run(ctx: CheckContext) -> None:
   ctx.section("Kubernetes checks")
 
-  if not command_exists("kubectl"):
+  if not ctx.facts.has_command("kubectl"):
     ctx.info("kubectl not found – skipping Kubernetes checks.")
     return
 
   try:
     cluster_result = run_command(["kubectl", "cluster-info"], check=False)
   except Exception as exc:  # pylint: disable=broad-except
-    ctx.warn(f"kubectl present but 'kubectl cluster-info' failed: {exc}")
+    ctx.warn(f"kubectl present but 'kubectl cluster-info' failed: {exc}", rule="k8s.cluster_unreachable")
     return
 
   if cluster_result.returncode != 0:
-    ctx.warn("kubectl present but 'kubectl cluster-info' failed – no cluster context or auth issue.")
+    ctx.warn("kubectl present but 'kubectl cluster-info' failed – no cluster context or auth issue.", rule="k8s.cluster_unreachable")
     return
 
   ctx.info("kubectl can reach a cluster.")
@@ -50,19 +80,23 @@ def run(ctx: CheckContext) -> None:
     pass
 
   try:
-    pods_json = run_command(["kubectl", "get", "pods", "-A", "-o", "json"], check=False)
-  except Exception as exc:  # pylint: disable=broad-except
-    ctx.warn(f"Failed to query pods for privileged containers: {exc}")
+    privileged = _privileged_containers(_iter_pods())
+  except _PodListError:
+    ctx.warn("kubectl get pods returned non-zero; unable to assess privileged containers.", rule="k8s.pod_list_failed")
     return
-
-  if pods_json.returncode != 0:
-    ctx.warn("kubectl get pods returned non-zero; unable to assess privileged containers.")
+  except Exception as exc:  # pylint: disable=broad-except
+    ctx.warn(f"Failed to query pods for privileged containers: {exc}", rule="k8s.pod_list_failed")
     return
 
-  privileged = _privileged_containers(pods_json.stdout)
   if privileged:
-    ctx.crit("Privileged containers detected (namespace pod container):")
-    for line in privileged:
-      ctx.info(f"  {line}")
+    ctx.crit("Privileged containers detected (namespace pod container):", rule="k8s.privileged_container", count=len(privileged))
+    for ns, pod_name, container in privileged:
+      ctx.info(
+        f"  {ns} {pod_name} {container}",
+        rule="k8s.privileged_container",
+        namespace=ns,
+        pod=pod_name,
+        container=container,
+      )
   else:
     ctx.info("No privileged containers detected via API scan.")
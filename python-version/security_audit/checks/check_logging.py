@@ -1,46 +1,35 @@
 from __future__ import annotations
 
 from ..logging_utils import CheckContext
-from ..utils import command_exists, run_command
 
 
-def _systemctl_active(service: str) -> bool:
-  try:
-    result = run_command(["systemctl", "is-active", "--quiet", service], capture=False)
-    return result.returncode == 0
-  except FileNotFoundError:
-    return False
-  except Exception:
-    return False
-
-
-def _systemctl_status(service: str) -> bool:
-  try:
-    result = run_command(["systemctl", "status", service])
-    return result.returncode == 0
-  except FileNotFoundError:
-    return False
-  except Exception:
-    return False
+UNITS = ("systemd-journald", "rsyslog", "auditd")
 
 
 def run(ctx: CheckContext) -> None:
   ctx.section("Logging & audit")
 
-  if command_exists("systemctl"):
-    if _systemctl_active("systemd-journald"):
+  has_systemctl = ctx.facts.has_command("systemctl")
+  # One batched `systemctl show` answers all three units.
+  states = ctx.facts.unit_states(UNITS)
+
+  def _active(unit: str) -> bool:
+    return states[unit].get("ActiveState") == "active"
+
+  if has_systemctl:
+    if _active("systemd-journald"):
       ctx.info("systemd-journald is active.")
     else:
-      ctx.warn("systemd-journald is not reported as active.")
+      ctx.warn("systemd-journald is not reported as active.", rule="logging.journald_inactive")
 
-    if _systemctl_active("rsyslog"):
+    if _active("rsyslog"):
       ctx.info("rsyslog is active.")
     else:
       ctx.info("rsyslog not active (may be fine if journald is primary).")
   else:
-    ctx.warn("systemctl not available; cannot check journald/rsyslog status.")
+    ctx.warn("systemctl not available; cannot check journald/rsyslog status.", rule="logging.systemctl_missing")
 
-  if command_exists("auditctl") or _systemctl_status("auditd"):
+  if ctx.facts.has_command("auditctl") or _active("auditd"):
     ctx.info("auditd/audit subsystem appears present; review rules with 'auditctl -l'.")
   else:
-    ctx.warn("No obvious audit subsystem detected (auditd/auditctl). Host-level auditing may be limited.")
+    ctx.warn("No obvious audit subsystem detected (auditd/auditctl). Host-level auditing may be limited.", rule="logging.audit_missing")
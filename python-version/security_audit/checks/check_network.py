@@ -1,74 +1,171 @@
 from __future__ import annotations
 
+import asyncio
+import os
+
+from .. import firewall, procnet
 from ..logging_utils import CheckContext
-from ..utils import command_exists, run_command
+from ..utils import run_command_async, stream_command
+
+
+FIREWALL_TIMEOUT = 30
+CHAIN_LIMIT = 5
+
+
+LISTENER_LIMIT = 30
+
+
+def _check_listeners(ctx: CheckContext) -> bool:
+  """Report listeners from /proc/net; False when /proc is unavailable and the CLI is needed."""
+  try:
+    found = procnet.listeners(str(ctx.path("/proc")))
+  except OSError as exc:
+    ctx.logger.debug("Reading /proc/net failed", exc)
+    return False
+
+  # SO_REUSEPORT and per-worker sockets show up once per socket; report each endpoint once.
+  unique = {}
+  for listener in found:
+    unique.setdefault((listener.protocol, listener.address, listener.port, listener.pid), listener)
+  listeners = list(unique.values())
+  exposed = [listener for listener in listeners if listener.wildcard]
+  ctx.info(f"Listening sockets: {len(listeners)} ({len(exposed)} on all interfaces).", count=len(listeners), exposed=len(exposed))
+
+  for listener in listeners[:LISTENER_LIMIT]:
+    owner = f"{listener.process or '?'} (pid {listener.pid})" if listener.pid else "owner not visible"
+    ctx.info(
+      f"  {listener.protocol:<5} {listener.endpoint():<28} {owner}",
+      rule="net.listener",
+      protocol=listener.protocol,
+      address=listener.address,
+      port=listener.port,
+      pid=listener.pid,
+      process=listener.process,
+      executable=listener.executable,
+    )
+  if len(listeners) > LISTENER_LIMIT:
+    ctx.info(f"  ... {len(listeners) - LISTENER_LIMIT} more listeners.")
+  if any(listener.pid is None for listener in listeners) and os.geteuid() != 0:
+    ctx.info("Some socket owners are not visible; run as root to attribute every listener.")
+
+  allowed = ctx.options.allowed_ports
+  if allowed is not None:
+    for listener in exposed:
+      if listener.port not in allowed:
+        ctx.warn(
+          f"{listener.process or 'Unknown process'} listens on {listener.endpoint()}/{listener.protocol} (port not in allowlist).",
+          rule="net.unexpected_listener",
+          protocol=listener.protocol,
+          address=listener.address,
+          port=listener.port,
+          pid=listener.pid,
+          executable=listener.executable,
+        )
+  return True
 
 
 def _check_ports(ctx: CheckContext) -> None:
+  if _check_listeners(ctx):
+    return
+
   ctx.info("Listening TCP/UDP ports (top 20 lines):")
   cmd = None
-  if command_exists("ss"):
+  if ctx.facts.has_command("ss"):
     cmd = ["ss", "-tulpen"]
-  elif command_exists("netstat"):
+  elif ctx.facts.has_command("netstat"):
     cmd = ["netstat", "-tulpen"]
 
   if cmd is None:
-    ctx.warn("Neither ss nor netstat available; cannot list listening ports.")
+    ctx.warn("Neither ss nor netstat available; cannot list listening ports.", rule="net.port_tool_missing")
     return
 
   try:
-    result = run_command(cmd)
+    with stream_command(cmd, max_lines=20) as stream:
+      lines = list(stream)
   except Exception as exc:  # pylint: disable=broad-except
-    ctx.warn(f"Failed to inspect listening ports ({' '.join(cmd)}): {exc}")
+    ctx.warn(f"Failed to inspect listening ports ({' '.join(cmd)}): {exc}", rule="net.port_list_failed")
     return
 
-  for line in result.stdout.splitlines()[:20]:
+  for line in lines:
     ctx.info(line)
 
 
-def _check_firewall(ctx: CheckContext) -> None:
+async def _check_firewall(ctx: CheckContext) -> None:
   ctx.info("Evaluating firewall status...")
 
-  if command_exists("ufw"):
+  if ctx.facts.has_command("ufw"):
     ctx.info("ufw detected.")
     try:
-      result = run_command(["ufw", "status", "verbose"], capture=True, check=False)
+      result = await run_command_async(["ufw", "status", "verbose"], timeout=FIREWALL_TIMEOUT)
       text = result.stdout or result.stderr
       for line in text.splitlines()[:30]:
         ctx.info(line)
     except Exception as exc:  # pylint: disable=broad-except
-      ctx.warn(f"Failed to get ufw status: {exc}")
+      ctx.warn(f"Failed to get ufw status: {exc}", rule="net.firewall_query_failed", firewall="ufw")
     return
 
-  if command_exists("firewall-cmd"):
+  if ctx.facts.has_command("firewall-cmd"):
     ctx.info("firewalld detected.")
     try:
-      state = run_command(["firewall-cmd", "--state"])
+      # Both probes are independent; --list-all is only shown when firewalld runs.
+      state, detail = await asyncio.gather(
+        run_command_async(["firewall-cmd", "--state"], timeout=FIREWALL_TIMEOUT),
+        run_command_async(["firewall-cmd", "--list-all"], timeout=FIREWALL_TIMEOUT),
+      )
       if "running" in state.stdout:
         ctx.info("firewalld is running.")
-        detail = run_command(["firewall-cmd", "--list-all"])
         for line in detail.stdout.splitlines()[:30]:
           ctx.info(line)
       else:
-        ctx.warn("firewalld appears installed but not running.")
+        ctx.warn("firewalld appears installed but not running.", rule="net.firewalld_stopped", firewall="firewalld")
     except Exception as exc:  # pylint: disable=broad-except
-      ctx.warn(f"Failed to query firewalld: {exc}")
+      ctx.warn(f"Failed to query firewalld: {exc}", rule="net.firewall_query_failed", firewall="firewalld")
     return
 
-  if command_exists("iptables"):
-    ctx.warn("No ufw/firewalld detected, but iptables exists. Showing top of rules:")
-    try:
-      result = run_command(["iptables", "-L", "-n"])
-      for line in result.stdout.splitlines()[:30]:
-        ctx.info(line)
-    except Exception as exc:  # pylint: disable=broad-except
-      ctx.warn(f"Failed to dump iptables rules: {exc}")
+  try:
+    ruleset = await asyncio.to_thread(firewall.read_ruleset, ctx.facts, FIREWALL_TIMEOUT)
+  except Exception as exc:  # pylint: disable=broad-except
+    ctx.warn(f"Failed to read the netfilter ruleset: {exc}", rule="net.firewall_query_failed", firewall="netfilter")
+    return
+  if ruleset is None:
+    ctx.warn("No firewall tooling detected (ufw/firewalld/nft/iptables) – host may rely solely on upstream filtering.", rule="net.firewall_missing")
     return
 
-  ctx.warn("No firewall tooling detected (ufw/firewalld/iptables) – host may rely solely on upstream filtering.")
+  ctx.warn(f"No ufw/firewalld detected; evaluating the raw {ruleset.backend} ruleset.", rule="net.iptables_only", firewall=ruleset.backend)
+  _report_ruleset(ctx, ruleset)
+
+
+def _report_ruleset(ctx: CheckContext, ruleset: firewall.Ruleset) -> None:
+  ctx.info(
+    f"{ruleset.backend} ruleset: {len(ruleset.chains)} chains, {ruleset.rule_count} rules.",
+    firewall=ruleset.backend,
+    chains=len(ruleset.chains),
+    rules=ruleset.rule_count,
+  )
+  for chain in ruleset.base_chains():
+    ctx.info(
+      f"  {chain.family} {chain.table}/{chain.name}: policy {chain.policy}, {chain.rules} rules",
+      family=chain.family,
+      table=chain.table,
+      chain=chain.name,
+      hook=chain.hook,
+      policy=chain.policy,
+      rules=chain.rules,
+    )
+  busiest = [chain for chain in ruleset.busiest(CHAIN_LIMIT) if chain.rules and not chain.base]
+  if busiest:
+    ctx.info("Largest chains: " + ", ".join(f"{chain.table}/{chain.name} ({chain.rules})" for chain in busiest))
+
+  default_deny = ruleset.input_default_deny()
+  if default_deny is None:
+    ctx.warn("No input filter chain found; inbound IPv4 traffic is not filtered on this host.", rule="net.input_unfiltered", firewall=ruleset.backend)
+  elif default_deny:
+    ctx.info("Inbound IPv4 traffic is denied by default (drop policy or final catch-all drop/reject).", rule="net.input_default_deny", firewall=ruleset.backend)
+  else:
+    ctx.warn("Inbound IPv4 traffic is accepted by default (accept policy and no final catch-all drop/reject).", rule="net.input_default_accept", firewall=ruleset.backend)
 
 
-def run(ctx: CheckContext) -> None:
+async def run(ctx: CheckContext) -> None:
   ctx.section("Network & firewall")
   _check_ports(ctx)
-  _check_firewall(ctx)
+  await _check_firewall(ctx)
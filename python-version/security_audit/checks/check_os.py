@@ -2,36 +2,36 @@ from __future__ import annotations
 
 import platform
 import socket
-from pathlib import Path
 
 from ..logging_utils import CheckContext
 
 
-def _read_os_release() -> str | None:
-  path = Path("/etc/os-release")
-  if not path.exists():
-    return None
-  data: dict[str, str] = {}
-  with path.open(encoding="utf-8", errors="ignore") as handle:
-    for line in handle:
-      if "=" not in line:
-        continue
-      key, value = line.rstrip().split("=", 1)
-      data[key] = value.strip().strip('"')
-  pretty = data.get("PRETTY_NAME") or data.get("NAME")
-  return pretty
+def _os_name(ctx: CheckContext) -> str | None:
+  data = ctx.facts.os_release()
+  return data.get("PRETTY_NAME") or data.get("NAME")
 
 
-def run(ctx: CheckContext) -> None:
-  ctx.section("Host & OS")
+def _live_host(ctx: CheckContext) -> None:
   hostname = socket.gethostname()
   kernel = platform.release()
-  os_name = _read_os_release() or platform.system()
+  os_name = _os_name(ctx) or platform.system()
 
   ctx.info(f"Hostname: {hostname}")
   ctx.info(f"OS:       {os_name}")
   ctx.info(f"Kernel:   {kernel}")
 
-  reboot_flag = Path("/var/run/reboot-required")
+
+def run(ctx: CheckContext) -> None:
+  ctx.section("Host & OS")
+  if ctx.facts.image is not None:
+    ctx.info(f"Image:    {ctx.facts.image.name} ({ctx.facts.image.layers} layers)")
+    ctx.info(f"OS:       {_os_name(ctx) or 'unknown (no /etc/os-release)'}")
+  elif ctx.options.root is not None:
+    ctx.info(f"Root:     {ctx.options.root}")
+    ctx.info(f"OS:       {_os_name(ctx) or 'unknown (no /etc/os-release)'}")
+  else:
+    _live_host(ctx)
+
+  reboot_flag = ctx.path("/var/run/reboot-required")
   if reboot_flag.exists():
-    ctx.warn(f"System indicates a reboot is required ({reboot_flag}).")
+    ctx.warn(f"System indicates a reboot is required ({reboot_flag}).", rule="os.reboot_required", path=str(reboot_flag))
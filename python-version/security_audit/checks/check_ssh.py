@@ -1,58 +1,68 @@
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Optional
-
+from .. import sshconfig
+from ..config import cache_dir
 from ..logging_utils import CheckContext
 
 
-def _conf_val(path: Path, key: str) -> Optional[str]:
-  key = key.lower()
-  value: Optional[str] = None
-  try:
-    with path.open(encoding="utf-8", errors="ignore") as handle:
-      for line in handle:
-        stripped = line.strip()
-        if not stripped or stripped.startswith("#"):
-          continue
-        parts = stripped.split()
-        if parts[0].lower() == key and len(parts) > 1:
-          value = parts[1].lower()
-  except FileNotFoundError:
-    return None
-  return value
+def _load(ctx: CheckContext) -> sshconfig.SshdConfig:
+  if ctx.options.root is not None:
+    return sshconfig.load(ctx.path(sshconfig.SSHD_CONFIG), root=ctx.options.root)
+  if ctx.options.sshd_test and ctx.facts.has_command("sshd"):
+    try:
+      return sshconfig.effective()
+    except sshconfig.SshConfigError as exc:
+      ctx.info(f"{exc}; parsing {sshconfig.SSHD_CONFIG} instead.")
+  return sshconfig.load(sshconfig.SSHD_CONFIG, cache_dir() / sshconfig.CACHE_NAME)
+
+
+def _check_match_overrides(ctx: CheckContext, config: sshconfig.SshdConfig) -> None:
+  for block, value in config.overrides("PermitRootLogin"):
+    if value.lower() == "yes":
+      ctx.crit(f"PermitRootLogin YES inside 'Match {block.criteria}' ({block.source}).", rule="ssh.permit_root_login", value="yes", match=block.criteria)
+  for block, value in config.overrides("PasswordAuthentication"):
+    if value.lower() == "yes":
+      ctx.warn(f"PasswordAuthentication YES inside 'Match {block.criteria}' ({block.source}).", rule="ssh.password_authentication", value="yes", match=block.criteria)
+  for block, value in config.overrides("PermitEmptyPasswords"):
+    if value.lower() == "yes":
+      ctx.crit(f"PermitEmptyPasswords YES inside 'Match {block.criteria}' ({block.source}).", rule="ssh.permit_empty_passwords", value="yes", match=block.criteria)
 
 
 def run(ctx: CheckContext) -> None:
   ctx.section("SSH configuration")
-  sshd_cfg = Path("/etc/ssh/sshd_config")
-  if not sshd_cfg.exists():
-    ctx.info("No /etc/ssh/sshd_config found (sshd may not be running on this host).")
+  if not ctx.path(sshconfig.SSHD_CONFIG).exists():
+    ctx.info(f"No {sshconfig.SSHD_CONFIG} found (sshd may not be running on this host).")
     return
 
-  ctx.info(f"Evaluating {sshd_cfg}")
+  config = _load(ctx)
+  included = len(config.files) - 1
+  ctx.info(f"Evaluating {config.source}" + (f" (+{included} included files)" if included > 0 else ""))
 
-  permit_root = _conf_val(sshd_cfg, "PermitRootLogin")
-  password_auth = _conf_val(sshd_cfg, "PasswordAuthentication")
-  empty_pw = _conf_val(sshd_cfg, "PermitEmptyPasswords")
-  protocol = _conf_val(sshd_cfg, "Protocol")
+  permit_root = (config.get("PermitRootLogin") or "").lower() or None
+  password_auth = (config.get("PasswordAuthentication") or "").lower() or None
+  empty_pw = (config.get("PermitEmptyPasswords") or "").lower() or None
+  protocol = (config.get("Protocol") or "").lower() or None
 
   if permit_root == "yes":
-    ctx.crit("PermitRootLogin is YES – root over SSH is high risk.")
+    ctx.crit("PermitRootLogin is YES – root over SSH is high risk.", rule="ssh.permit_root_login", value=permit_root)
   elif permit_root:
     ctx.info(f"PermitRootLogin={permit_root}")
   else:
-    ctx.warn("PermitRootLogin not set – verify distribution default (often 'prohibit-password').")
+    ctx.warn("PermitRootLogin not set – verify distribution default (often 'prohibit-password').", rule="ssh.permit_root_login_unset")
 
   if password_auth == "yes":
-    ctx.warn("PasswordAuthentication=YES – consider key-only auth for servers.")
+    ctx.warn("PasswordAuthentication=YES – consider key-only auth for servers.", rule="ssh.password_authentication", value=password_auth)
   elif password_auth == "no":
     ctx.info("PasswordAuthentication=NO (keys-only auth enforced).")
   else:
-    ctx.warn("PasswordAuthentication not explicitly set – check defaults.")
+    ctx.warn("PasswordAuthentication not explicitly set – check defaults.", rule="ssh.password_authentication_unset")
 
   if empty_pw == "yes":
-    ctx.crit("PermitEmptyPasswords=YES – extremely dangerous.")
+    ctx.crit("PermitEmptyPasswords=YES – extremely dangerous.", rule="ssh.permit_empty_passwords", value=empty_pw)
 
   if protocol and protocol != "2":
-    ctx.crit("SSH Protocol not restricted to 2.")
+    ctx.crit("SSH Protocol not restricted to 2.", rule="ssh.protocol", value=protocol)
+
+  if config.matches:
+    ctx.info(f"{len(config.matches)} Match block(s) found; checking them for overrides.")
+    _check_match_overrides(ctx, config)
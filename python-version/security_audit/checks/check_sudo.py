@@ -1,62 +1,90 @@
 from __future__ import annotations
 
-import os
-import pwd
-import re
-from pathlib import Path
+from typing import Dict, List
 
+from .. import accounts, sudoers
+from ..config import cache_dir
 from ..logging_utils import CheckContext
 
 
-NOPASSWD_RE = re.compile(r"^[^#].*NOPASSWD", re.IGNORECASE)
-
+def _check_sudoers(ctx: CheckContext) -> None:
+  root_file = ctx.path(sudoers.SUDOERS)
+  if ctx.options.root is not None:
+    # The on-disk parse cache holds the live host's files.
+    policy = sudoers.load(root_file, root=ctx.options.root)
+  else:
+    cache_path = cache_dir() / sudoers.CACHE_NAME
+    cache = sudoers.ParseCache.load(cache_path)
+    policy = sudoers.load(root_file, cache)
+    try:
+      cache.save()
+    except OSError as exc:
+      ctx.info(f"Could not save sudoers parse cache {cache_path}: {exc}")
 
-def _scan_sudo_file(path: Path, ctx: CheckContext) -> None:
-  if not path.exists():
-    return
-  try:
-    lines = path.read_text(encoding="utf-8", errors="ignore").splitlines()
-  except PermissionError:
-    ctx.warn(f"{path} not readable; cannot assess sudo rules.")
+  for path, problem in policy.problems:
+    if problem == "unreadable":
+      ctx.warn(f"{path} not readable; cannot assess sudo rules.", rule="sudo.sudoers_unreadable", path=path)
+    elif path != str(root_file) or problem != "missing":
+      ctx.info(f"Skipped {path}: {problem}", path=path)
+  if not policy.files:
     return
+  ctx.info(
+    f"sudoers: {len(policy.files)} files, {len(policy.rules)} rules, {len(policy.aliases)} aliases.",
+    files=len(policy.files),
+    rules=len(policy.rules),
+    aliases=len(policy.aliases),
+  )
 
-  hits = [line.strip() for line in lines if NOPASSWD_RE.search(line)]
-  if not hits:
-    return
+  for kind, scope, source in policy.authenticate_disabled():
+    who = f"Defaults{kind}{','.join(scope)}" if scope else "Defaults"
+    ctx.crit(f"Authentication disabled by '{who} !authenticate' ({source}).", rule="sudo.authenticate_disabled", source=source, scope=list(scope))
 
-  ctx.warn(f"NOPASSWD entries in {path}:")
-  for line in hits:
-    ctx.info(f"  {line}")
-    if "NOPASSWD: ALL" in line and "ALL" in line:
-      ctx.crit(f"Very broad NOPASSWD rule detected in {path} (ALL=(ALL) NOPASSWD: ALL).")
+  entries: Dict[str, List[str]] = {}
+  for rule in policy.nopasswd_rules():
+    lines = entries.setdefault(rule.path, [])
+    if rule.entry not in lines:
+      lines.append(rule.entry)
+  for path, lines in entries.items():
+    ctx.warn(f"NOPASSWD entries in {path}:", rule="sudo.nopasswd", path=path, count=len(lines))
+    for line in lines:
+      ctx.info(f"  {line}", path=path)
+
+  for principal, rules in policy.nopasswd_all().items():
+    sources = sorted({rule.source for rule in rules})
+    ctx.crit(
+      f"{principal} may run ALL commands without a password ({', '.join(sources)}).",
+      rule="sudo.nopasswd_all",
+      principal=principal,
+      sources=sources,
+      entry=rules[0].entry,
+    )
 
 
 def run(ctx: CheckContext) -> None:
   ctx.section("Users & sudo")
 
-  uid0_accounts = [entry.pw_name for entry in pwd.getpwall() if entry.pw_uid == 0]
+  table = ctx.facts.accounts(ctx.options.nss_timeout)
+  if table.nss == "timeout":
+    ctx.warn(
+      f"NSS account enumeration exceeded {ctx.options.nss_timeout:g}s; only local accounts were checked.",
+      rule="sudo.nss_timeout",
+      timeout=ctx.options.nss_timeout,
+    )
+  elif table.nss == "error":
+    ctx.warn("NSS account enumeration failed; only local accounts were checked.", rule="sudo.nss_failed")
+
+  uid0_accounts = table.uid0()
   ctx.info(f"UID 0 accounts: {' '.join(uid0_accounts) if uid0_accounts else '(none)'}")
   if any(user != "root" for user in uid0_accounts):
-    ctx.crit("Non-root account(s) with UID 0 detected – high risk.")
+    ctx.crit("Non-root account(s) with UID 0 detected – high risk.", rule="sudo.uid0_non_root", accounts=uid0_accounts)
 
-  shadow = Path("/etc/shadow")
-  if shadow.exists():
-    try:
-      locked = []
-      with shadow.open(encoding="utf-8", errors="ignore") as handle:
-        for line in handle:
-          parts = line.split(":")
-          if len(parts) > 1 and parts[1].startswith(("!", "*")):
-            locked.append(parts[0])
-      ctx.info(f"Locked/disabled accounts (shadow): {' '.join(locked) if locked else '(none)'}")
-    except PermissionError:
-      ctx.warn("/etc/shadow not readable; password state checks incomplete.")
+  shadow = str(accounts.SHADOW)
+  if table.shadow is None:
+    locked = table.with_password(accounts.LOCKED)
+    ctx.info(f"Locked/disabled accounts (shadow): {' '.join(locked) if locked else '(none)'}")
+  elif table.shadow == "unreadable":
+    ctx.warn("/etc/shadow not readable; password state checks incomplete.", rule="sudo.shadow_unreadable", path=shadow)
   else:
-    ctx.warn("/etc/shadow not found; password state checks incomplete.")
-
-  _scan_sudo_file(Path("/etc/sudoers"), ctx)
-  sudoers_d = Path("/etc/sudoers.d")
-  if sudoers_d.is_dir():
-    for file_path in sorted(sudoers_d.iterdir()):
-      if file_path.is_file():
-        _scan_sudo_file(file_path, ctx)
+    ctx.warn("/etc/shadow not found; password state checks incomplete.", rule="sudo.shadow_missing", path=shadow)
+
+  _check_sudoers(ctx)
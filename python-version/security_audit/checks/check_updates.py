@@ -1,65 +1,134 @@
 from __future__ import annotations
 
+from .. import debpkg
 from ..logging_utils import CheckContext
-from ..utils import command_exists, run_command
+from ..utils import run_command, stream_command
 
 
-def _apt_updates(ctx: CheckContext) -> None:
-  ctx.info("Detected apt-based system.")
+SHOW_LIMIT = 20
 
-  if command_exists("unattended-upgrades"):
-    ctx.info("unattended-upgrades installed (automatic security updates available).")
 
-  if not command_exists("apt"):
+def _apt_updates_native(ctx: CheckContext) -> bool:
+  """Compare dpkg's status file with the apt lists in-process; False when the CLI is needed."""
+  try:
+    upgrades = debpkg.upgradable(ctx.path(debpkg.DPKG_STATUS), ctx.path(debpkg.APT_LISTS))
+  except Exception as exc:  # pylint: disable=broad-except
+    ctx.logger.debug("Native dpkg/apt lists reader failed", exc)
+    return False
+  if upgrades is None:
+    return False
+
+  ctx.info("Checking for upgradable packages (dpkg status vs. apt package lists)...")
+  if not upgrades:
+    ctx.info("No upgradable packages found.")
+    return True
+
+  security = [upgrade for upgrade in upgrades if upgrade.security]
+  ctx.warn(
+    f"{len(upgrades)} packages available for upgrade, {len(security)} from security pockets (showing first {SHOW_LIMIT}):",
+    rule="updates.pending",
+    manager="apt",
+    count=len(upgrades),
+    security=len(security),
+  )
+  # Security updates first so they are never hidden behind the limit.
+  shown = sorted(upgrades, key=lambda upgrade: not upgrade.security)[:SHOW_LIMIT]
+  for upgrade in shown:
+    ctx.info(f"  {upgrade.apt_line()}", rule="updates.pending", package=upgrade.name, security=upgrade.security)
+  if len(upgrades) > SHOW_LIMIT:
+    ctx.info(f"  ... {len(upgrades) - SHOW_LIMIT} more packages pending.")
+  if security:
+    ctx.warn(
+      f"{len(security)} pending upgrades come from security pockets.",
+      rule="updates.security_pending",
+      manager="apt",
+      count=len(security),
+      packages=[upgrade.name for upgrade in security],
+    )
+  return True
+
+
+def _apt_updates_cli(ctx: CheckContext) -> None:
+  if not ctx.facts.has_command("apt"):
     return
 
   ctx.info("Checking for upgradable packages (apt list --upgradable)...")
   try:
-    result = run_command(["apt", "list", "--upgradable"])
+    # First line is apt's "Listing..." header.
+    with stream_command(["apt", "list", "--upgradable"], max_lines=SHOW_LIMIT + 1) as stream:
+      output = list(stream)
   except Exception as exc:  # pylint: disable=broad-except
-    ctx.warn(f"Failed to list apt upgrades: {exc}")
+    ctx.warn(f"Failed to list apt upgrades: {exc}", rule="updates.query_failed", manager="apt")
     return
 
-  lines = [line for line in result.stdout.splitlines()[1:21] if line.strip()]
+  lines = [line for line in output[1:] if line.strip()]
   if lines:
-    ctx.warn("Packages available for upgrade (showing first 20):")
+    ctx.warn(f"Packages available for upgrade (showing first {SHOW_LIMIT}):", rule="updates.pending", manager="apt")
     for line in lines:
-      ctx.info(f"  {line}")
+      ctx.info(f"  {line}", rule="updates.pending", package=line.split("/", 1)[0])
+    if stream.truncated:
+      ctx.info("  ... more packages pending (list truncated).")
   else:
     ctx.info("No upgradable packages found (or unable to list).")
 
 
+def _apt_updates(ctx: CheckContext) -> None:
+  ctx.info("Detected apt-based system.")
+
+  if ctx.facts.has_command("unattended-upgrades"):
+    ctx.info("unattended-upgrades installed (automatic security updates available).")
+
+  if not _apt_updates_native(ctx):
+    _apt_updates_cli(ctx)
+
+
 def _dnf_updates(ctx: CheckContext) -> None:
   ctx.info("Detected dnf-based system.")
   ctx.info("Checking for security updates (dnf updateinfo list security)...")
   try:
     result = run_command(["dnf", "updateinfo", "list", "security"])
   except Exception as exc:  # pylint: disable=broad-except
-    ctx.warn(f"Failed to query dnf updateinfo: {exc}")
+    ctx.warn(f"Failed to query dnf updateinfo: {exc}", rule="updates.query_failed", manager="dnf")
     return
 
   lines = [line for line in result.stdout.splitlines() if line.strip()]
   if any("Important/" in line or "Critical/" in line for line in lines):
-    ctx.crit("Important/Critical security updates are pending:")
-    for line in lines[:20]:
-      ctx.info(f"  {line}")
+    ctx.crit("Important/Critical security updates are pending:", rule="updates.security_critical", manager="dnf", count=len(lines))
+    for line in lines[:SHOW_LIMIT]:
+      ctx.info(f"  {line}", advisory=line.split()[0])
   elif lines:
-    ctx.warn("Security updates are available (none flagged as Important/Critical in first lines).")
-    for line in lines[:20]:
-      ctx.info(f"  {line}")
+    ctx.warn("Security updates are available (none flagged as Important/Critical in first lines).", rule="updates.security_pending", manager="dnf", count=len(lines))
+    for line in lines[:SHOW_LIMIT]:
+      ctx.info(f"  {line}", advisory=line.split()[0])
   else:
     ctx.info("No security updates reported by dnf updateinfo.")
 
 
+def _offline_updates(ctx: CheckContext) -> None:
+  """Root filesystem audit: only the package databases on disk can be consulted."""
+  if ctx.path(debpkg.DPKG_STATUS).exists():
+    ctx.info("Detected dpkg database.")
+    if not _apt_updates_native(ctx):
+      ctx.info("No apt package lists in this root; pending upgrades cannot be computed offline.")
+  elif ctx.path("/var/lib/rpm").exists():
+    ctx.info("Detected rpm database; offline update assessment only supports dpkg/apt.")
+  else:
+    ctx.warn("No package database found; cannot assess updates.", rule="updates.no_package_manager")
+
+
 def run(ctx: CheckContext) -> None:
   ctx.section("Package updates")
+  if ctx.options.root is not None:
+    _offline_updates(ctx)
+    return
 
-  if command_exists("apt-get"):
+  manager = ctx.facts.package_manager()
+  if manager == "apt":
     _apt_updates(ctx)
-  elif command_exists("dnf"):
+  elif manager == "dnf":
     _dnf_updates(ctx)
-  elif command_exists("yum"):
+  elif manager == "yum":
     ctx.info("Detected yum-based system.")
-    ctx.warn("Please review 'yum check-update' output manually for pending updates.")
+    ctx.warn("Please review 'yum check-update' output manually for pending updates.", rule="updates.manual_review", manager="yum")
   else:
-    ctx.warn("Unknown/no package manager detected; cannot assess updates.")
+    ctx.warn("Unknown/no package manager detected; cannot assess updates.", rule="updates.no_package_manager")
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass
+class RunOptions:
+  """Runtime switches selected on the command line for a single audit run."""
+
+  jobs: int = 1
+  full_rescan: bool = False
+  trace: Path | None = None
+  format: str = "text"
+  ndjson_file: Path | None = None
+  use_cache: bool = True
+  # Seconds allowed for NSS-wide account enumeration (LDAP/SSSD); None reads only /etc/passwd.
+  nss_timeout: float | None = None
+  # Audit an extracted/mounted root filesystem instead of the live host (file-based checks only).
+  root: Path | None = None
+  # Evaluate SSH settings from `sshd -T` instead of parsing sshd_config.
+  sshd_test: bool = False
+  # Ports allowed to listen on all interfaces; None disables net.unexpected_listener.
+  allowed_ports: frozenset[int] | None = None
+  # SQLite run history to append to; None keeps no history.
+  history: Path | None = None
+  # Report only findings new or resolved since the previous run ("last") or since an ISO time/age.
+  diff_since: str | None = None
+
+
+@dataclass
+class FleetOptions:
+  """Switches for auditing many targets (--fleet); per-check switches are forwarded to each target."""
+
+  transport: str = "ssh"
+  jobs: int = 32
+  # Seconds a single target may take, connection and package upload included.
+  host_timeout: float | None = 600
+  format: str = "text"
+  ndjson_file: Path | None = None
+  history: Path | None = None
+
+
+@dataclass
+class DaemonOptions:
+  """Switches for --daemon; `socket` defaults to cache_dir()/daemon.sock."""
+
+  socket: Path | None = None
+  # Seconds between full sweeps; watched inputs trigger targeted re-runs in between.
+  sweep_interval: float = 3600
+
+
+@dataclass
+class GovernorOptions:
+  """Resource limits for the audit process and everything it starts (--nice, --ionice-idle, --cpu-limit, ...)."""
+
+  nice: int | None = None
+  ionice_idle: bool = False
+  # Transient cgroup v2 limits: percent of one CPU, and bytes/s read and written on the root filesystem's disk.
+  cpu_percent: float | None = None
+  io_bps: int | None = None
+  # Directory entries per second the in-process scanners (fswalk, procnet) may visit.
+  scan_rate: float | None = None
+
+  @property
+  def enabled(self) -> bool:
+    return bool(self.nice or self.ionice_idle or self.cpu_percent or self.io_bps or self.scan_rate)
+
+
+def rooted(path: str | Path, root: Path | None) -> Path:
+  """`path` (absolute, as on the live host) inside `root`, or unchanged without a root."""
+  return Path(root, str(path).lstrip("/")) if root is not None else Path(path)
+
+
+def log_dir() -> Path:
+  return Path(os.environ.get("LOG_DIR", Path(__file__).resolve().parents[1] / "logs"))
+
+
+def cache_dir() -> Path:
+  """Directory for state kept between runs (SECURITY_AUDIT_CACHE_DIR or LOG_DIR/cache)."""
+  path = Path(os.environ.get("SECURITY_AUDIT_CACHE_DIR", log_dir() / "cache"))
+  path.mkdir(parents=True, exist_ok=True)
+  return path
+
+
+def history_file() -> Path:
+  """Default run history database (LOG_DIR/history.sqlite3)."""
+  return log_dir() / "history.sqlite3"
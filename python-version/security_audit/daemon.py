@@ -0,0 +1,326 @@
+"""
+Long-running audit daemon (--daemon).
+
+Findings are kept in memory per check. Checks whose inputs change on disk
+(`CheckSpec.watch_paths`) are re-run on their own; every check is re-run on
+a full sweep interval. The current posture is served on a unix socket, one
+request line per connection:
+
+  status            posture summary as one JSON document (the default)
+  findings          every current finding as NDJSON
+  rerun [CHECKS]    re-run the given checks (all when omitted), then reply as `status`
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from . import inotify
+from .config import DaemonOptions, RunOptions, cache_dir, rooted
+from .facts import HostFacts
+from .findings import Finding
+from .logging_utils import TeeLogger
+from .orchestrator import _exit_code, evaluate_check, resolve_log_paths
+from .registry import CheckSpec, select
+from .sinks import BackgroundFileSink
+
+
+MAX_REQUEST = 4096
+QUERY_TIMEOUT = 30
+# --status exit code when no daemon answers.
+STATUS_UNAVAILABLE = 3
+
+
+class DaemonError(Exception):
+  """The daemon could not start or could not be reached."""
+
+
+def default_socket() -> Path:
+  return cache_dir() / "daemon.sock"
+
+
+def _iso(timestamp: float | None) -> str | None:
+  return None if timestamp is None else datetime.fromtimestamp(timestamp).strftime("%Y-%m-%dT%H:%M:%S%z")
+
+
+@dataclass
+class CheckState:
+  """The latest result of one check, as served to clients."""
+
+  spec: CheckSpec
+  findings: List[Finding]
+  warn: int
+  crit: int
+  evaluated: float
+  duration: float
+  reason: str
+
+
+class _Handler(socketserver.StreamRequestHandler):
+  def handle(self) -> None:
+    daemon: AuditDaemon = self.server.audit_daemon  # type: ignore[attr-defined]
+    words = self.rfile.readline(MAX_REQUEST).decode("utf-8", "replace").split()
+    command, args = (words[0].lower(), words[1:]) if words else ("status", [])
+    try:
+      if command == "findings":
+        payload = "".join(f"{line}\n" for line in daemon.records())
+      elif command in ("status", "rerun"):
+        if command == "rerun":
+          daemon.rerun(args)
+        payload = json.dumps(daemon.posture()) + "\n"
+      else:
+        payload = json.dumps({"error": f"unknown request {command!r}"}) + "\n"
+    except ValueError as exc:
+      payload = json.dumps({"error": str(exc)}) + "\n"
+    self.wfile.write(payload.encode("utf-8"))
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+  daemon_threads = True
+
+  def __init__(self, path: Path, audit_daemon: "AuditDaemon"):
+    self.audit_daemon = audit_daemon
+    super().__init__(str(path), _Handler)
+
+
+class _Stop(Exception):
+  pass
+
+
+def _stop(signum, frame) -> None:
+  raise _Stop()
+
+
+class AuditDaemon:
+  """Keeps check results in memory, re-running checks whose watched inputs change."""
+
+  def __init__(self, checks: Sequence[CheckSpec], options: RunOptions, daemon_options: DaemonOptions):
+    self.checks = list(checks)
+    self.options = options
+    self.socket_path = daemon_options.socket or default_socket()
+    self.sweep_interval = daemon_options.sweep_interval
+    self.host = socket.gethostname()
+    self.started = time.time()
+    self.last_sweep: float | None = None
+    self.reruns = 0
+    self.states: Dict[str, CheckState] = {}
+    # watched path -> names of the checks reading it
+    self.watches: Dict[str, List[str]] = {}
+    for spec in self.checks:
+      for path in spec.watch_paths:
+        self.watches.setdefault(str(rooted(os.path.expanduser(path), options.root)), []).append(spec.name)
+    self.logger: TeeLogger | None = None
+    self._lock = threading.Lock()
+    # Watch-triggered runs, sweeps and socket reruns never overlap.
+    self._evaluating = threading.Lock()
+    self._sweep_requested = False
+
+  def evaluate(self, specs: Sequence[CheckSpec], reason: str) -> None:
+    """Run `specs` against fresh host facts and replace their state."""
+    with self._evaluating:
+      facts = HostFacts(root=self.options.root)
+      debug = self.logger.debug_enabled if self.logger is not None else False
+
+      def _one(defn: CheckSpec):
+        start = time.perf_counter()
+        return defn, evaluate_check(defn, self.options, facts, debug), time.perf_counter() - start
+
+      if self.options.jobs > 1 and len(specs) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=self.options.jobs, thread_name_prefix="check") as pool:
+          results = list(pool.map(_one, specs))
+      else:
+        results = [_one(defn) for defn in specs]
+
+      now = time.time()
+      for defn, context, duration in results:
+        findings = [args[0] for method, args in context.logger.entries if method == "finding"]
+        with self._lock:
+          self.states[defn.name] = CheckState(defn, findings, context.warn_count, context.crit_count, now, duration, reason)
+        if self.logger is not None:
+          self.logger.sep(f"{defn.label} ({reason})")
+          context.logger.replay(self.logger)
+          self.logger.check_summary(defn.label, context.warn_count, context.crit_count)
+
+  def sweep(self, reason: str) -> None:
+    self.evaluate(self.checks, reason)
+    self.last_sweep = time.time()
+
+  def rerun(self, selectors: Sequence[str]) -> None:
+    """Re-run the checks matching `selectors` (all when empty); ValueError for unknown names."""
+    specs = select(only=selectors, checks=self.checks) if selectors else self.checks
+    self.evaluate(specs, "requested")
+    with self._lock:
+      self.reruns += 1
+
+  def affected(self, paths) -> Dict[str, List[str]]:
+    """Names of the checks watching any of `paths`, each with the paths that concern it."""
+    changed: Dict[str, List[str]] = {}
+    for path in sorted(paths):
+      for name in self.watches.get(path, ()):
+        changed.setdefault(name, []).append(path)
+    return changed
+
+  def posture(self) -> dict:
+    with self._lock:
+      states = [self.states[spec.name] for spec in self.checks if spec.name in self.states]
+      reruns = self.reruns
+    warn = sum(state.warn for state in states)
+    crit = sum(state.crit for state in states)
+    return {
+      "host": self.host,
+      "started": _iso(self.started),
+      "last_sweep": _iso(self.last_sweep),
+      "reruns": reruns,
+      "exit": _exit_code(warn, crit),
+      "warn": warn,
+      "crit": crit,
+      "checks": [
+        {
+          "name": state.spec.name,
+          "label": state.spec.label,
+          "warn": state.warn,
+          "crit": state.crit,
+          "evaluated": _iso(state.evaluated),
+          "duration": round(state.duration, 3),
+          "reason": state.reason,
+        }
+        for state in states
+      ],
+    }
+
+  def records(self) -> List[str]:
+    """Current findings as NDJSON lines, `ts` being when each check last ran."""
+    with self._lock:
+      states = [self.states[spec.name] for spec in self.checks if spec.name in self.states]
+    return [finding.to_json(host=self.host, ts=_iso(state.evaluated)) for state in states for finding in state.findings]
+
+  def _bind(self) -> _Server:
+    path = self.socket_path
+    if path.exists() or path.is_symlink():
+      try:
+        query(path, "status", timeout=2)
+      except DaemonError:
+        path.unlink()  # left behind by a daemon that did not shut down cleanly
+      else:
+        raise DaemonError(f"another daemon is already listening on {path}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Findings are sensitive: the socket is only reachable by this user.
+    previous = os.umask(0o177)
+    try:
+      return _Server(path, self)
+    finally:
+      os.umask(previous)
+
+  def _request_sweep(self, signum, frame) -> None:
+    self._sweep_requested = True
+
+  def serve(self) -> int:
+    """Run until SIGINT/SIGTERM; SIGHUP forces a full sweep."""
+    server = self._bind()
+    serving = threading.Thread(target=server.serve_forever, name="daemon-socket", daemon=True)
+    log_file, _ = resolve_log_paths()
+    wake_read, wake_write = os.pipe()
+    os.set_blocking(wake_read, False)
+    os.set_blocking(wake_write, False)
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP)}
+    previous_wakeup = -1
+    with TeeLogger(log_file, console=self.options.format) as logger:
+      self.logger = logger
+      if self.options.ndjson_file:
+        logger.add_record_sink(BackgroundFileSink(self.options.ndjson_file))
+      logger.banner("DevSecOps Security Orchestrator (daemon)", Path(__file__).resolve().parents[1], log_file)
+      try:
+        signal.signal(signal.SIGINT, _stop)
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGHUP, self._request_sweep)
+        # Wakes the watcher on SIGHUP instead of waiting out its timeout.
+        previous_wakeup = signal.set_wakeup_fd(wake_write)
+        # Watches go in first so changes made during the initial sweep are not missed.
+        with inotify.watcher(self.watches) as watcher:
+          self.sweep("initial sweep")
+          # Clients that connected during the sweep wait in the listen backlog until now.
+          serving.start()
+          logger.info(
+            f"Listening on {self.socket_path}; watching {len(self.watches)} paths with {type(watcher).__name__}; "
+            f"full sweep every {self.sweep_interval:g}s."
+          )
+          next_sweep = time.monotonic() + self.sweep_interval
+          while True:
+            changed = watcher.wait(max(0.0, next_sweep - time.monotonic()), wake_read)
+            try:
+              while os.read(wake_read, 512):
+                pass
+            except BlockingIOError:
+              pass
+            if self._sweep_requested or time.monotonic() >= next_sweep:
+              reason = "SIGHUP" if self._sweep_requested else "scheduled sweep"
+              self._sweep_requested = False
+              self.sweep(reason)
+              next_sweep = time.monotonic() + self.sweep_interval
+            elif changed:
+              affected = self.affected(changed)
+              for spec in self.checks:
+                if spec.name in affected:
+                  self.evaluate([spec], "changed: " + ", ".join(affected[spec.name]))
+      except _Stop:
+        logger.info("Stopping daemon.")
+      finally:
+        signal.set_wakeup_fd(previous_wakeup)
+        for sig, handler in handlers.items():
+          signal.signal(sig, handler)
+        if serving.is_alive():
+          server.shutdown()
+        server.server_close()
+        try:
+          self.socket_path.unlink()
+        except FileNotFoundError:
+          pass
+        os.close(wake_read)
+        os.close(wake_write)
+        self.logger = None
+    return 0
+
+
+def query(path: Path, request: str = "status", timeout: float | None = QUERY_TIMEOUT) -> str:
+  """Send one request line to the daemon at `path` and return its reply."""
+  try:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+      conn.settimeout(timeout)
+      conn.connect(str(path))
+      conn.sendall(request.encode("utf-8") + b"\n")
+      conn.shutdown(socket.SHUT_WR)
+      chunks = []
+      while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+          break
+        chunks.append(chunk)
+  except OSError as exc:
+    raise DaemonError(f"no daemon answering on {path}: {exc}") from exc
+  return b"".join(chunks).decode("utf-8")
+
+
+def format_posture(posture: dict) -> str:
+  lines = [
+    f"Posture of {posture['host']} (daemon since {posture['started']}, last full sweep {posture['last_sweep']}, "
+    f"{posture['reruns']} requested re-runs):"
+  ]
+  for check in posture["checks"]:
+    lines.append(f"  {check['label']:<18} WARN={check['warn']:<3} CRIT={check['crit']:<3} {check['evaluated']} ({check['reason']})")
+  lines.append(f"Overall: WARN={posture['warn']} CRIT={posture['crit']}")
+  return "\n".join(lines)
+
+
+__all__ = ["AuditDaemon", "CheckState", "DaemonError", "default_socket", "format_posture", "query"]
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import itertools
+import mmap
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+
+DPKG_STATUS = Path("/var/lib/dpkg/status")
+APT_LISTS = Path("/var/lib/apt/lists")
+
+# Continuation lines start with whitespace, so a field name right after a
+# newline is a real field. Package is the first field of every stanza.
+# (Anchoring on a literal newline is several times faster than re.M and ^.)
+_FIELD_RE = re.compile(rb"\n(Package|Status|Version|Architecture):[ \t]*([^\n]*)")
+_DIGITS = frozenset("0123456789")
+# apt's default pin priorities (apt_preferences(5)): ordinary suites, the
+# installed version, and suites whose Release file says NotAutomatic (with
+# and without ButAutomaticUpgrades, e.g. backports and experimental).
+PRIORITY_DEFAULT = 500
+PRIORITY_INSTALLED = 100
+PRIORITY_BUT_AUTOMATIC_UPGRADES = 100
+PRIORITY_NOT_AUTOMATIC = 1
+
+PackageKey = Tuple[str, str]
+
+
+@dataclass
+class PackageIndex:
+  """One uncompressed `*_Packages` file from the apt lists directory."""
+
+  path: Path
+  suite: str
+  security: bool
+  priority: int = PRIORITY_DEFAULT
+
+
+@dataclass
+class Upgrade:
+  """An installed package with a newer version in the apt package lists."""
+
+  name: str
+  arch: str
+  installed: str
+  candidate: str
+  suite: str
+  security: bool
+
+  def apt_line(self) -> str:
+    """Same shape as one line of `apt list --upgradable`."""
+    return f"{self.name}/{self.suite} {self.candidate} {self.arch} [upgradable from: {self.installed}]"
+
+
+def _order(char: str) -> int:
+  if char in _DIGITS:
+    return 0
+  if char.isascii() and char.isalpha():
+    return ord(char)
+  if char == "~":
+    return -1
+  return ord(char) + 256
+
+
+def _compare_part(a: str, b: str) -> int:
+  """dpkg's verrevcmp(): alternate non-digit runs (with ~ sorting first) and numeric runs."""
+  i = j = 0
+  while i < len(a) or j < len(b):
+    while (i < len(a) and a[i] not in _DIGITS) or (j < len(b) and b[j] not in _DIGITS):
+      ac = _order(a[i]) if i < len(a) else 0
+      bc = _order(b[j]) if j < len(b) else 0
+      if ac != bc:
+        return ac - bc
+      i += 1
+      j += 1
+    start_a = i
+    while i < len(a) and a[i] in _DIGITS:
+      i += 1
+    start_b = j
+    while j < len(b) and b[j] in _DIGITS:
+      j += 1
+    diff = int(a[start_a:i] or 0) - int(b[start_b:j] or 0)
+    if diff:
+      return diff
+  return 0
+
+
+def _split_version(version: str) -> Tuple[int, str, str]:
+  epoch, sep, rest = version.partition(":")
+  if not sep:
+    epoch, rest = "0", version
+  upstream, sep, revision = rest.rpartition("-")
+  if not sep:
+    upstream, revision = rest, ""
+  return int(epoch or 0), upstream, revision
+
+
+def version_compare(a: str, b: str) -> int:
+  """Compare two Debian version strings; negative, zero or positive like dpkg --compare-versions."""
+  if a == b:
+    return 0
+  epoch_a, upstream_a, revision_a = _split_version(a)
+  epoch_b, upstream_b, revision_b = _split_version(b)
+  if epoch_a != epoch_b:
+    return epoch_a - epoch_b
+  return _compare_part(upstream_a, upstream_b) or _compare_part(revision_a, revision_b)
+
+
+@contextmanager
+def _mapped(path: Path) -> Iterator[bytes | mmap.mmap]:
+  with path.open("rb") as handle:
+    try:
+      data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+      # Empty files cannot be mapped.
+      yield b""
+      return
+    try:
+      yield data
+    finally:
+      data.close()
+
+
+def _iter_stanzas(path: Path) -> Iterator[Dict[bytes, bytes]]:
+  """Yield the fields this module needs from each stanza of a dpkg/apt control file."""
+  with _mapped(path) as data:
+    # The first line has no newline in front of it.
+    end = data.find(b"\n")
+    head = _FIELD_RE.finditer(b"\n" + data[: end if end >= 0 else len(data)])
+    record: Dict[bytes, bytes] | None = None
+    for match in itertools.chain(head, _FIELD_RE.finditer(data)):
+      field, value = match.groups()
+      if field == b"Package":
+        if record is not None:
+          yield record
+        record = {}
+      if record is not None:
+        record[field] = value.rstrip()
+    if record is not None:
+      yield record
+
+
+def _installed(status: Path) -> Dict[Tuple[bytes, bytes], bytes]:
+  installed = {}
+  for record in _iter_stanzas(status):
+    state = record.get(b"Status", b"").split()
+    if state and state[-1] == b"installed" and b"Version" in record:
+      installed[(record[b"Package"], record.get(b"Architecture", b"all"))] = record[b"Version"]
+  return installed
+
+
+def installed_packages(status: Path = DPKG_STATUS) -> Dict[PackageKey, str]:
+  """(name, arch) -> version for every package dpkg reports as installed."""
+  return {(name.decode(), arch.decode()): version.decode() for (name, arch), version in _installed(status).items()}
+
+
+def _release_priority(lists_dir: Path, prefix: str) -> int:
+  """Default pin priority of a suite from the NotAutomatic/ButAutomaticUpgrades fields of its (In)Release file."""
+  fields: Dict[str, str] = {}
+  for name in (f"{prefix}_InRelease", f"{prefix}_Release"):
+    try:
+      with (lists_dir / name).open(encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+          key, sep, value = line.partition(":")
+          # The checksum lists that follow the header are long; stop there.
+          if key in ("MD5Sum", "SHA1", "SHA256", "SHA512"):
+            break
+          if sep and key in ("NotAutomatic", "ButAutomaticUpgrades"):
+            fields[key] = value.strip().lower()
+    except OSError:
+      continue
+    break
+  if fields.get("NotAutomatic") != "yes":
+    return PRIORITY_DEFAULT
+  return PRIORITY_BUT_AUTOMATIC_UPGRADES if fields.get("ButAutomaticUpgrades") == "yes" else PRIORITY_NOT_AUTOMATIC
+
+
+def package_indexes(lists_dir: Path = APT_LISTS) -> List[PackageIndex]:
+  """Uncompressed Packages files: suite and security pocket from the file name, priority from the suite's Release file."""
+  indexes = []
+  try:
+    paths = sorted(lists_dir.glob("*_Packages"))
+  except OSError:
+    return indexes
+  priorities: Dict[str, int] = {}
+  for path in paths:
+    # e.g. security.ubuntu.com_ubuntu_dists_jammy-security_main_binary-amd64_Packages
+    site, _, after = path.name.partition("_dists_")
+    suite = after.split("_", 1)[0] if after else ""
+    priority = PRIORITY_DEFAULT
+    if suite:
+      prefix = f"{site}_dists_{suite}"
+      if prefix not in priorities:
+        priorities[prefix] = _release_priority(lists_dir, prefix)
+      priority = priorities[prefix]
+    indexes.append(PackageIndex(path, suite, suite.endswith("-security") or "security" in site.split("_", 1)[0], priority))
+  return indexes
+
+
+def upgradable(status: Path = DPKG_STATUS, lists_dir: Path = APT_LISTS) -> List[Upgrade] | None:
+  """Installed packages whose apt candidate is newer than the installed version, sorted by name.
+
+  Returns None when there are no uncompressed package lists to compare with
+  (e.g. apt configured with compressed lists, or `apt update` never run).
+  Candidates follow apt's default priorities: the installed version counts
+  100 (or the priority of a list still carrying it), NotAutomatic suites 1,
+  or 100 with ButAutomaticUpgrades, so backports only upgrade packages
+  installed from backports. Pins from apt_preferences(5) are not evaluated.
+  """
+  indexes = package_indexes(lists_dir)
+  if not indexes:
+    return None
+  # Stay in bytes until a package is known to be installed; most list entries are not.
+  installed = _installed(status)
+
+  # Priority of the installed version where a list still carries it (default: PRIORITY_INSTALLED).
+  installed_priority: Dict[Tuple[bytes, bytes], int] = {}
+  # Best newer version so far with its priority, and the highest priority of a security pocket offering a newer one.
+  best: Dict[Tuple[bytes, bytes], Tuple[int, Upgrade]] = {}
+  security: Dict[Tuple[bytes, bytes], int] = {}
+  for index in indexes:
+    for record in _iter_stanzas(index.path):
+      key = (record[b"Package"], record.get(b"Architecture", b"all"))
+      current = installed.get(key)
+      version = record.get(b"Version")
+      if current is None or version is None:
+        continue
+      if version == current:
+        if index.priority > installed_priority.get(key, PRIORITY_INSTALLED):
+          installed_priority[key] = index.priority
+        continue
+      version = version.decode()
+      found = best.get(key)
+      if found is None:
+        if version_compare(version, current.decode()) <= 0:
+          continue
+      elif index.priority < found[0] or version_compare(version, found[1].installed) <= 0:
+        continue
+      if index.security:
+        security[key] = max(security.get(key, 0), index.priority)
+      if found is None or index.priority > found[0] or version_compare(version, found[1].candidate) > 0:
+        best[key] = (index.priority, Upgrade(key[0].decode(), key[1].decode(), current.decode(), version, index.suite, index.security))
+
+  upgrades = []
+  for key, (priority, upgrade) in best.items():
+    floor = installed_priority.get(key, PRIORITY_INSTALLED)
+    if priority < floor:
+      continue
+    upgrade.security = security.get(key, 0) >= floor
+    upgrades.append(upgrade)
+  return sorted(upgrades, key=lambda upgrade: (upgrade.name, upgrade.arch))
+
+
+__all__ = ["PackageIndex", "Upgrade", "installed_packages", "package_indexes", "upgradable", "version_compare"]
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import queue
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Sequence
+from urllib.parse import quote
+
+
+DEFAULT_SOCKET = "/var/run/docker.sock"
+API_TIMEOUT = 30
+DEFAULT_WORKERS = 8
+
+
+class DockerAPIError(Exception):
+  """The Docker daemon answered with an HTTP error."""
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+  def __init__(self, socket_path: str, timeout: float):
+    super().__init__("localhost", timeout=timeout)
+    self.socket_path = socket_path
+
+  def connect(self) -> None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(self.timeout)
+    try:
+      sock.connect(self.socket_path)
+    except OSError:
+      sock.close()
+      raise
+    self.sock = sock
+
+
+def socket_from_env() -> str:
+  host = os.environ.get("DOCKER_HOST", "")
+  if host.startswith("unix://"):
+    return host[len("unix://"):]
+  return DEFAULT_SOCKET
+
+
+class DockerClient:
+  """Minimal Docker Engine API client talking HTTP/1.1 over the daemon's unix socket.
+
+  Connections are kept alive and pooled, so a run needs at most `workers`
+  connects no matter how many requests it makes; batched inspects are spread
+  over the pool concurrently.
+  """
+
+  def __init__(self, socket_path: str | None = None, timeout: float = API_TIMEOUT, workers: int = DEFAULT_WORKERS):
+    self.socket_path = socket_path or socket_from_env()
+    self.timeout = timeout
+    self.workers = max(1, workers)
+    self._idle: "queue.LifoQueue[_UnixHTTPConnection]" = queue.LifoQueue()
+
+  def __enter__(self) -> "DockerClient":
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.close()
+    return False
+
+  def available(self) -> bool:
+    return os.path.exists(self.socket_path)
+
+  def close(self) -> None:
+    while True:
+      try:
+        self._idle.get_nowait().close()
+      except queue.Empty:
+        return
+
+  def _request(self, conn: _UnixHTTPConnection, path: str) -> Any:
+    conn.request("GET", path, headers={"Host": "docker"})
+    response = conn.getresponse()
+    body = response.read()
+    if response.status >= 400:
+      raise DockerAPIError(f"GET {path} -> HTTP {response.status}: {body[:200].decode(errors='replace').strip()}")
+    return json.loads(body) if body else None
+
+  def get_json(self, path: str) -> Any:
+    try:
+      conn = self._idle.get_nowait()
+      reused = True
+    except queue.Empty:
+      conn = _UnixHTTPConnection(self.socket_path, self.timeout)
+      reused = False
+    try:
+      try:
+        result = self._request(conn, path)
+      except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+        if not reused:
+          raise
+        # The daemon closed an idle keep-alive connection; retry once on a fresh one.
+        conn.close()
+        result = self._request(conn, path)
+    except BaseException:
+      conn.close()
+      raise
+    self._idle.put(conn)
+    return result
+
+  def info(self) -> dict:
+    return self.get_json("/info")
+
+  def containers(self) -> List[dict]:
+    return self.get_json("/containers/json") or []
+
+  def inspect(self, container_id: str) -> dict:
+    return self.get_json(f"/containers/{quote(container_id, safe='')}/json")
+
+  def inspect_many(self, container_ids: Sequence[str]) -> List[dict | Exception]:
+    """Inspect containers concurrently; failures are returned in place of results."""
+
+    def _one(container_id: str) -> dict | Exception:
+      try:
+        return self.inspect(container_id)
+      except Exception as exc:  # pylint: disable=broad-except
+        return exc
+
+    if len(container_ids) <= 1:
+      return [_one(container_id) for container_id in container_ids]
+    with ThreadPoolExecutor(max_workers=min(self.workers, len(container_ids)), thread_name_prefix="docker-api") as pool:
+      return list(pool.map(_one, container_ids))
+
+
+__all__ = ["DockerAPIError", "DockerClient", "socket_from_env"]
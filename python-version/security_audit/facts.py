@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Sequence
+
+from .accounts import PASSWD, SHADOW, AccountTable, add_nss, read_files
+from .config import rooted
+from .utils import run_command
+
+if TYPE_CHECKING:
+  from .image import ImageSnapshot
+
+
+UNIT_PROPERTIES = ("Id", "LoadState", "ActiveState", "SubState")
+SYSTEMCTL_TIMEOUT = 15
+
+
+class HostFacts:
+  """Memoized host probes shared by every check in a run.
+
+  Safe to use from several threads: concurrent callers asking for the same
+  fact wait for a single computation. `hits`/`misses` count cache use.
+  With `root`, file-based facts are read from that root filesystem; `image`
+  is the snapshot being audited in --image mode.
+  """
+
+  def __init__(self, root: Path | None = None, image: ImageSnapshot | None = None):
+    self.root = root
+    self.image = image
+    self._lock = threading.Lock()
+    self._values: Dict[Hashable, Any] = {}
+    self._key_locks: Dict[Hashable, threading.Lock] = {}
+    self.hits = 0
+    self.misses = 0
+
+  def _memo(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+    with self._lock:
+      if key in self._values:
+        self.hits += 1
+        return self._values[key]
+      key_lock = self._key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+      with self._lock:
+        if key in self._values:
+          self.hits += 1
+          return self._values[key]
+        self.misses += 1
+      value = compute()
+      with self._lock:
+        self._values[key] = value
+    return value
+
+  def which(self, cmd: str) -> str | None:
+    return self._memo(("which", cmd), lambda: shutil.which(cmd))
+
+  def has_command(self, cmd: str) -> bool:
+    return self.which(cmd) is not None
+
+  def os_release(self) -> Dict[str, str]:
+    return self._memo("os-release", lambda: _read_os_release(rooted("/etc/os-release", self.root)))
+
+  def package_manager(self) -> str | None:
+    def _detect() -> str | None:
+      for cmd, name in (("apt-get", "apt"), ("dnf", "dnf"), ("yum", "yum")):
+        if self.has_command(cmd):
+          return name
+      return None
+
+    return self._memo("package-manager", _detect)
+
+  def accounts(self, nss_timeout: float | None = None) -> AccountTable:
+    """Local passwd/shadow accounts; NSS-only accounts are added when `nss_timeout` is given."""
+
+    def _read() -> AccountTable:
+      table = read_files(rooted(PASSWD, self.root), rooted(SHADOW, self.root))
+      # NSS describes the live host, not a root filesystem under audit.
+      return add_nss(table, nss_timeout) if nss_timeout is not None and self.root is None else table
+
+    return self._memo(("accounts", nss_timeout), _read)
+
+  def unit_states(self, units: Sequence[str]) -> Dict[str, Dict[str, str]]:
+    """`systemctl show` properties per unit; uncached units are fetched in one call."""
+    with self._lock:
+      states = {unit: self._values[("unit", unit)] for unit in units if ("unit", unit) in self._values}
+      self.hits += len(states)
+    missing = [unit for unit in units if unit not in states]
+    if missing:
+      fetched = _systemctl_show(missing) if self.has_command("systemctl") else {}
+      with self._lock:
+        self.misses += len(missing)
+        for unit in missing:
+          states[unit] = self._values.setdefault(("unit", unit), fetched.get(unit, {}))
+    return {unit: states[unit] for unit in units}
+
+  def unit_active(self, unit: str) -> bool:
+    return self.unit_states([unit])[unit].get("ActiveState") == "active"
+
+
+def _read_os_release(path: Path) -> Dict[str, str]:
+  data: Dict[str, str] = {}
+  if not path.exists():
+    return data
+  with path.open(encoding="utf-8", errors="ignore") as handle:
+    for line in handle:
+      if "=" not in line:
+        continue
+      key, value = line.rstrip().split("=", 1)
+      data[key] = value.strip().strip('"')
+  return data
+
+
+def _systemctl_show(units: Sequence[str]) -> Dict[str, Dict[str, str]]:
+  args = ["systemctl", "show", f"--property={','.join(UNIT_PROPERTIES)}", "--", *units]
+  try:
+    result = run_command(args, timeout=SYSTEMCTL_TIMEOUT)
+  except (OSError, subprocess.SubprocessError):
+    return {}
+  if result.returncode != 0:
+    return {}
+  # One block of KEY=VALUE lines per unit, separated by blank lines, in argument order.
+  states: Dict[str, Dict[str, str]] = {}
+  blocks = [block for block in result.stdout.split("\n\n") if block.strip()]
+  for unit, block in zip(units, blocks):
+    states[unit] = dict(line.split("=", 1) for line in block.splitlines() if "=" in line)
+  return states
+
+
+__all__ = ["HostFacts"]
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict
+
+
+INFO = "INFO"
+WARN = "WARN"
+CRIT = "CRIT"
+
+
+class Finding:
+  """One INFO/WARN/CRIT record emitted by a check."""
+
+  __slots__ = ("check", "severity", "message", "rule", "attrs")
+
+  def __init__(
+    self,
+    check: str,
+    severity: str,
+    message: str,
+    rule: str | None = None,
+    attrs: Dict[str, Any] | None = None,
+  ):
+    self.check = check
+    self.severity = severity
+    self.message = message
+    self.rule = rule
+    self.attrs = attrs or None
+
+  def __repr__(self) -> str:
+    return f"Finding({self.check!r}, {self.severity!r}, {self.message!r}, rule={self.rule!r}, attrs={self.attrs!r})"
+
+  def to_dict(self, **extra: Any) -> Dict[str, Any]:
+    record: Dict[str, Any] = dict(extra)
+    record["check"] = self.check
+    record["severity"] = self.severity
+    if self.rule:
+      record["rule"] = self.rule
+    record["message"] = self.message
+    if self.attrs:
+      record["attrs"] = self.attrs
+    return record
+
+  def to_json(self, **extra: Any) -> str:
+    return json.dumps(self.to_dict(**extra), separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+__all__ = ["CRIT", "Finding", "INFO", "WARN"]
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import IO, Dict, Iterable, List, Tuple
+
+from .facts import HostFacts
+from .jsonstream import iter_array_items
+from .utils import stream_command
+
+
+DENY_VERDICTS = ("drop", "reject")
+# iptables builtin chains and the netfilter hook they sit on.
+IPTABLES_HOOKS = {"PREROUTING": "prerouting", "INPUT": "input", "FORWARD": "forward", "OUTPUT": "output", "POSTROUTING": "postrouting"}
+# A rule that matches every packet: only a verdict, plus optional comment/counters.
+_CATCH_ALL_RE = re.compile(r"^-A \S+ (?:-m comment --comment (?:\"[^\"]*\"|\S+) )?-j (DROP|REJECT)(?: --reject-with \S+)?\s*$")
+# nft expressions that do not restrict which packets a rule applies to.
+_NFT_PASSIVE = frozenset(("counter", "log", "comment"))
+
+ChainKey = Tuple[str, str, str]
+
+
+class FirewallError(Exception):
+  """The ruleset could not be read."""
+
+
+@dataclass
+class Chain:
+  """Rule count and default behaviour of one chain; rules themselves are not kept."""
+
+  family: str
+  table: str
+  name: str
+  hook: str | None = None
+  policy: str | None = None
+  rules: int = 0
+  # Verdict of the last rule when it matches every packet (e.g. `-j DROP`).
+  final_verdict: str | None = None
+
+  @property
+  def base(self) -> bool:
+    return self.hook is not None
+
+  def denies_by_default(self) -> bool:
+    return self.policy in DENY_VERDICTS or self.final_verdict in DENY_VERDICTS
+
+
+class Ruleset:
+  """Compact model of a netfilter ruleset: chains with counts and policies."""
+
+  def __init__(self, backend: str):
+    self.backend = backend
+    self.chains: Dict[ChainKey, Chain] = {}
+
+  def chain(self, family: str, table: str, name: str) -> Chain:
+    key = (family, table, name)
+    chain = self.chains.get(key)
+    if chain is None:
+      chain = self.chains[key] = Chain(family, table, name)
+    return chain
+
+  @property
+  def rule_count(self) -> int:
+    return sum(chain.rules for chain in self.chains.values())
+
+  def base_chains(self) -> List[Chain]:
+    return sorted((chain for chain in self.chains.values() if chain.base), key=lambda chain: (chain.family, chain.table, chain.name))
+
+  def busiest(self, count: int = 5) -> List[Chain]:
+    return sorted(self.chains.values(), key=lambda chain: chain.rules, reverse=True)[:count]
+
+  def input_default_deny(self) -> bool | None:
+    """Whether IPv4 traffic to this host is dropped unless accepted; None without any input filter chain.
+
+    Every base chain on the input hook must accept a packet, so one chain
+    with a drop policy or a final catch-all drop/reject is enough.
+    """
+    chains = [chain for chain in self.chains.values() if chain.hook == "input" and chain.family in ("ip", "inet")]
+    if not chains:
+      return None
+    return any(chain.denies_by_default() for chain in chains)
+
+
+def parse_iptables_save(lines: Iterable[str], family: str = "ip") -> Ruleset:
+  """Build a Ruleset from `iptables-save` (or `ip6tables-save`, family "ip6") output in one pass."""
+  ruleset = Ruleset("iptables")
+  table = ""
+  for line in lines:
+    if line.startswith("["):
+      # `iptables-save -c` prefixes rules with [packets:bytes].
+      line = line.split("] ", 1)[-1]
+    if line.startswith("-A "):
+      name = line[3:].split(" ", 1)[0]
+      chain = ruleset.chain(family, table, name)
+      chain.rules += 1
+      if chain.base:
+        match = _CATCH_ALL_RE.match(line)
+        chain.final_verdict = match.group(1).lower() if match else None
+    elif line.startswith(":"):
+      name, policy = (line[1:].split() + ["-"])[:2]
+      chain = ruleset.chain(family, table, name)
+      if policy != "-":
+        chain.policy = policy.lower()
+        chain.hook = IPTABLES_HOOKS.get(name)
+    elif line.startswith("*"):
+      table = line[1:].strip()
+  return ruleset
+
+
+def _nft_final_verdict(expressions: list) -> str | None:
+  verdict = None
+  for expression in expressions:
+    if not isinstance(expression, dict) or len(expression) != 1:
+      return None
+    (kind,) = expression
+    if kind in DENY_VERDICTS or kind in ("accept", "jump", "goto", "return"):
+      verdict = kind
+    elif kind not in _NFT_PASSIVE:
+      return None
+  return verdict
+
+
+def parse_nft_json(handle: IO[str]) -> Ruleset:
+  """Build a Ruleset from `nft -j list ruleset`, decoding one ruleset element at a time."""
+  ruleset = Ruleset("nftables")
+  for item in iter_array_items(handle, "nftables"):
+    if "rule" in item:
+      rule = item["rule"]
+      chain = ruleset.chain(rule.get("family", ""), rule.get("table", ""), rule.get("chain", ""))
+      chain.rules += 1
+      if chain.base:
+        chain.final_verdict = _nft_final_verdict(rule.get("expr") or [])
+    elif "chain" in item:
+      spec = item["chain"]
+      chain = ruleset.chain(spec.get("family", ""), spec.get("table", ""), spec.get("name", ""))
+      chain.hook = spec.get("hook")
+      chain.policy = spec.get("policy", "accept" if chain.hook else None)
+  return ruleset
+
+
+def _read_nft(timeout: float | None) -> Ruleset:
+  stream = stream_command(["nft", "-j", "list", "ruleset"], timeout=timeout)
+  try:
+    with stream:
+      ruleset = parse_nft_json(stream.stdout)
+  except ValueError as exc:
+    raise FirewallError(f"nft exited with {stream.returncode}" if stream.returncode else f"unreadable nft output: {exc}") from exc
+  if stream.returncode:
+    raise FirewallError(f"nft exited with {stream.returncode}")
+  return ruleset
+
+
+def _read_iptables_save(timeout: float | None) -> Ruleset:
+  with stream_command(["iptables-save"], timeout=timeout) as stream:
+    ruleset = parse_iptables_save(stream)
+  if stream.returncode:
+    raise FirewallError(f"iptables-save exited with {stream.returncode}")
+  return ruleset
+
+
+def read_ruleset(facts: HostFacts, timeout: float | None = None) -> Ruleset | None:
+  """Read the active ruleset with nft, or iptables-save when nft shows nothing; None without either tool.
+
+  iptables-legacy rules are invisible to nft, hence the fallback on an empty
+  nftables ruleset.
+  """
+  ruleset = None
+  if facts.has_command("nft"):
+    ruleset = _read_nft(timeout)
+    if ruleset.chains:
+      return ruleset
+  if facts.has_command("iptables-save"):
+    return _read_iptables_save(timeout)
+  return ruleset
+
+
+__all__ = ["Chain", "FirewallError", "Ruleset", "parse_iptables_save", "parse_nft_json", "read_ruleset"]
@@ -0,0 +1,409 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+import re
+import shlex
+import sys
+import tarfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Sequence
+
+from .config import FleetOptions, log_dir
+from .findings import CRIT, WARN
+from .sinks import BackgroundFileSink, LogSink, StreamSink
+
+
+PACKAGE_ROOT = Path(__file__).resolve().parents[1]
+# ssh/chroot targets unpack the package into a fresh `mktemp -d` directory below
+# this one (logs and caches included) and remove it when the audit ends.
+REMOTE_TMP = "/var/tmp"
+REMOTE_PYTHON = "python3"
+# A target that could not be audited (unreachable, timed out, crashed).
+EXIT_FAILED = 3
+STDERR_TAIL = 5
+# Longest NDJSON record accepted from a target.
+RECORD_LIMIT = 1 << 20
+_UNSAFE_RE = re.compile(r"[^A-Za-z0-9._@-]")
+
+
+@dataclass
+class HostResult:
+  """Outcome of auditing one target; `exit_code` is None when the audit did not complete."""
+
+  target: str
+  exit_code: int | None
+  duration: float
+  records: List[dict] = field(default_factory=list)
+  error: str | None = None
+
+  def count(self, severity: str) -> int:
+    return sum(1 for record in self.records if record.get("severity") == severity)
+
+  @property
+  def status(self) -> int:
+    return EXIT_FAILED if self.exit_code is None else self.exit_code
+
+
+def package_archive() -> bytes:
+  """gzip'ed tarball of the orchestrator and the security_audit package, built once per run."""
+  buffer = io.BytesIO()
+  with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+    archive.add(PACKAGE_ROOT / "security_orchestrator.py", arcname="security_orchestrator.py")
+    for path in sorted((PACKAGE_ROOT / "security_audit").rglob("*.py")):
+      archive.add(path, arcname=str(path.relative_to(PACKAGE_ROOT)))
+  return buffer.getvalue()
+
+
+def bootstrap_script(args: Sequence[str], remote_tmp: str = REMOTE_TMP, python: str = REMOTE_PYTHON) -> str:
+  """Shell snippet that unpacks the archive from stdin and runs the orchestrator with `args`.
+
+  The package goes into a private directory created by `mktemp -d` (mode
+  0700, never pre-existing), so no other local user can plant code that the
+  remote user would run; the directory is removed when the snippet exits.
+  """
+  template = shlex.quote(f"{remote_tmp.rstrip('/')}/security-audit.XXXXXXXXXX")
+  command = " ".join(shlex.quote(arg) for arg in args)
+  # Run in the background and wait: traps (ssh hang-up, kill) fire while waiting and stop the audit.
+  return (
+    f"set -e; umask 077; dir=$(mktemp -d {template}); trap 'rm -rf \"$dir\"' EXIT; "
+    'tar -xzf - -C "$dir"; '
+    f'LOG_DIR="$dir/logs" {shlex.quote(python)} "$dir/security_orchestrator.py" {command} </dev/null & pid=$!; '
+    "trap 'kill $pid 2>/dev/null; wait $pid; exit 143' HUP TERM; "
+    "status=0; wait $pid || status=$?; exit $status"
+  )
+
+
+class Transport:
+  """How the fleet runner reaches a target: the command to spawn and what to feed its stdin."""
+
+  name = "transport"
+
+  def command(self, target: str, args: Sequence[str]) -> List[str]:
+    raise NotImplementedError
+
+  def stdin(self, target: str) -> bytes | None:
+    return None
+
+  def env(self, target: str) -> Dict[str, str] | None:
+    return None
+
+
+class LocalTransport(Transport):
+  """Audits this machine once per target, each with its own log and cache directory.
+
+  Targets are only labels; this lets the fleet engine run offline.
+  """
+
+  name = "local"
+
+  def __init__(self, base_dir: Path | None = None, python: str = sys.executable):
+    self.base_dir = base_dir or log_dir() / "fleet"
+    self.python = python
+
+  def command(self, target: str, args: Sequence[str]) -> List[str]:
+    return [self.python, str(PACKAGE_ROOT / "security_orchestrator.py"), *args]
+
+  def env(self, target: str) -> Dict[str, str]:
+    directory = self.base_dir / _UNSAFE_RE.sub("_", target)
+    return {**os.environ, "LOG_DIR": str(directory), "SECURITY_AUDIT_CACHE_DIR": str(directory / "cache")}
+
+
+class ChrootTransport(Transport):
+  """Targets are root directories; the package is unpacked into each and run under chroot(8) (needs root)."""
+
+  name = "chroot"
+
+  def __init__(self, remote_tmp: str = REMOTE_TMP, python: str = REMOTE_PYTHON):
+    self.remote_tmp = remote_tmp
+    self.python = python
+    self._archive: bytes | None = None
+
+  def command(self, target: str, args: Sequence[str]) -> List[str]:
+    return ["chroot", target, "/bin/sh", "-c", bootstrap_script(args, self.remote_tmp, self.python)]
+
+  def stdin(self, target: str) -> bytes:
+    if self._archive is None:
+      self._archive = package_archive()
+    return self._archive
+
+
+class SshTransport(ChrootTransport):
+  """Runs the audit over ssh(1) with ControlMaster multiplexing, so repeat connections reuse one session."""
+
+  name = "ssh"
+
+  def __init__(
+    self,
+    control_dir: Path | None = None,
+    persist: int = 60,
+    options: Sequence[str] = (),
+    remote_tmp: str = REMOTE_TMP,
+    python: str = REMOTE_PYTHON,
+  ):
+    super().__init__(remote_tmp, python)
+    self.control_dir = control_dir or Path.home() / ".ssh" / "security-audit"
+    self.persist = persist
+    self.options = list(options)
+
+  def command(self, target: str, args: Sequence[str]) -> List[str]:
+    self.control_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    return [
+      "ssh",
+      "-o", "BatchMode=yes",
+      "-o", "ControlMaster=auto",
+      "-o", f"ControlPath={self.control_dir}/%C",
+      "-o", f"ControlPersist={self.persist}",
+      *self.options,
+      target,
+      "--",
+      bootstrap_script(args, self.remote_tmp, self.python),
+    ]
+
+
+TRANSPORTS = {"local": LocalTransport, "chroot": ChrootTransport, "ssh": SshTransport}
+
+
+async def _kill(proc: asyncio.subprocess.Process) -> None:
+  if proc.returncode is None:
+    try:
+      proc.kill()
+    except ProcessLookupError:
+      pass
+    await proc.wait()
+
+
+async def _lines(stream: asyncio.StreamReader) -> AsyncIterator[bytes]:
+  """Lines of `stream`; a line longer than the reader's limit is discarded chunk by chunk, not raised."""
+  oversized = False
+  while True:
+    try:
+      line = await stream.readuntil(b"\n")
+    except asyncio.IncompleteReadError as exc:
+      if exc.partial and not oversized:
+        yield exc.partial
+      return
+    except asyncio.LimitOverrunError as exc:
+      await stream.readexactly(exc.consumed)
+      oversized = True
+      continue
+    if not oversized:
+      yield line
+    oversized = False
+
+
+async def _read_records(stream: asyncio.StreamReader, records: List[dict]) -> None:
+  async for line in _lines(stream):
+    try:
+      record = json.loads(line)
+    except ValueError:
+      continue
+    if isinstance(record, dict):
+      records.append(record)
+
+
+async def _read_tail(stream: asyncio.StreamReader, tail: List[str]) -> None:
+  async for line in _lines(stream):
+    tail.append(line.decode("utf-8", "replace").rstrip())
+    del tail[:-STDERR_TAIL]
+
+
+async def _feed(proc: asyncio.subprocess.Process, payload: bytes | None) -> None:
+  if proc.stdin is None:
+    return
+  try:
+    if payload:
+      proc.stdin.write(payload)
+      await proc.stdin.drain()
+    proc.stdin.close()
+  except (BrokenPipeError, ConnectionResetError):
+    pass
+
+
+async def audit_host(target: str, transport: Transport, args: Sequence[str], timeout: float | None) -> HostResult:
+  """Run the orchestrator on one target with `--format ndjson`, collecting its findings."""
+  start = time.perf_counter()
+  records: List[dict] = []
+  stderr: List[str] = []
+  payload = transport.stdin(target)
+  try:
+    proc = await asyncio.create_subprocess_exec(
+      *transport.command(target, [*args, "--format", "ndjson"]),
+      stdin=asyncio.subprocess.PIPE if payload else asyncio.subprocess.DEVNULL,
+      stdout=asyncio.subprocess.PIPE,
+      stderr=asyncio.subprocess.PIPE,
+      env=transport.env(target),
+      limit=RECORD_LIMIT,
+    )
+  except OSError as exc:
+    return HostResult(target, None, time.perf_counter() - start, error=str(exc))
+
+  async def _communicate() -> None:
+    await asyncio.gather(_feed(proc, payload), _read_records(proc.stdout, records), _read_tail(proc.stderr, stderr))
+    await proc.wait()
+
+  try:
+    await asyncio.wait_for(_communicate(), timeout)
+  except asyncio.TimeoutError:
+    await _kill(proc)
+    return HostResult(target, None, time.perf_counter() - start, records, f"timed out after {timeout:g}s")
+  except asyncio.CancelledError:
+    await _kill(proc)
+    raise
+  except Exception as exc:  # pylint: disable=broad-except
+    # One misbehaving target must not abort the rest of the fleet.
+    await _kill(proc)
+    return HostResult(target, None, time.perf_counter() - start, records, f"{type(exc).__name__}: {exc}")
+  duration = time.perf_counter() - start
+  if proc.returncode not in (0, 1, 2):
+    detail = f": {stderr[-1]}" if stderr else ""
+    return HostResult(target, None, duration, records, f"exited with {proc.returncode}{detail}")
+  return HostResult(target, proc.returncode, duration, records)
+
+
+async def run_fleet(
+  targets: Iterable[str],
+  transport: Transport,
+  args: Sequence[str],
+  jobs: int,
+  timeout: float | None,
+) -> AsyncIterator[HostResult]:
+  """Audit up to `jobs` targets at once, yielding each result as soon as its host finishes."""
+  slots = asyncio.Semaphore(max(1, jobs))
+
+  async def _bounded(target: str) -> HostResult:
+    async with slots:
+      return await audit_host(target, transport, args, timeout)
+
+  tasks = [asyncio.ensure_future(_bounded(target)) for target in targets]
+  try:
+    for finished in asyncio.as_completed(tasks):
+      yield await finished
+  finally:
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def read_targets(path: str) -> List[str]:
+  """One target per line from `path` ('-' for stdin); blank lines and # comments are skipped."""
+  handle = sys.stdin if path == "-" else open(path, encoding="utf-8")  # pylint: disable=consider-using-with
+  try:
+    targets = [line.split("#", 1)[0].strip() for line in handle]
+  finally:
+    if handle is not sys.stdin:
+      handle.close()
+  return list(dict.fromkeys(target for target in targets if target))
+
+
+def _text_report(result: HostResult) -> List[str]:
+  elapsed = f"{result.duration:.1f}s"
+  if result.exit_code is None:
+    return [f"[FAIL] {result.target}: {result.error} ({elapsed})"]
+  label = {0: "OK  ", 1: "WARN", 2: "CRIT"}[result.exit_code]
+  lines = [f"[{label}] {result.target}: WARN={result.count(WARN)} CRIT={result.count(CRIT)} ({elapsed})"]
+  lines.extend(f"    {record.get('check')}: {record.get('message')}" for record in result.records if record.get("severity") == CRIT)
+  return lines
+
+
+def _host_record(result: HostResult) -> dict:
+  record = {"target": result.target, "type": "host", "exit": result.status, "duration": round(result.duration, 3)}
+  if result.error:
+    record["error"] = result.error
+  return record
+
+
+class FleetReport:
+  """Prints/streams HostResults as they arrive and tallies them into one exit code."""
+
+  def __init__(
+    self,
+    output_format: str = "text",
+    ndjson_file: Path | None = None,
+    history: Path | None = None,
+    checks: Sequence[str] = (),
+  ):
+    self.format = output_format
+    self.sinks: List[LogSink] = []
+    if output_format == "ndjson":
+      self.sinks.append(StreamSink(sys.stdout))
+    if ndjson_file:
+      self.sinks.append(BackgroundFileSink(ndjson_file))
+    self.statuses: Dict[int, int] = {}
+    self.started = time.perf_counter()
+    # Completed targets are appended to the run history under their target name.
+    self.history = None
+    self.checks = list(checks)
+    if history is not None:
+      from .history import History
+
+      self.history = History(history)
+
+  def add(self, result: HostResult) -> None:
+    self.statuses[result.status] = self.statuses.get(result.status, 0) + 1
+    if self.format == "text":
+      print("\n".join(_text_report(result)), flush=True)
+    if self.sinks:
+      lines = [json.dumps({"target": result.target, **record}, separators=(",", ":"), ensure_ascii=False) for record in result.records]
+      lines.append(json.dumps(_host_record(result), separators=(",", ":")))
+      block = "\n".join(lines) + "\n"
+      for sink in self.sinks:
+        sink.write(block)
+        sink.flush()
+    if self.history is not None and result.exit_code is not None:
+      try:
+        self.history.record_run(result.target, time.time() - result.duration, result.exit_code, self.checks, result.records)
+      except Exception as exc:  # pylint: disable=broad-except
+        print(f"Run history not updated for {result.target}: {exc}", file=sys.stderr)
+
+  def close(self, title: str) -> int:
+    """Close the sinks, print the summary in text mode and return the worst exit code."""
+    for sink in self.sinks:
+      sink.close()
+    if self.history is not None:
+      self.history.close()
+    if self.format == "text":
+      print("=" * 50)
+      print(f"{title} ({time.perf_counter() - self.started:.1f}s):")
+      for status, name in ((0, "OK"), (1, "WARN"), (2, "CRIT"), (EXIT_FAILED, "FAILED")):
+        print(f"  {name:<7}: {self.statuses.get(status, 0)}")
+      print("=" * 50)
+    return max(self.statuses, default=0)
+
+
+def run_fleet_checks(targets: Sequence[str], args: Sequence[str], options: FleetOptions, checks: Sequence[str] = ()) -> int:
+  """Audit `targets` through `options.transport` and return the worst exit code (EXIT_FAILED for failed hosts).
+
+  `checks` are the labels of the forwarded checks, recorded with each target's run history.
+  """
+  transport = TRANSPORTS[options.transport]()
+  report = FleetReport(options.format, options.ndjson_file, options.history, checks)
+
+  async def _run() -> None:
+    async for result in run_fleet(targets, transport, args, options.jobs, options.host_timeout):
+      report.add(result)
+
+  try:
+    asyncio.run(_run())
+  finally:
+    worst = report.close(f"Fleet summary ({len(targets)} targets via {transport.name})")
+  return worst
+
+
+__all__ = [
+  "ChrootTransport",
+  "EXIT_FAILED",
+  "FleetReport",
+  "HostResult",
+  "LocalTransport",
+  "SshTransport",
+  "Transport",
+  "audit_host",
+  "read_targets",
+  "run_fleet",
+  "run_fleet_checks",
+]
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import json
+import os
+import stat
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Sequence, Tuple
+
+from .governor import throttle_scan
+
+
+DEFAULT_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+# Index entries older than this are dropped and their trees rescanned in full.
+INDEX_MAX_AGE = 24 * 3600
+
+
+@dataclass(frozen=True)
+class Predicate:
+  """Permission test applied to entries of one file type during a walk."""
+
+  name: str
+  file_type: int
+  test: Callable[[int], bool]
+
+
+def _world_writable_no_sticky(mode: int) -> bool:
+  return bool(mode & stat.S_IWOTH) and not mode & stat.S_ISVTX
+
+
+def _suid_sgid(mode: int) -> bool:
+  return bool(mode & (stat.S_ISUID | stat.S_ISGID))
+
+
+# find -type d -perm -0002 ! -perm -1000
+WORLD_WRITABLE = Predicate("world_writable", stat.S_IFDIR, _world_writable_no_sticky)
+# find ( -perm -4000 -o -perm -2000 ) -type f
+SUID_SGID = Predicate("suid_sgid", stat.S_IFREG, _suid_sgid)
+
+Hit = Tuple[str, str]
+DirKey = Tuple[int, int, int, int]
+
+
+class DirIndex:
+  """On-disk record of each scanned directory's metadata and child directory names.
+
+  A directory whose (st_dev, st_ino, st_mtime_ns, st_ctime_ns) is unchanged
+  is not listed again: its cached child directory names are reused and only
+  the child directories are stat()ed (and tested) to continue. A directory's
+  mtime does not change when a file inside it is chmod'ed, so directories
+  walked with a regular-file predicate (SUID/SGID) never use the index.
+  """
+
+  VERSION = 2
+
+  def __init__(self, path: Path, entries: Dict[str, list] | None = None, created: float | None = None):
+    self.path = path
+    self.created = created if created is not None else time.time()
+    self._previous = entries or {}
+    self._current: Dict[str, list] = {}
+    self.reused = 0
+
+  @classmethod
+  def load(cls, path: Path) -> "DirIndex":
+    try:
+      with path.open(encoding="utf-8") as handle:
+        data = json.load(handle)
+      if data.get("version") != cls.VERSION or time.time() - data["created"] > INDEX_MAX_AGE:
+        return cls(path)
+      return cls(path, data["dirs"], data["created"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+      return cls(path)
+
+  @property
+  def visited(self) -> int:
+    return len(self._current)
+
+  def lookup(self, path: str, key: DirKey, signature: str) -> List[str] | None:
+    entry = self._previous.get(path)
+    if entry is None or tuple(entry[0]) != key or entry[1] != signature:
+      return None
+    self._current[path] = entry
+    self.reused += 1
+    return entry[2]
+
+  def store(self, path: str, key: DirKey, signature: str, dir_names: List[str]) -> None:
+    # Each directory is written by exactly one worker; dict assignment is atomic.
+    self._current[path] = [list(key), signature, dir_names]
+
+  def save(self) -> None:
+    """Atomically replace the index with the directories seen by this scan."""
+    self.path.parent.mkdir(parents=True, exist_ok=True)
+    created = self.created if self._previous else time.time()
+    fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+    try:
+      with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        json.dump({"version": self.VERSION, "created": created, "dirs": self._current}, handle)
+      os.replace(tmp, self.path)
+    except BaseException:
+      os.unlink(tmp)
+      raise
+
+
+def _match(path: str, mode: int, predicates: Sequence[Predicate], hits: List[Hit]) -> None:
+  file_type = stat.S_IFMT(mode)
+  for predicate in predicates:
+    if predicate.file_type == file_type and predicate.test(mode):
+      hits.append((predicate.name, path))
+
+
+def _signature(predicates: Sequence[Predicate]) -> str:
+  return ",".join(predicate.name for predicate in predicates)
+
+
+def _reuse_dir(
+  path: str,
+  dev: int,
+  predicates: Sequence[Predicate],
+  hits: List[Hit],
+  subdirs: List[Tuple[str, os.stat_result]],
+  dir_names: List[str],
+) -> None:
+  throttle_scan(len(dir_names))
+  for child in dir_names:
+    child_path = os.path.join(path, child)
+    try:
+      st = os.lstat(child_path)
+    except OSError:
+      continue
+    if not stat.S_ISDIR(st.st_mode):
+      continue
+    _match(child_path, st.st_mode, predicates, hits)
+    if st.st_dev == dev:
+      subdirs.append((child_path, st))
+
+
+def _scan_dir(
+  path: str,
+  dir_stat: os.stat_result,
+  dev: int,
+  predicates: Sequence[Predicate],
+  hits: List[Hit],
+  subdirs: List[Tuple[str, os.stat_result]],
+  index: DirIndex | None = None,
+) -> None:
+  want_files = any(predicate.file_type == stat.S_IFREG for predicate in predicates)
+  # File mode changes leave the directory's key untouched; only directories are safe to reuse.
+  if want_files:
+    index = None
+  if index is not None:
+    key = (dir_stat.st_dev, dir_stat.st_ino, dir_stat.st_mtime_ns, dir_stat.st_ctime_ns)
+    signature = _signature(predicates)
+    cached = index.lookup(path, key, signature)
+    if cached is not None:
+      _reuse_dir(path, dev, predicates, hits, subdirs, cached)
+      return
+
+  dir_names: List[str] = []
+  visited = 0
+  try:
+    with os.scandir(path) as entries:
+      for entry in entries:
+        visited += 1
+        try:
+          # d_type lets us skip the stat() for symlinks and, when no predicate
+          # needs them, regular files.
+          if entry.is_dir(follow_symlinks=False):
+            st = entry.stat(follow_symlinks=False)
+            dir_names.append(entry.name)
+            if st.st_dev == dev:
+              subdirs.append((entry.path, st))
+            _match(entry.path, st.st_mode, predicates, hits)
+            continue
+          if not (want_files and entry.is_file(follow_symlinks=False)):
+            continue
+          st = entry.stat(follow_symlinks=False)
+        except OSError:
+          continue
+        _match(entry.path, st.st_mode, predicates, hits)
+  except OSError:
+    # Unreadable or vanished directories are skipped, like find does.
+    return
+  finally:
+    throttle_scan(visited)
+
+  if index is not None:
+    index.store(path, key, signature, dir_names)
+
+
+def _walk_subtree(
+  path: str,
+  dir_stat: os.stat_result,
+  dev: int,
+  predicates: Sequence[Predicate],
+  index: DirIndex | None,
+) -> List[Hit]:
+  hits: List[Hit] = []
+  stack = [(path, dir_stat)]
+  while stack:
+    current, current_stat = stack.pop()
+    _scan_dir(current, current_stat, dev, predicates, hits, stack, index)
+  return hits
+
+
+def scan(
+  targets: Mapping[str, Sequence[Predicate]],
+  workers: int = DEFAULT_WORKERS,
+  index: DirIndex | None = None,
+) -> Dict[str, List[str]]:
+  """Walk each root once, testing all of its predicates per entry.
+
+  Behaves like `find ROOT -xdev`: symlinks are never followed (a symlinked
+  root is tested but not descended) and directories on another device are
+  reported but not entered. Subtrees below each root are spread across a
+  thread pool. With an `index`, unchanged directories walked with
+  directory-only predicates are served from it and the index is refreshed
+  with what this scan saw. Returns sorted matching paths keyed by predicate
+  name.
+  """
+  results: Dict[str, List[str]] = {
+    predicate.name: [] for predicates in targets.values() for predicate in predicates
+  }
+  hits: List[Hit] = []
+  tasks: List[Tuple[str, os.stat_result, int, Sequence[Predicate], DirIndex | None]] = []
+
+  for root, predicates in targets.items():
+    try:
+      st = os.lstat(root)
+    except OSError:
+      continue
+    _match(root, st.st_mode, predicates, hits)
+    if not stat.S_ISDIR(st.st_mode):
+      continue
+    subdirs: List[Tuple[str, os.stat_result]] = []
+    _scan_dir(root, st, st.st_dev, predicates, hits, subdirs, index)
+    tasks.extend((subdir, subdir_stat, st.st_dev, predicates, index) for subdir, subdir_stat in subdirs)
+
+  if tasks:
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fswalk") as pool:
+      for subtree_hits in pool.map(lambda task: _walk_subtree(*task), tasks):
+        hits.extend(subtree_hits)
+
+  for name, path in hits:
+    results[name].append(path)
+  for paths in results.values():
+    paths.sort()
+  return results
+
+
+__all__ = ["Predicate", "SUID_SGID", "WORLD_WRITABLE", "DirIndex", "scan"]
@@ -0,0 +1,333 @@
+"""
+Resource governor: keeps an audit from competing with production workloads.
+
+Limits are applied to the audit process itself, once and before any worker
+thread starts, so every thread and every child process (find, kubectl, apt,
+sshd -T, ...) inherits them:
+
+  nice          CPU scheduling priority (setpriority)
+  ionice idle   disk IO served only when no other process needs the disk (ioprio_set)
+  cgroup        a transient cgroup v2 with cpu.max / io.max limits
+  scan rate     directory entries per second the in-process scanners may visit
+
+`Governor.report()` says what was applied and how long the run was held back.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .config import GovernorOptions
+
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+# Transient cgroups are created below this one, one per audit process.
+CGROUP_PARENT = "security-audit"
+CPU_PERIOD_US = 100_000
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+# glibc has no ioprio_set() wrapper; syscall numbers per machine.
+_IOPRIO_SET = {
+  "x86_64": 251,
+  "i386": 289,
+  "i686": 289,
+  "aarch64": 30,
+  "armv7l": 314,
+  "armv6l": 314,
+  "ppc64": 273,
+  "ppc64le": 273,
+  "s390x": 282,
+  "riscv64": 30,
+  "loongarch64": 30,
+}
+
+
+class GovernorError(OSError):
+  """A limit could not be applied; the audit continues without it."""
+
+
+class ScanBudget:
+  """Token bucket shared by all scanner threads: `rate` entries per second, bursts of one second.
+
+  A thread that overdraws the bucket sleeps until its debt is repaid, so the
+  combined rate holds however many threads scan. `waited` is the wall-clock
+  time during which at least one scanner was held back.
+  """
+
+  def __init__(self, rate: float):
+    self.rate = float(rate)
+    self.entries = 0
+    self.waited = 0.0
+    self._tokens = self.rate
+    self._stamp = time.monotonic()
+    self._held_until = 0.0
+    self._lock = threading.Lock()
+
+  def spend(self, count: int) -> None:
+    with self._lock:
+      now = time.monotonic()
+      self._tokens = min(self.rate, self._tokens + (now - self._stamp) * self.rate) - count
+      self._stamp = now
+      self.entries += count
+      if self._tokens >= 0:
+        return
+      delay = -self._tokens / self.rate
+      until = now + delay
+      # Waits of several threads overlap; count each moment once.
+      if until > self._held_until:
+        self.waited += until - max(now, self._held_until)
+        self._held_until = until
+    time.sleep(delay)
+
+
+_budget: ScanBudget | None = None
+_active: "Governor | None" = None
+
+
+def throttle_scan(entries: int) -> None:
+  """Charge `entries` visited by a native scanner to the scan budget, sleeping once it is spent."""
+  budget = _budget
+  if budget is not None and entries:
+    budget.spend(entries)
+
+
+def active_governor() -> "Governor | None":
+  return _active
+
+
+def _set_idle_io() -> None:
+  import ctypes
+
+  machine = os.uname().machine
+  number = _IOPRIO_SET.get(machine)
+  if number is None:
+    raise GovernorError(f"ioprio_set syscall number unknown on {machine}")
+  libc = ctypes.CDLL(None, use_errno=True)
+  if libc.syscall(number, IOPRIO_WHO_PROCESS, 0, IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT) != 0:
+    code = ctypes.get_errno()
+    raise GovernorError(code, f"ioprio_set: {os.strerror(code)}")
+
+
+def _own_cgroup() -> str:
+  with open("/proc/self/cgroup", encoding="utf-8") as handle:
+    for line in handle:
+      if line.startswith("0::"):
+        return line[3:].strip()
+  raise GovernorError("process is not in a cgroup v2 hierarchy")
+
+
+def _delegate(directory: Path, controllers: List[str]) -> None:
+  """Enable `controllers` for the children of `directory`."""
+  available = (directory / "cgroup.controllers").read_text().split()
+  missing = [name for name in controllers if name not in available]
+  if missing:
+    raise GovernorError(f"{', '.join(missing)} controller not available in {directory}")
+  enabled = (directory / "cgroup.subtree_control").read_text().split()
+  wanted = [name for name in controllers if name not in enabled]
+  if wanted:
+    (directory / "cgroup.subtree_control").write_text(" ".join(f"+{name}" for name in wanted))
+
+
+def block_device(path: str = "/") -> str:
+  """MAJ:MIN of the disk holding `path`, as io.max expects (a partition's parent disk)."""
+  st = os.stat(path)
+  number = f"{os.major(st.st_dev)}:{os.minor(st.st_dev)}"
+  node = Path("/sys/dev/block", number)
+  if not node.exists():
+    raise GovernorError(f"{path} is not on a block device ({number})")
+  if (node / "partition").exists():
+    return (node.resolve().parent / "dev").read_text().strip()
+  return number
+
+
+def _pressure_total(path: Path) -> float | None:
+  """Seconds some task of the cgroup stalled, from a PSI file; None without PSI."""
+  try:
+    with path.open(encoding="utf-8") as handle:
+      for line in handle:
+        if line.startswith("some "):
+          return int(line.rsplit("total=", 1)[1]) / 1e6
+  except (OSError, IndexError, ValueError):
+    pass
+  return None
+
+
+class TransientCgroup:
+  """A cgroup v2 below CGROUP_ROOT/security-audit holding this process (and its children) while it runs."""
+
+  def __init__(self, cpu_percent: float | None = None, io_bps: int | None = None):
+    self.cpu_percent = cpu_percent
+    self.io_bps = io_bps
+    self.device: str | None = None
+    self.path: Path | None = None
+    self._origin: str | None = None
+
+  def enter(self) -> None:
+    if not (CGROUP_ROOT / "cgroup.controllers").is_file():
+      raise GovernorError(f"cgroup v2 is not mounted at {CGROUP_ROOT}")
+    controllers = (["cpu"] if self.cpu_percent else []) + (["io"] if self.io_bps else [])
+    path = CGROUP_ROOT / CGROUP_PARENT / f"run-{os.getpid()}"
+    try:
+      self._origin = _own_cgroup()
+      if self.io_bps:
+        self.device = block_device("/")
+      _delegate(CGROUP_ROOT, controllers)
+      path.parent.mkdir(exist_ok=True)
+      _delegate(path.parent, controllers)
+      path.mkdir()
+      self.path = path
+      if self.cpu_percent:
+        quota = max(1000, round(self.cpu_percent / 100 * CPU_PERIOD_US))
+        (path / "cpu.max").write_text(f"{quota} {CPU_PERIOD_US}")
+      if self.io_bps:
+        (path / "io.max").write_text(f"{self.device} rbps={self.io_bps} wbps={self.io_bps}")
+      # Moves every thread; children started from now on are born inside.
+      (path / "cgroup.procs").write_text(str(os.getpid()))
+    except OSError as exc:
+      self.leave()
+      raise GovernorError(f"cannot set up {path}: {exc}") from exc
+
+  def stats(self) -> Dict[str, float]:
+    """Seconds throttled by cpu.max, and PSI stall totals for CPU and IO, since the cgroup was created."""
+    values: Dict[str, float] = {}
+    if self.path is None:
+      return values
+    try:
+      with (self.path / "cpu.stat").open(encoding="utf-8") as handle:
+        for line in handle:
+          key, _, value = line.partition(" ")
+          if key == "throttled_usec":
+            values["cpu_throttled"] = int(value) / 1e6
+    except (OSError, ValueError):
+      pass
+    for resource in ("cpu", "io"):
+      stalled = _pressure_total(self.path / f"{resource}.pressure")
+      if stalled is not None:
+        values[f"{resource}_stall"] = stalled
+    return values
+
+  def leave(self) -> None:
+    """Move back to the original cgroup and remove the transient one (kept while children linger)."""
+    if self.path is None:
+      return
+    if self._origin is not None:
+      try:
+        (CGROUP_ROOT / self._origin.lstrip("/") / "cgroup.procs").write_text(str(os.getpid()))
+      except OSError:
+        pass
+    try:
+      self.path.rmdir()
+    except OSError:
+      pass
+    self.path = None
+
+
+def _size(value: float) -> str:
+  for unit in ("", "K", "M", "G"):
+    if value < 1024 or unit == "G":
+      return f"{value:g}{unit}"
+    value /= 1024
+  return f"{value:g}"
+
+
+class Governor:
+  """Applies GovernorOptions to this process; `release()` undoes what can be undone (the cgroup)."""
+
+  def __init__(self, options: GovernorOptions):
+    self.options = options
+    self.applied: List[str] = []
+    self.failed: List[str] = []
+    self.cgroup: TransientCgroup | None = None
+    self.budget: ScanBudget | None = None
+    self.started = time.monotonic()
+
+  def apply(self) -> "Governor":
+    global _active, _budget
+    options = self.options
+    if options.nice:
+      try:
+        # Only ever lowers priority; raising it would need CAP_SYS_NICE.
+        niceness = max(os.getpriority(os.PRIO_PROCESS, 0), options.nice)
+        os.setpriority(os.PRIO_PROCESS, 0, niceness)
+        self.applied.append(f"nice {niceness}")
+      except OSError as exc:
+        self.failed.append(f"nice ({exc.strerror or exc})")
+    if options.ionice_idle:
+      try:
+        _set_idle_io()
+        self.applied.append("ionice idle")
+      except OSError as exc:
+        self.failed.append(f"ionice idle ({exc.strerror or exc})")
+    if options.cpu_percent or options.io_bps:
+      cgroup = TransientCgroup(options.cpu_percent, options.io_bps)
+      try:
+        cgroup.enter()
+      except GovernorError as exc:
+        self.failed.append(f"cgroup ({exc})")
+      else:
+        self.cgroup = cgroup
+        limits = []
+        if options.cpu_percent:
+          limits.append(f"cpu.max {options.cpu_percent:g}% of a CPU")
+        if options.io_bps:
+          limits.append(f"io.max {_size(options.io_bps)}B/s on {cgroup.device}")
+        self.applied.append(f"cgroup {cgroup.path.relative_to(CGROUP_ROOT)} ({', '.join(limits)})")
+    if options.scan_rate:
+      self.budget = _budget = ScanBudget(options.scan_rate)
+      self.applied.append(f"scan rate {options.scan_rate:g} entries/s")
+    _active = self
+    return self
+
+  def release(self) -> None:
+    global _active, _budget
+    if self.cgroup is not None:
+      self.cgroup.leave()
+      self.cgroup = None
+    if _active is self:
+      _active = None
+      _budget = None
+
+  def report(self) -> List[Tuple[str, str]]:
+    """Summary lines (label, text): limits in force, time held back by them, limits that failed."""
+    lines = [("Governor", ", ".join(self.applied) or "no limits applied")]
+    held = []
+    if self.budget is not None:
+      held.append(f"scan budget {self.budget.waited:.1f}s over {self.budget.entries} entries")
+    if self.cgroup is not None:
+      stats = self.cgroup.stats()
+      if "cpu_throttled" in stats:
+        held.append(f"cpu.max {stats['cpu_throttled']:.1f}s")
+      # PSI stalls include waiting behind other workloads, i.e. what nice and ionice cost.
+      stalls = [f"{resource.upper()} {stats[f'{resource}_stall']:.1f}s" for resource in ("cpu", "io") if f"{resource}_stall" in stats]
+      if stalls:
+        held.append("stalled on " + ", ".join(stalls))
+    if held:
+      elapsed = time.monotonic() - self.started
+      lines.append(("Throttled", f"{'; '.join(held)} (run took {elapsed:.1f}s)"))
+    if self.failed:
+      lines.append(("Not applied", "; ".join(self.failed)))
+    return lines
+
+
+def start_governor(options: GovernorOptions) -> Governor | None:
+  """Apply `options` to this process (None when none are set); call before starting threads."""
+  if not options.enabled:
+    return None
+  return Governor(options).apply()
+
+
+__all__ = [
+  "Governor",
+  "GovernorError",
+  "ScanBudget",
+  "TransientCgroup",
+  "active_governor",
+  "block_device",
+  "start_governor",
+  "throttle_scan",
+]
@@ -0,0 +1,436 @@
+"""
+SQLite store of past runs and their findings.
+
+Every run adds one `runs` row and its findings in a single transaction.
+Findings carry their host and time so that the query indexes (host, check,
+rule, severity, each followed by time) answer filtered, newest-first
+queries without joins or sorts. A finding's `fingerprint` identifies the same
+issue across runs. It is used for --diff-since and for first-seen lookups.
+
+Query it with `python -m security_audit.history`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+from .config import history_file
+from .findings import CRIT, INFO, WARN
+
+
+SCHEMA_VERSION = 1
+# Rows per executemany() call inside a run's transaction.
+BATCH_SIZE = 5000
+BUSY_TIMEOUT = 30
+# Severities that --diff-since and first-seen report on.
+ISSUE_SEVERITIES = (WARN, CRIT)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+  id INTEGER PRIMARY KEY,
+  host TEXT NOT NULL,
+  started INTEGER NOT NULL,
+  exit INTEGER,
+  checks TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_host_started ON runs(host, started);
+CREATE TABLE IF NOT EXISTS findings (
+  id INTEGER PRIMARY KEY,
+  run_id INTEGER NOT NULL,
+  host TEXT NOT NULL,
+  ts INTEGER NOT NULL,
+  check_name TEXT NOT NULL,
+  severity TEXT NOT NULL,
+  rule TEXT,
+  message TEXT NOT NULL,
+  attrs TEXT,
+  fingerprint TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS findings_run ON findings(run_id, fingerprint);
+CREATE INDEX IF NOT EXISTS findings_ts ON findings(ts, id);
+CREATE INDEX IF NOT EXISTS findings_host_ts ON findings(host, ts);
+CREATE INDEX IF NOT EXISTS findings_check_ts ON findings(check_name, ts);
+CREATE INDEX IF NOT EXISTS findings_rule_ts ON findings(rule, ts);
+CREATE INDEX IF NOT EXISTS findings_severity_ts ON findings(severity, ts);
+CREATE INDEX IF NOT EXISTS findings_first_seen ON findings(fingerprint, host, ts);
+"""
+_COLUMNS = "id, run_id, host, ts, check_name, severity, rule, message, attrs, fingerprint"
+
+
+def fingerprint(check: str, severity: str, rule: str | None, message: str) -> str:
+  """Stable identity of a finding across runs (attrs are left out: they may carry counts)."""
+  digest = hashlib.blake2b(digest_size=8)
+  for part in (check, severity, rule or "", message):
+    digest.update(part.encode("utf-8", "surrogateescape"))
+    digest.update(b"\0")
+  return digest.hexdigest()
+
+
+def _iso(timestamp: int | None) -> str | None:
+  return None if timestamp is None else datetime.fromtimestamp(timestamp).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def parse_time(value: str) -> int:
+  """Unix time from an ISO date/time, or from a relative age such as 90m, 12h or 7d."""
+  units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+  if value and value[-1] in units and value[:-1].isdigit():
+    return int(time.time()) - int(value[:-1]) * units[value[-1]]
+  try:
+    return int(datetime.fromisoformat(value).timestamp())
+  except ValueError as exc:
+    raise ValueError(f"expected an ISO date/time or an age like 12h or 7d, got {value!r}") from exc
+
+
+@dataclass
+class StoredFinding:
+  id: int
+  run_id: int
+  host: str
+  ts: int
+  check: str
+  severity: str
+  rule: str | None
+  message: str
+  attrs: str | None
+  fingerprint: str
+
+  def to_dict(self, **extra) -> dict:
+    record = {"host": self.host, "ts": _iso(self.ts), "run": self.run_id, "check": self.check, "severity": self.severity}
+    if self.rule:
+      record["rule"] = self.rule
+    record["message"] = self.message
+    if self.attrs:
+      record["attrs"] = json.loads(self.attrs)
+    record.update(extra)
+    return record
+
+
+@dataclass
+class Diff:
+  """WARN/CRIT findings that appeared or went away between run `previous` and run `current`."""
+
+  current: int
+  previous: int | None
+  new: List[StoredFinding] = field(default_factory=list)
+  resolved: List[StoredFinding] = field(default_factory=list)
+
+  @property
+  def exit_code(self) -> int:
+    """2 for a new CRIT, 1 for a new WARN, otherwise 0."""
+    severities = {finding.severity for finding in self.new}
+    return 2 if CRIT in severities else 1 if WARN in severities else 0
+
+
+class History:
+  """Connection to the history database; use as a context manager."""
+
+  def __init__(self, path: Path):
+    self.path = path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    self.conn = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT, isolation_level=None)
+    self.conn.execute("PRAGMA journal_mode=WAL")
+    self.conn.execute("PRAGMA synchronous=NORMAL")
+    if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+      # Idempotent, so concurrent first runs may both apply it.
+      self.conn.executescript(_SCHEMA)
+      self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+  def __enter__(self) -> "History":
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.close()
+    return False
+
+  def close(self) -> None:
+    # Keeps planner statistics current as the tables grow; cheap when nothing changed.
+    try:
+      self.conn.execute("PRAGMA optimize")
+    finally:
+      self.conn.close()
+
+  @contextlib.contextmanager
+  def _transaction(self) -> Iterator[None]:
+    self.conn.execute("BEGIN IMMEDIATE")
+    try:
+      yield
+    except BaseException:
+      self.conn.execute("ROLLBACK")
+      raise
+    self.conn.execute("COMMIT")
+
+  def record_run(self, host: str, started: float, exit_code: int | None, checks: Sequence[str], records: Iterable[dict]) -> int:
+    """Store one run and its findings (Finding.to_dict() shaped records) in one transaction; returns the run id."""
+    ts = int(started)
+    with self._transaction():
+      run_id = self.conn.execute(
+        "INSERT INTO runs (host, started, exit, checks) VALUES (?, ?, ?, ?)", (host, ts, exit_code, ",".join(checks))
+      ).lastrowid
+      batch: List[tuple] = []
+      for record in records:
+        check, severity, rule, message = record["check"], record["severity"], record.get("rule"), record["message"]
+        attrs = record.get("attrs")
+        batch.append(
+          (
+            run_id,
+            host,
+            ts,
+            check,
+            severity,
+            rule,
+            message,
+            json.dumps(attrs, separators=(",", ":"), default=str) if attrs else None,
+            fingerprint(check, severity, rule, message),
+          )
+        )
+        if len(batch) >= BATCH_SIZE:
+          self._insert(batch)
+          batch = []
+      if batch:
+        self._insert(batch)
+    return run_id
+
+  def _insert(self, rows: List[tuple]) -> None:
+    self.conn.executemany(
+      "INSERT INTO findings (run_id, host, ts, check_name, severity, rule, message, attrs, fingerprint) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+      rows,
+    )
+
+  def previous_run(self, run_id: int, before: int | None = None) -> int | None:
+    """The run of the same host preceding `run_id` (or the last one started before `before`)."""
+    host, started = self.conn.execute("SELECT host, started FROM runs WHERE id = ?", (run_id,)).fetchone()
+    if before is None:
+      row = self.conn.execute(
+        "SELECT id FROM runs WHERE host = ? AND (started < ? OR (started = ? AND id < ?)) ORDER BY started DESC, id DESC LIMIT 1",
+        (host, started, started, run_id),
+      ).fetchone()
+    else:
+      row = self.conn.execute(
+        "SELECT id FROM runs WHERE host = ? AND started <= ? AND id != ? ORDER BY started DESC, id DESC LIMIT 1",
+        (host, before, run_id),
+      ).fetchone()
+    return row[0] if row else None
+
+  def diff(self, current: int, previous: int | None) -> Diff:
+    """New and resolved WARN/CRIT findings; checks that did not run in `current` never count as resolved."""
+    result = Diff(current, previous)
+    severities = ",".join("?" * len(ISSUE_SEVERITIES))
+    if previous is None:
+      rows = self.conn.execute(
+        f"SELECT {_COLUMNS} FROM findings WHERE run_id = ? AND severity IN ({severities}) ORDER BY id",
+        (current, *ISSUE_SEVERITIES),
+      )
+      result.new = [StoredFinding(*row) for row in rows]
+      return result
+    query = (
+      f"SELECT {_COLUMNS} FROM findings AS f WHERE run_id = ? AND severity IN ({severities}) "
+      "AND NOT EXISTS (SELECT 1 FROM findings AS o WHERE o.run_id = ? AND o.fingerprint = f.fingerprint) ORDER BY id"
+    )
+    result.new = [StoredFinding(*row) for row in self.conn.execute(query, (current, *ISSUE_SEVERITIES, previous))]
+    checks = set(self.conn.execute("SELECT checks FROM runs WHERE id = ?", (current,)).fetchone()[0].split(","))
+    resolved = self.conn.execute(query, (previous, *ISSUE_SEVERITIES, current))
+    result.resolved = [finding for finding in (StoredFinding(*row) for row in resolved) if finding.check in checks]
+    return result
+
+  def query(
+    self,
+    host: str | None = None,
+    check: str | None = None,
+    rule: str | None = None,
+    severity: str | None = None,
+    since: int | None = None,
+    until: int | None = None,
+    run_id: int | None = None,
+    limit: int | None = 100,
+  ) -> Iterator[StoredFinding]:
+    """Matching findings, newest first."""
+    clauses: List[str] = []
+    params: List[object] = []
+    indexed = False
+    # Most selective first. Only that column may drive the index; the planner
+    # would otherwise prefer the few-valued severity index because it already
+    # yields time order, and then scan most of the table.
+    for column, value in (("run_id", run_id), ("host", host), ("rule", rule), ("check_name", check), ("severity", severity)):
+      if value is not None:
+        clauses.append(f"{'+' if indexed else ''}{column} = ?")
+        params.append(value)
+        indexed = True
+    if since is not None:
+      clauses.append("ts >= ?")
+      params.append(since)
+    if until is not None:
+      clauses.append("ts < ?")
+      params.append(until)
+    sql = f"SELECT {_COLUMNS} FROM findings"
+    if clauses:
+      sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY ts DESC, id DESC"
+    if limit is not None:
+      sql += " LIMIT ?"
+      params.append(limit)
+    for row in self.conn.execute(sql, params):
+      yield StoredFinding(*row)
+
+  def run_host(self, run_id: int) -> str | None:
+    row = self.conn.execute("SELECT host FROM runs WHERE id = ?", (run_id,)).fetchone()
+    return row[0] if row else None
+
+  def latest_run(self, host: str) -> int | None:
+    row = self.conn.execute("SELECT id FROM runs WHERE host = ? ORDER BY started DESC, id DESC LIMIT 1", (host,)).fetchone()
+    return row[0] if row else None
+
+  def first_seen(self, finding: StoredFinding) -> int:
+    """When this host first reported the same finding (any earlier run, not necessarily a continuous streak)."""
+    return self.conn.execute(
+      "SELECT MIN(ts) FROM findings WHERE fingerprint = ? AND host = ?", (finding.fingerprint, finding.host)
+    ).fetchone()[0]
+
+  def hosts(self) -> List[str]:
+    return [row[0] for row in self.conn.execute("SELECT DISTINCT host FROM runs ORDER BY host")]
+
+  def runs(self, host: str | None = None, limit: int = 20) -> List[Tuple[int, str, int, int | None, str]]:
+    sql = "SELECT id, host, started, exit, checks FROM runs"
+    params: List[object] = []
+    if host is not None:
+      sql += " WHERE host = ?"
+      params.append(host)
+    sql += " ORDER BY started DESC, id DESC LIMIT ?"
+    params.append(limit)
+    return list(self.conn.execute(sql, params))
+
+  def prune(self, before: int) -> int:
+    """Delete runs started before `before` and their findings; returns the number of runs removed."""
+    with self._transaction():
+      self.conn.execute("DELETE FROM findings WHERE run_id IN (SELECT id FROM runs WHERE started < ?)", (before,))
+      return self.conn.execute("DELETE FROM runs WHERE started < ?", (before,)).rowcount
+
+
+def format_diff(diff: Diff, host: str, first_seen=None) -> List[str]:
+  """Text report for --diff-since; `first_seen(finding)` adds when a re-appearing finding was first reported."""
+  since = f"run {diff.previous}" if diff.previous is not None else "no earlier run"
+  lines = [f"Changes on {host} since {since} (run {diff.current}): {len(diff.new)} new, {len(diff.resolved)} resolved"]
+  for finding in diff.new:
+    note = ""
+    if first_seen is not None:
+      seen = first_seen(finding)
+      if seen is not None and seen < finding.ts:
+        note = f" (first seen {_iso(seen)})"
+    lines.append(f"  + [{finding.severity}] {finding.check}: {finding.message}{note}")
+  for finding in diff.resolved:
+    lines.append(f"  - [{finding.severity}] {finding.check}: {finding.message}")
+  return lines
+
+
+def _print_findings(findings: Iterable[StoredFinding], output_format: str) -> int:
+  count = 0
+  for finding in findings:
+    count += 1
+    if output_format == "ndjson":
+      print(json.dumps(finding.to_dict(), separators=(",", ":"), ensure_ascii=False))
+    else:
+      rule = f" {finding.rule}" if finding.rule else ""
+      print(f"{_iso(finding.ts)} {finding.host} [{finding.severity}] {finding.check}{rule}: {finding.message}")
+  return count
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(prog="python -m security_audit.history", description="Query stored audit findings.")
+  parser.add_argument("--db", type=Path, default=None, metavar="FILE", help="History database (default: LOG_DIR/history.sqlite3).")
+  parser.add_argument("--format", choices=("text", "ndjson"), default="text")
+  commands = parser.add_subparsers(dest="command", required=True)
+
+  query = commands.add_parser("query", help="Findings matching all given filters, newest first.")
+  query.add_argument("--host")
+  query.add_argument("--check", help="Check label, e.g. SSH or sudo/users.")
+  query.add_argument("--rule", help="Rule id, e.g. ssh.permit_root_login.")
+  query.add_argument("--severity", type=str.upper, choices=(INFO, WARN, CRIT))
+  query.add_argument("--run", type=int, metavar="ID")
+  query.add_argument("--since", metavar="WHEN", help="ISO date/time or age (90m, 12h, 7d).")
+  query.add_argument("--until", metavar="WHEN")
+  query.add_argument("--limit", type=int, default=100, help="0 for no limit (default: 100).")
+
+  open_issues = commands.add_parser("open", help="WARN/CRIT findings of each host's latest run, with when each was first seen.")
+  open_issues.add_argument("--host")
+
+  runs = commands.add_parser("runs", help="Recent runs.")
+  runs.add_argument("--host")
+  runs.add_argument("--limit", type=int, default=20)
+
+  diff = commands.add_parser("diff", help="New and resolved WARN/CRIT findings between two runs.")
+  diff.add_argument("run", type=int, help="Run id.")
+  diff.add_argument("previous", type=int, nargs="?", help="Earlier run id (default: the host's previous run).")
+
+  prune = commands.add_parser("prune", help="Delete runs older than WHEN.")
+  prune.add_argument("before", metavar="WHEN", help="ISO date/time or age (e.g. 90d).")
+  return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+  args = parse_args(argv)
+  path = args.db or history_file()
+  if not path.exists():
+    print(f"No history database at {path}", file=sys.stderr)
+    return 2
+  try:
+    with History(path) as history:
+      if args.command == "query":
+        _print_findings(
+          history.query(
+            host=args.host,
+            check=args.check,
+            rule=args.rule,
+            severity=args.severity,
+            since=parse_time(args.since) if args.since else None,
+            until=parse_time(args.until) if args.until else None,
+            run_id=args.run,
+            limit=args.limit or None,
+          ),
+          args.format,
+        )
+      elif args.command == "open":
+        for host in [args.host] if args.host else history.hosts():
+          run_id = history.latest_run(host)
+          if run_id is None:
+            continue
+          for severity in (CRIT, WARN):
+            for finding in history.query(run_id=run_id, severity=severity, limit=None):
+              seen = _iso(history.first_seen(finding))
+              if args.format == "ndjson":
+                print(json.dumps(finding.to_dict(first_seen=seen), separators=(",", ":"), ensure_ascii=False))
+              else:
+                print(f"{host} [{finding.severity}] {finding.check}: {finding.message} (since {seen})")
+      elif args.command == "runs":
+        for run_id, host, started, exit_code, checks in history.runs(args.host, args.limit):
+          print(f"{run_id:>8} {_iso(started)} {host} exit={exit_code} checks={checks}")
+      elif args.command == "diff":
+        host = history.run_host(args.run)
+        if host is None:
+          print(f"No run {args.run}", file=sys.stderr)
+          return 2
+        previous = args.previous if args.previous is not None else history.previous_run(args.run)
+        result = history.diff(args.run, previous)
+        print("\n".join(format_diff(result, host, history.first_seen)))
+        return result.exit_code
+      elif args.command == "prune":
+        print(f"Removed {history.prune(parse_time(args.before))} runs.")
+  except (sqlite3.Error, ValueError) as exc:
+    print(f"History query failed: {exc}", file=sys.stderr)
+    return 2
+  return 0
+
+
+__all__ = ["Diff", "History", "StoredFinding", "fingerprint", "format_diff", "parse_time"]
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import fnmatch
+import json
+import os
+import posixpath
+import re
+import stat
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Mapping, Sequence, Tuple
+
+from .config import RunOptions
+from .fswalk import Predicate
+
+
+# Files the offline checks read; only these are kept from the layers.
+WANTED_FILES = (
+  "etc/os-release",
+  "usr/lib/os-release",
+  "etc/passwd",
+  "etc/shadow",
+  "etc/ssh/sshd_config",
+  "etc/ssh/sshd_config.d/*",
+  "etc/sudoers",
+  "etc/sudoers.d/*",
+  "var/lib/dpkg/status",
+  "var/lib/apt/lists/*_Packages",
+  "var/run/reboot-required",
+)
+# Larger members (e.g. a huge Packages index) are skipped rather than held in memory.
+MAX_FILE_SIZE = 256 * 1024 * 1024
+WHITEOUT = ".wh."
+OPAQUE = ".wh..wh..opq"
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+class ImageError(Exception):
+  """The archive is not a readable docker-save or OCI image."""
+
+
+def _normalize(name: str) -> str | None:
+  path = posixpath.normpath("/" + name).lstrip("/")
+  return path or None
+
+
+_WANTED_RE = re.compile("|".join(fnmatch.translate(pattern) for pattern in WANTED_FILES))
+
+
+def _wanted(path: str) -> bool:
+  return _WANTED_RE.match(path) is not None
+
+
+class ImageSnapshot:
+  """The merged view of an image's layers that the offline checks need.
+
+  Only entries matching a filesystem predicate and the contents of
+  WANTED_FILES are kept, so memory does not grow with image size. Paths are
+  relative to the image root, without a leading slash.
+  """
+
+  def __init__(self, name: str, targets: Mapping[str, Sequence[Predicate]]):
+    self.name = name
+    self.layers = 0
+    self.contents: Dict[str, bytes] = {}
+    self.symlinks: Dict[str, str] = {}
+    # path -> names of the predicates it matched.
+    self.matches: Dict[str, Tuple[str, ...]] = {}
+    self._targets = [(root.strip("/") + "/", tuple(predicates)) for root, predicates in targets.items()]
+
+  def _remove(self, path: str, keep: set, children_only: bool = False) -> None:
+    """Drop `path` (unless `children_only`) and everything below it, except entries in `keep`."""
+    prefix = path + "/" if path else ""
+    for table in (self.contents, self.symlinks, self.matches):
+      for key in [key for key in table if (key.startswith(prefix) or (key == path and not children_only)) and key not in keep]:
+        del table[key]
+
+  def _match(self, path: str, mode: int) -> None:
+    names = []
+    for prefix, predicates in self._targets:
+      if path.startswith(prefix) or path + "/" == prefix:
+        names.extend(predicate.name for predicate in predicates if predicate.file_type == stat.S_IFMT(mode) and predicate.test(mode))
+    if names:
+      self.matches[path] = tuple(dict.fromkeys(names))
+    else:
+      self.matches.pop(path, None)
+
+  def apply_layer(self, layer: IO[bytes]) -> None:
+    """Stream one layer tar (plain or compressed) over the snapshot, honouring whiteouts."""
+    added: set = set()
+    with tarfile.open(fileobj=layer, mode="r|*") as archive:
+      for member in archive:
+        # Stream mode still records every member; nothing here needs them afterwards.
+        archive.members.clear()
+        path = _normalize(member.name)
+        if path is None:
+          continue
+        directory, base = posixpath.split(path)
+        if base == OPAQUE:
+          # Hides what lower layers put in the directory, not the directory itself.
+          self._remove(directory, added, children_only=True)
+          continue
+        if base.startswith(WHITEOUT):
+          self._remove(posixpath.join(directory, base[len(WHITEOUT):]), added)
+          continue
+        added.add(path)
+        self.contents.pop(path, None)
+        self.symlinks.pop(path, None)
+        if member.isdir():
+          self._match(path, stat.S_IFDIR | member.mode)
+        elif member.isreg():
+          self._match(path, stat.S_IFREG | member.mode)
+          if _wanted(path) and member.size <= MAX_FILE_SIZE:
+            handle = archive.extractfile(member)
+            if handle is not None:
+              self.contents[path] = handle.read()
+        elif member.issym():
+          self.matches.pop(path, None)
+          if _wanted(path):
+            self.symlinks[path] = member.linkname
+        elif member.islnk():
+          source = _normalize(member.linkname)
+          if source in self.contents:
+            self.contents[path] = self.contents[source]
+          if source in self.matches:
+            self.matches[path] = self.matches[source]
+    self.layers += 1
+
+  def scan(self, targets: Mapping[str, Sequence[Predicate]]) -> Dict[str, List[str]]:
+    """Same result shape as fswalk.scan() for the roots given at construction."""
+    results: Dict[str, List[str]] = {predicate.name: [] for predicates in targets.values() for predicate in predicates}
+    for path, names in self.matches.items():
+      for name in names:
+        if name in results:
+          results[name].append("/" + path)
+    for paths in results.values():
+      paths.sort()
+    return results
+
+  def materialize(self, directory: Path) -> None:
+    """Write the kept files (not the image) below `directory` so file-based checks can read them."""
+    for path, data in self.contents.items():
+      target = directory / path
+      target.parent.mkdir(parents=True, exist_ok=True)
+      target.write_bytes(data)
+    for path, link in self.symlinks.items():
+      target = directory / path
+      target.parent.mkdir(parents=True, exist_ok=True)
+      # Resolve against the image root so no link can point outside `directory`.
+      parent = "/" + posixpath.dirname(path)
+      link = posixpath.relpath(posixpath.normpath(posixpath.join(parent, link)), parent)
+      if not target.exists() and not target.is_symlink():
+        target.symlink_to(link)
+
+
+def _layer_order(archive: tarfile.TarFile) -> Tuple[str, List[str]]:
+  """Image name and layer member names, lowest first, from manifest.json or an OCI index.json."""
+  names = set(archive.getnames())
+
+  def _json(name: str):
+    handle = archive.extractfile(name)
+    if handle is None:
+      raise ImageError(f"{name} is not a file")
+    return json.load(handle)
+
+  if "manifest.json" in names:
+    manifest = _json("manifest.json")[0]
+    tags = manifest.get("RepoTags") or []
+    return (tags[0] if tags else ""), list(manifest["Layers"])
+  if "index.json" in names:
+    index = _json("index.json")["manifests"][0]
+    name = (index.get("annotations") or {}).get("org.opencontainers.image.ref.name", "")
+    manifest = _json(_blob(index["digest"]))
+    # A multi-platform index points at further indexes; use the first platform.
+    while "manifests" in manifest:
+      manifest = _json(_blob(manifest["manifests"][0]["digest"]))
+    return name, [_blob(layer["digest"]) for layer in manifest["layers"]]
+  raise ImageError("neither manifest.json nor index.json found")
+
+
+def _blob(digest: str) -> str:
+  algorithm, _, value = digest.partition(":")
+  return f"blobs/{algorithm}/{value}"
+
+
+def read_image(path: Path, targets: Mapping[str, Sequence[Predicate]]) -> ImageSnapshot:
+  """Build a snapshot from a `docker save` or OCI layout tarball without extracting it.
+
+  The outer archive is indexed once; each layer is then streamed in order.
+  """
+  try:
+    with tarfile.open(path, mode="r:*") as archive:
+      name, layers = _layer_order(archive)
+      snapshot = ImageSnapshot(name or path.name, targets)
+      for layer in layers:
+        handle = archive.extractfile(layer)
+        if handle is None:
+          raise ImageError(f"layer {layer} missing")
+        snapshot.apply_layer(handle)
+  except (tarfile.TarError, KeyError, IndexError, ValueError) as exc:
+    raise ImageError(f"{path}: {exc}") from exc
+  return snapshot
+
+
+def _unroot(value, prefix: str):
+  if isinstance(value, str):
+    return value.replace(prefix, "")
+  if isinstance(value, list):
+    return [_unroot(item, prefix) for item in value]
+  if isinstance(value, dict):
+    return {key: _unroot(item, prefix) for key, item in value.items()}
+  return value
+
+
+def audit_image(path: str, check_names: Sequence[str], options: RunOptions):
+  """Audit one image tarball with the offline checks; runs in a worker process."""
+  from .facts import HostFacts
+  from .fleet import HostResult
+  from .orchestrator import collect_findings
+  from .registry import select
+  from .checks.check_filesystem import SUID_ROOTS, WORLD_WRITABLE_ROOTS
+  from .fswalk import SUID_SGID, WORLD_WRITABLE
+
+  start = time.perf_counter()
+  targets = {root: (WORLD_WRITABLE,) for root in WORLD_WRITABLE_ROOTS}
+  targets.update({root: (SUID_SGID,) for root in SUID_ROOTS})
+  try:
+    snapshot = read_image(Path(path), targets)
+  except (ImageError, OSError) as exc:
+    return HostResult(path, None, time.perf_counter() - start, error=str(exc))
+
+  ts = datetime.now().strftime("%Y-%m-%dT%H:%M:%S%z")
+  with tempfile.TemporaryDirectory(prefix="security-audit-image-") as directory:
+    root = Path(directory)
+    snapshot.materialize(root)
+    run_options = RunOptions(root=root, use_cache=False, allowed_ports=options.allowed_ports)
+    checks = [spec for spec in select(check_names) if spec.offline]
+    findings, exit_code = collect_findings(checks, run_options, HostFacts(root=root, image=snapshot))
+    records = [_unroot(finding.to_dict(host=snapshot.name, ts=ts), directory) for finding in findings]
+  return HostResult(snapshot.name, exit_code, time.perf_counter() - start, records)
+
+
+def audit_images(paths: Sequence[str], check_names: Sequence[str], options: RunOptions, workers: int = DEFAULT_WORKERS) -> Iterator:
+  """Audit image tarballs across `workers` processes, yielding each HostResult as it completes."""
+  with ProcessPoolExecutor(max_workers=max(1, min(workers, len(paths) or 1))) as pool:
+    futures = [pool.submit(audit_image, path, check_names, options) for path in paths]
+    for future in as_completed(futures):
+      yield future.result()
+
+
+__all__ = ["ImageError", "ImageSnapshot", "audit_image", "audit_images", "read_image"]
@@ -0,0 +1,240 @@
+"""
+Change notification for the files and directories checks depend on.
+
+`Inotify` uses Linux inotify through ctypes; `PollWatcher` compares stat
+signatures and is used where inotify is unavailable. Both watch *targets*
+(paths that may not exist yet) and report which targets changed.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import errno
+import os
+import select
+import struct
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+  IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+_EVENT = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+# Seconds without further events before a burst (editor save, package upgrade) is reported.
+SETTLE = 0.5
+# Longest a continuous burst may delay the report.
+MAX_SETTLE = 10.0
+POLL_INTERVAL = 5.0
+
+
+class WatchError(OSError):
+  """inotify is not available or could not be initialised."""
+
+
+def _directories(target: str) -> List[str]:
+  """Directories to watch for `target`: itself when it is one, and its nearest existing parent.
+
+  Watching the parent catches files replaced by rename (how editors and
+  package managers write) and targets that do not exist yet.
+  """
+  directories = [target] if os.path.isdir(target) else []
+  parent = os.path.dirname(target) or "/"
+  while not os.path.isdir(parent) and parent != "/":
+    parent = os.path.dirname(parent)
+  directories.append(parent)
+  return directories
+
+
+def _affects(path: str, target: str) -> bool:
+  # The target itself, something inside it, or a missing ancestor being created or removed.
+  return path == target or path.startswith(target + "/") or target.startswith(path + "/")
+
+
+class _Watcher:
+  def __init__(self, targets: Iterable[str]):
+    self.targets = sorted(set(targets))
+
+  def wait(self, timeout: float | None, wake_fd: int | None = None) -> Set[str]:
+    """Targets that changed, waiting up to `timeout` seconds; empty on timeout or when `wake_fd` becomes readable."""
+    raise NotImplementedError
+
+  def close(self) -> None:
+    pass
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.close()
+    return False
+
+
+class Inotify(_Watcher):
+  """inotify watches on the directories holding each target."""
+
+  def __init__(self, targets: Iterable[str]):
+    super().__init__(targets)
+    try:
+      libc = ctypes.CDLL(None, use_errno=True)
+      self._add_watch = libc.inotify_add_watch
+      self._rm_watch = libc.inotify_rm_watch
+      self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+      self._rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+      self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError) as exc:
+      raise WatchError(f"inotify unavailable: {exc}") from exc
+    if self.fd < 0:
+      code = ctypes.get_errno()
+      raise WatchError(code, f"inotify_init1: {os.strerror(code)}")
+    self._dirs: Dict[int, str] = {}
+    self.arm()
+
+  def arm(self) -> None:
+    """(Re)add watches; needed after directories were created, removed or renamed."""
+    wanted = {directory for target in self.targets for directory in _directories(target)}
+    current = set(self._dirs.values())
+    for wd, directory in list(self._dirs.items()):
+      if directory not in wanted:
+        self._rm_watch(self.fd, wd)
+        del self._dirs[wd]
+    for directory in wanted - current:
+      wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK | IN_ONLYDIR)
+      if wd >= 0:
+        self._dirs[wd] = directory
+      elif ctypes.get_errno() == errno.ENOSPC:
+        raise WatchError(errno.ENOSPC, "inotify watch limit reached (fs.inotify.max_user_watches)")
+
+  def _read(self) -> Tuple[Set[str], bool]:
+    """Changed targets from the queued events, and whether watches must be re-armed."""
+    changed: Set[str] = set()
+    rearm = False
+    while True:
+      try:
+        data = os.read(self.fd, READ_SIZE)
+      except BlockingIOError:
+        return changed, rearm
+      offset = 0
+      while offset < len(data):
+        wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+        offset += _EVENT.size
+        name = data[offset:offset + length].rstrip(b"\0")
+        offset += length
+        if mask & IN_Q_OVERFLOW:
+          # Events were dropped; treat everything as changed.
+          return set(self.targets), True
+        if mask & IN_IGNORED:
+          # The kernel dropped the watch (directory removed or unmounted).
+          self._dirs.pop(wd, None)
+          rearm = True
+          continue
+        directory = self._dirs.get(wd)
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+          rearm = True
+        if directory is None:
+          continue
+        path = os.path.join(directory, os.fsdecode(name)) if name else directory
+        if mask & (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF):
+          # A target directory may have appeared or gone away.
+          rearm = rearm or any(target == path or target.startswith(path + "/") for target in self.targets)
+        changed.update(target for target in self.targets if _affects(path, target))
+
+  def _ready(self, timeout: float | None, wake_fd: int | None) -> bool:
+    fds = [self.fd] if wake_fd is None else [self.fd, wake_fd]
+    readable, _, _ = select.select(fds, [], [], timeout)
+    return self.fd in readable
+
+  def wait(self, timeout: float | None, wake_fd: int | None = None) -> Set[str]:
+    if not self._ready(timeout, wake_fd):
+      return set()
+    changed: Set[str] = set()
+    deadline = time.monotonic() + MAX_SETTLE
+    while True:
+      batch, rearm = self._read()
+      changed |= batch
+      if rearm:
+        self.arm()
+      remaining = deadline - time.monotonic()
+      if remaining <= 0 or not self._ready(min(SETTLE, remaining), wake_fd):
+        return changed
+
+  def close(self) -> None:
+    if self.fd >= 0:
+      os.close(self.fd)
+      self.fd = -1
+
+
+def _signature(target: str):
+  try:
+    st = os.stat(target)
+  except OSError:
+    return None
+  signature = [(st.st_ino, st.st_mtime_ns, st.st_size, st.st_mode)]
+  if os.path.isdir(target):
+    try:
+      with os.scandir(target) as entries:
+        for entry in entries:
+          try:
+            child = entry.stat(follow_symlinks=False)
+          except OSError:
+            continue
+          signature.append((entry.name, child.st_ino, child.st_mtime_ns, child.st_size, child.st_mode))
+    except OSError:
+      pass
+    signature.sort(key=str)
+  return signature
+
+
+class PollWatcher(_Watcher):
+  """Stat-based fallback: compares each target (and a directory's entries) every `interval` seconds."""
+
+  def __init__(self, targets: Iterable[str], interval: float = POLL_INTERVAL):
+    super().__init__(targets)
+    self.interval = interval
+    self._seen = {target: _signature(target) for target in self.targets}
+
+  def wait(self, timeout: float | None, wake_fd: int | None = None) -> Set[str]:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+      delay = self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic()))
+      if wake_fd is not None:
+        readable, _, _ = select.select([wake_fd], [], [], delay)
+        if readable:
+          return set()
+      else:
+        time.sleep(delay)
+      changed = set()
+      for target in self.targets:
+        signature = _signature(target)
+        if signature != self._seen[target]:
+          self._seen[target] = signature
+          changed.add(target)
+      if changed or (deadline is not None and time.monotonic() >= deadline):
+        return changed
+
+
+def watcher(targets: Iterable[str]) -> _Watcher:
+  """inotify where available, polling otherwise."""
+  targets = list(targets)
+  try:
+    return Inotify(targets)
+  except WatchError:
+    return PollWatcher(targets)
+
+
+__all__ = ["Inotify", "PollWatcher", "WatchError", "watcher"]
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+from typing import IO, Any, Dict, Iterator
+
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\r\n"
+_DELIMITERS = ",]}" + _WHITESPACE
+
+
+class _Reader:
+  """Incremental JSON value reader over a text stream."""
+
+  def __init__(self, handle: IO[str], chunk_size: int = CHUNK_SIZE):
+    self.handle = handle
+    self.chunk_size = chunk_size
+    self.buf = ""
+    self.pos = 0
+    self.eof = False
+    self.decoder = json.JSONDecoder()
+
+  def _fill(self, size: int) -> bool:
+    if self.eof:
+      return False
+    chunk = self.handle.read(size)
+    if not chunk:
+      self.eof = True
+      return False
+    if self.pos > self.chunk_size:
+      # Drop consumed input so the buffer only holds the current value.
+      self.buf = self.buf[self.pos:]
+      self.pos = 0
+    self.buf += chunk
+    return True
+
+  def _skip_ws(self) -> None:
+    while True:
+      while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+        self.pos += 1
+      if self.pos < len(self.buf) or not self._fill(self.chunk_size):
+        return
+
+  def next_char(self) -> str:
+    self._skip_ws()
+    if self.pos >= len(self.buf):
+      raise ValueError("Unexpected end of JSON input")
+    char = self.buf[self.pos]
+    self.pos += 1
+    return char
+
+  def peek(self) -> str:
+    self._skip_ws()
+    return self.buf[self.pos] if self.pos < len(self.buf) else ""
+
+  def expect(self, char: str) -> None:
+    found = self.next_char()
+    if found != char:
+      raise ValueError(f"Expected {char!r} in JSON input, found {found!r}")
+
+  def value(self) -> Any:
+    self._skip_ws()
+    size = self.chunk_size
+    while True:
+      try:
+        obj, end = self.decoder.raw_decode(self.buf, self.pos)
+        # A number cut at the buffer edge ("1" of "1.5") still decodes; only
+        # accept it once a delimiter follows.
+        if self.eof or not isinstance(obj, (int, float)) or (
+          end < len(self.buf) and self.buf[end] in _DELIMITERS
+        ):
+          self.pos = end
+          return obj
+      except json.JSONDecodeError:
+        if self.eof:
+          raise
+      # Grow reads geometrically so huge values are not re-parsed too often.
+      self._fill(size)
+      size *= 2
+
+
+def iter_array_items(handle: IO[str], key: str = "items", meta: Dict[str, Any] | None = None) -> Iterator[Any]:
+  """Yield elements of a top-level object's `key` array one at a time.
+
+  Only the element being decoded is held in memory. Other top-level members
+  (e.g. a list's `metadata`) are decoded whole and stored in `meta`; they are
+  complete once the generator is exhausted.
+  """
+  reader = _Reader(handle)
+  reader.expect("{")
+  if reader.peek() == "}":
+    return
+  while True:
+    name = reader.value()
+    reader.expect(":")
+    if name == key and reader.peek() == "[":
+      reader.expect("[")
+      if reader.peek() == "]":
+        reader.expect("]")
+      else:
+        while True:
+          yield reader.value()
+          separator = reader.next_char()
+          if separator == "]":
+            break
+          if separator != ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, found {separator!r}")
+    else:
+      value = reader.value()
+      if meta is not None:
+        meta[name] = value
+    separator = reader.next_char()
+    if separator == "}":
+      return
+    if separator != ",":
+      raise ValueError(f"Expected ',' or '}}' in JSON object, found {separator!r}")
+
+
+__all__ = ["iter_array_items"]
@@ -1,24 +1,51 @@
 from __future__ import annotations
 
 import os
+import re
+import socket
 import sys
 import traceback
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
-from typing import TextIO
+from typing import TYPE_CHECKING, List
 
+from .config import RunOptions, rooted
+from .facts import HostFacts
+from .findings import CRIT, INFO, WARN, Finding
+from .sinks import BackgroundFileSink, LogSink, StreamSink
+from .tracing import CheckMetrics
 
-def _color(code: str, enabled: bool) -> str:
-  return code if enabled else ""
+if TYPE_CHECKING:
+  from .governor import Governor
+  from .resultcache import ResultCache
+
+
+# Rough removal of ANSI sequences.
+ANSI_RE = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
 
 
 class TeeLogger:
-  """Writes messages to stdout and a log file simultaneously."""
+  """Writes messages to stdout and a log file simultaneously.
 
-  def __init__(self, log_path: Path):
+  With `console="ndjson"` stdout carries one JSON finding per line instead of
+  the text log, and with `console="none"` nothing; the text log file is
+  written either way. Extra NDJSON
+  destinations can be attached with add_record_sink().
+  """
+
+  def __init__(self, log_path: Path, console: str = "text"):
     self.log_path = log_path
-    self.handle: TextIO | None = None
-    self.use_color = sys.stdout.isatty()
+    self.console_text = console == "text"
+    self.sinks: List[LogSink] = []
+    self.record_sinks: List[LogSink] = []
+    if console == "ndjson":
+      self.record_sinks.append(StreamSink(sys.stdout))
+    self.host = socket.gethostname()
+    self.started = self._timestamp()
+    # Every finding logged, when a run history is kept.
+    self.retained: List[Finding] | None = None
+    self.use_color = sys.stdout.isatty() and self.console_text
     self.debug_enabled = os.environ.get("DEBUG") == "1"
     self.colors = {
       "reset": "\033[0m" if self.use_color else "",
@@ -30,27 +57,31 @@ class TeeLogger:
     }
 
   def __enter__(self) -> "TeeLogger":
-    self.handle = self.log_path.open("a", encoding="utf-8")
+    self.sinks.append(BackgroundFileSink(self.log_path))
     return self
 
   def __exit__(self, exc_type, exc, tb):
-    if self.handle:
-      self.handle.close()
+    sinks, self.sinks = self.sinks + self.record_sinks, []
+    self.record_sinks = []
+    for sink in sinks:
+      sink.close()
     return False
 
+  def add_record_sink(self, sink: LogSink) -> None:
+    self.record_sinks.append(sink)
+
   def _write(self, message: str) -> None:
-    print(message)
-    if self.handle:
-      self.handle.write(f"{self._strip_ansi(message)}\n")
-      self.handle.flush()
+    if self.console_text:
+      print(message)
+    if self.sinks:
+      line = f"{self._strip_ansi(message)}\n"
+      for sink in self.sinks:
+        sink.write(line)
 
   def _strip_ansi(self, text: str) -> str:
     if not self.use_color:
       return text
-    # Rough removal of ANSI sequences.
-    import re
-
-    return re.sub(r"\x1B\[[0-?]*[ -/]*[@-~]", "", text)
+    return ANSI_RE.sub("", text)
 
   def banner(self, title: str, base_dir: Path, log_file: Path) -> None:
     lines = [
@@ -87,15 +118,53 @@ class TeeLogger:
     prefix = f"{self.colors['red']}[CRIT]{self.colors['reset']}" if self.use_color else "[CRIT]"
     self._write(f"{prefix} {message}")
 
+  def finding(self, finding: Finding) -> None:
+    if self.retained is not None:
+      self.retained.append(finding)
+    if finding.severity == CRIT:
+      self.crit(finding.message)
+    elif finding.severity == WARN:
+      self.warn(finding.message)
+    else:
+      self.info(finding.message)
+    if self.record_sinks:
+      line = f"{finding.to_json(host=self.host, ts=self.started)}\n"
+      for sink in self.record_sinks:
+        sink.write(line)
+
   def check_summary(self, label: str, warn_count: int, crit_count: int) -> None:
     self._write(f"Summary ({label}): WARN={warn_count}, CRIT={crit_count}")
 
-  def overall_summary(self, warn_total: int, crit_total: int) -> None:
+  def check_timing(self, label: str, metrics: CheckMetrics) -> None:
+    cached = f" cached result from {datetime.fromtimestamp(metrics.cached_at):%Y-%m-%dT%H:%M:%S}" if metrics.cached_at else ""
+    self._write(
+      f"Timing ({label}): wall={metrics.wall:.2f}s cpu={metrics.cpu:.2f}s "
+      f"peak_rss={metrics.peak_rss_kb / 1024:.1f}MB "
+      f"subprocesses={len(metrics.processes)} ({metrics.process_time:.2f}s){cached}"
+    )
+    for span in metrics.slowest():
+      self._write(f"  {span.duration:6.2f}s rc={span.returncode} {span.command}")
+
+  def overall_summary(
+    self,
+    warn_total: int,
+    crit_total: int,
+    facts: HostFacts | None = None,
+    cache: ResultCache | None = None,
+    governor: Governor | None = None,
+  ) -> None:
     self._write("")
     self._write("=" * 50)
     self._write("Overall summary:")
     self._write(f"  Checks with WARN : {warn_total}")
     self._write(f"  Checks with CRIT : {crit_total}")
+    if facts is not None:
+      self._write(f"  Host facts cache : {facts.hits} hits, {facts.misses} misses")
+    if cache is not None and (cache.hits or cache.misses):
+      self._write(f"  Result cache     : {cache.hits} hits, {cache.misses} misses")
+    if governor is not None:
+      for label, text in governor.report():
+        self._write(f"  {label:<17}: {text}")
     self._write(f"  Finished at: {self._timestamp()}")
     self._write("=" * 50)
 
@@ -106,28 +175,65 @@ class TeeLogger:
     self._write("".join(traceback.format_exception(exc)))
 
   def _timestamp(self) -> str:
-    from datetime import datetime
-
     return datetime.now().strftime("%Y-%m-%dT%H:%M:%S%z")
 
 
+class LogBuffer:
+  """Records logger calls from one check so they can be replayed in order later."""
+
+  def __init__(self, debug_enabled: bool = False):
+    self.debug_enabled = debug_enabled
+    self.entries: list[tuple[str, tuple]] = []
+
+  def section(self, title: str) -> None:
+    self.entries.append(("section", (title,)))
+
+  def info(self, message: str) -> None:
+    self.entries.append(("info", (message,)))
+
+  def warn(self, message: str) -> None:
+    self.entries.append(("warn", (message,)))
+
+  def crit(self, message: str) -> None:
+    self.entries.append(("crit", (message,)))
+
+  def finding(self, finding: Finding) -> None:
+    self.entries.append(("finding", (finding,)))
+
+  def debug(self, title: str, exc: Exception) -> None:
+    if self.debug_enabled:
+      self.entries.append(("debug", (title, exc)))
+
+  def replay(self, logger: TeeLogger) -> None:
+    for method, args in self.entries:
+      getattr(logger, method)(*args)
+    self.entries.clear()
+
+
 @dataclass
 class CheckContext:
   label: str
-  logger: TeeLogger
+  logger: TeeLogger | LogBuffer
   warn_count: int = 0
   crit_count: int = 0
+  options: RunOptions = field(default_factory=RunOptions)
+  facts: HostFacts = field(default_factory=HostFacts)
+  metrics: CheckMetrics = field(default_factory=CheckMetrics)
 
   def section(self, title: str) -> None:
     self.logger.section(title)
 
-  def info(self, message: str) -> None:
-    self.logger.info(message)
+  def path(self, path: str | Path) -> Path:
+    """Where the host path `path` lives for this run (inside --root when set)."""
+    return rooted(path, self.options.root)
 
-  def warn(self, message: str) -> None:
+  def info(self, message: str, rule: str | None = None, **attrs) -> None:
+    self.logger.finding(Finding(self.label, INFO, message, rule, attrs))
+
+  def warn(self, message: str, rule: str | None = None, **attrs) -> None:
     self.warn_count += 1
-    self.logger.warn(message)
+    self.logger.finding(Finding(self.label, WARN, message, rule, attrs))
 
-  def crit(self, message: str) -> None:
+  def crit(self, message: str, rule: str | None = None, **attrs) -> None:
     self.crit_count += 1
-    self.logger.crit(message)
+    self.logger.finding(Finding(self.label, CRIT, message, rule, attrs))
@@ -1,47 +1,37 @@
 from __future__ import annotations
 
 import importlib
+import inspect
 import os
-import sys
-from dataclasses import dataclass
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Callable, Iterable, List, Sequence, Tuple
+from typing import Callable, Iterator, List, Sequence, Tuple
 
-from .logging_utils import CheckContext, TeeLogger
+from .config import RunOptions, cache_dir, log_dir, rooted
+from .facts import HostFacts
+from .findings import Finding
+from .governor import active_governor
+from .logging_utils import CheckContext, LogBuffer, TeeLogger
+from .registry import CHECKS, CheckSpec
+from .resultcache import ResultCache
+from .sinks import BackgroundFileSink
+from .tracing import measure, write_chrome_trace
 
 
-@dataclass
-class CheckDefinition:
-  """Describes a single security check."""
-
-  label: str
-  module: str
-  func_name: str = "run"
-
-
-DEFAULT_CHECKS: Sequence[CheckDefinition] = (
-  CheckDefinition(label="OS", module="security_audit.checks.check_os"),
-  CheckDefinition(label="updates", module="security_audit.checks.check_updates"),
-  CheckDefinition(label="filesystem", module="security_audit.checks.check_filesystem"),
-  CheckDefinition(label="network/firewall", module="security_audit.checks.check_network"),
-  CheckDefinition(label="logging/audit", module="security_audit.checks.check_logging"),
-  CheckDefinition(label="SSH", module="security_audit.checks.check_ssh"),
-  CheckDefinition(label="sudo/users", module="security_audit.checks.check_sudo"),
-  CheckDefinition(label="Docker", module="security_audit.checks.check_docker"),
-  CheckDefinition(label="Kubernetes", module="security_audit.checks.check_k8s"),
-)
+# Kept for callers that still build definitions by hand.
+CheckDefinition = CheckSpec
+DEFAULT_CHECKS: Sequence[CheckSpec] = CHECKS
 
 
 def resolve_log_paths() -> Tuple[Path, Path]:
-  script_dir = Path(__file__).resolve().parents[1]
-  log_dir = Path(os.environ.get("LOG_DIR", script_dir / "logs"))
-  log_dir.mkdir(parents=True, exist_ok=True)
+  directory = log_dir()
+  directory.mkdir(parents=True, exist_ok=True)
 
   timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-  log_file = log_dir / f"security_orchestrator_{timestamp}.log"
+  log_file = directory / f"security_orchestrator_{timestamp}.log"
 
-  latest = log_dir / "latest.log"
+  latest = directory / "latest.log"
   if latest.exists() or latest.is_symlink():
     latest.unlink()
   latest.symlink_to(log_file.name)
@@ -49,7 +39,22 @@ def resolve_log_paths() -> Tuple[Path, Path]:
   return log_file, latest
 
 
-def load_check_callable(defn: CheckDefinition) -> Callable[[CheckContext], None]:
+def _requirements_met(defn: CheckSpec, facts: HostFacts) -> bool:
+  if not defn.requires:
+    return True
+  for requirement in defn.requires:
+    if requirement.startswith("$"):
+      if os.environ.get(requirement[1:]):
+        return True
+    elif requirement.startswith("/"):
+      if os.path.exists(rooted(requirement, facts.root)):
+        return True
+    elif facts.has_command(requirement):
+      return True
+  return False
+
+
+def load_check_callable(defn: CheckSpec) -> Callable[[CheckContext], object]:
   module = importlib.import_module(defn.module)
   func = getattr(module, defn.func_name, None)
   if func is None:
@@ -57,34 +62,150 @@ def load_check_callable(defn: CheckDefinition) -> Callable[[CheckContext], None]
   return func
 
 
-def run_checks(checks: Sequence[CheckDefinition] | None = None) -> int:
+def _run_check(defn: CheckSpec, context: CheckContext, cache: ResultCache | None = None) -> None:
+  with measure(context.metrics, per_thread_cpu=context.options.jobs > 1):
+    try:
+      if context.options.root is not None and not defn.offline:
+        context.section(defn.section or defn.label)
+        context.info("Skipped: this check inspects the running host, not a root filesystem.")
+        return
+      if not _requirements_met(defn, context.facts):
+        # Same output the check would produce, without importing it.
+        context.section(defn.section)
+        context.info(defn.skip_message)
+        return
+      keys = cache.keys(defn, context.facts, context.options) if cache is not None and defn.cache_ttl else None
+      if keys is not None and context.options.use_cache and cache.replay(defn, keys, context):
+        return
+      check_fn = load_check_callable(defn)
+      if inspect.iscoroutinefunction(check_fn):
+        import asyncio
+
+        asyncio.run(check_fn(context))
+      else:
+        check_fn(context)
+      if keys is not None:
+        cache.store(defn, keys, context)
+    except Exception as exc:  # pylint: disable=broad-except
+      context.warn(f"Check '{defn.label}' failed: {exc}", rule="orchestrator.check_failed")
+      if context.logger.debug_enabled:
+        context.logger.debug("Exception detail", exc)
+
+
+def _iter_checks(
+  selected: Sequence[CheckSpec],
+  logger: TeeLogger,
+  options: RunOptions,
+  facts: HostFacts,
+  cache: ResultCache | None = None,
+) -> Iterator[Tuple[CheckSpec, CheckContext]]:
+  """Yield finished checks in declaration order, running up to `options.jobs` at once."""
+  if options.jobs <= 1:
+    for defn in selected:
+      # Cacheable checks are buffered so their output can be stored.
+      buffered = cache is not None and defn.cache_ttl
+      sink = LogBuffer(logger.debug_enabled) if buffered else logger
+      context = CheckContext(defn.label, sink, options=options, facts=facts)
+      logger.sep(defn.label)
+      _run_check(defn, context, cache)
+      if buffered:
+        sink.replay(logger)
+        context.logger = logger
+      yield defn, context
+    return
+
+  # Checks mostly wait on subprocesses, so threads are enough to overlap them.
+  # Output is buffered per check and replayed in order to keep the log stable.
+  from concurrent.futures import ThreadPoolExecutor
+
+  with ThreadPoolExecutor(max_workers=options.jobs, thread_name_prefix="check") as pool:
+    pending = []
+    for defn in selected:
+      context = CheckContext(defn.label, LogBuffer(logger.debug_enabled), options=options, facts=facts)
+      pending.append((defn, context, pool.submit(_run_check, defn, context, cache)))
+
+    for defn, context, future in pending:
+      future.result()
+      logger.sep(defn.label)
+      context.logger.replay(logger)
+      context.logger = logger
+      yield defn, context
+
+
+def run_checks(
+  checks: Sequence[CheckSpec] | None = None,
+  options: RunOptions | None = None,
+) -> int:
+  options = options or RunOptions()
   log_file, _ = resolve_log_paths()
-  with TeeLogger(log_file) as logger:
+  started = time.time()
+  # A diff replaces the console report; the log file still gets everything.
+  with TeeLogger(log_file, console="none" if options.diff_since else options.format) as logger:
+    if options.history is not None:
+      logger.retained = []
+    if options.ndjson_file:
+      logger.add_record_sink(BackgroundFileSink(options.ndjson_file))
     base_dir = Path(__file__).resolve().parents[1]
     logger.banner("DevSecOps Security Orchestrator", base_dir, log_file)
 
-    selected = checks or DEFAULT_CHECKS
+    selected = DEFAULT_CHECKS if checks is None else checks
+    facts = HostFacts(root=options.root)
+    # Cache keys describe the live host, so a root filesystem audit never uses them.
+    cache = ResultCache(cache_dir()) if options.root is None else None
+    origin = time.perf_counter()
+    finished = []
     total_warn = 0
     total_crit = 0
 
-    for defn in selected:
-      context = CheckContext(defn.label, logger)
-      logger.sep(defn.label)
-
-      try:
-        check_fn = load_check_callable(defn)
-        check_fn(context)
-      except Exception as exc:  # pylint: disable=broad-except
-        context.warn(f"Check '{defn.label}' failed: {exc}")
-        if logger.debug_enabled:
-          logger.debug("Exception detail", exc)
-
+    for defn, context in _iter_checks(selected, logger, options, facts, cache):
       logger.check_summary(defn.label, context.warn_count, context.crit_count)
+      logger.check_timing(defn.label, context.metrics)
+      finished.append((defn.label, context.metrics))
       total_warn += context.warn_count
       total_crit += context.crit_count
 
-    logger.overall_summary(total_warn, total_crit)
-
+    logger.overall_summary(total_warn, total_crit, facts, cache, active_governor())
+
+  if options.trace:
+    write_chrome_trace(options.trace, finished, origin)
+  exit_code = _exit_code(total_warn, total_crit)
+  if options.history is not None:
+    host = logger.host if options.root is None else f"{logger.host}:{options.root}"
+    labels = [defn.label for defn in selected]
+    diff_exit = _record_history(options, host, started, exit_code, labels, logger.retained or [])
+    if diff_exit is not None:
+      return diff_exit
+  return exit_code
+
+
+def _record_history(options: RunOptions, host: str, started: float, exit_code: int, labels: Sequence[str], findings: Sequence[Finding]) -> int | None:
+  """Append the run to the history; with --diff-since print the changes and return their exit code."""
+  import json
+  import sqlite3
+  import sys
+
+  from .history import History, format_diff, parse_time
+
+  try:
+    with History(options.history) as history:
+      run_id = history.record_run(host, started, exit_code, labels, (finding.to_dict() for finding in findings))
+      if not options.diff_since:
+        return None
+      before = None if options.diff_since == "last" else parse_time(options.diff_since)
+      diff = history.diff(run_id, history.previous_run(run_id, before))
+      if options.format == "ndjson":
+        for change, items in (("new", diff.new), ("resolved", diff.resolved)):
+          for finding in items:
+            print(json.dumps(finding.to_dict(change=change), separators=(",", ":"), ensure_ascii=False))
+      else:
+        print("\n".join(format_diff(diff, host, history.first_seen)))
+      return diff.exit_code
+  except (OSError, sqlite3.Error) as exc:
+    print(f"Run history not updated ({options.history}): {exc}", file=sys.stderr)
+    return None
+
+
+def _exit_code(total_warn: int, total_crit: int) -> int:
   if total_crit > 0:
     return 2
   if total_warn > 0:
@@ -92,4 +213,24 @@ def run_checks(checks: Sequence[CheckDefinition] | None = None) -> int:
   return 0
 
 
-__all__ = ["run_checks", "DEFAULT_CHECKS", "CheckDefinition"]
+def evaluate_check(defn: CheckSpec, options: RunOptions, facts: HostFacts, debug_enabled: bool = False) -> CheckContext:
+  """Run one check into a LogBuffer (no result cache) and return its context for the caller to inspect or replay."""
+  context = CheckContext(defn.label, LogBuffer(debug_enabled), options=options, facts=facts)
+  _run_check(defn, context)
+  return context
+
+
+def collect_findings(checks: Sequence[CheckSpec], options: RunOptions, facts: HostFacts) -> Tuple[List[Finding], int]:
+  """Run `checks` one after another without any log output; their findings and the run_checks exit code."""
+  findings: List[Finding] = []
+  total_warn = 0
+  total_crit = 0
+  for defn in checks:
+    context = evaluate_check(defn, options, facts)
+    findings.extend(args[0] for method, args in context.logger.entries if method == "finding")
+    total_warn += context.warn_count
+    total_crit += context.crit_count
+  return findings, _exit_code(total_warn, total_crit)
+
+
+__all__ = ["collect_findings", "evaluate_check", "run_checks", "DEFAULT_CHECKS", "CheckDefinition", "CheckSpec", "RunOptions"]
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Collection, Dict, Iterable, List, Tuple
+
+from .governor import throttle_scan
+
+
+PROTOCOLS = ("tcp", "tcp6", "udp", "udp6")
+TCP_LISTEN = "0A"
+UDP_UNCONNECTED = "07"
+DEFAULT_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+WILDCARDS = ("0.0.0.0", "::")
+
+
+@dataclass
+class Listener:
+  """A listening TCP socket or unconnected UDP socket from /proc/net."""
+
+  protocol: str
+  address: str
+  port: int
+  inode: int
+  uid: int
+  pid: int | None = None
+  process: str | None = None
+  executable: str | None = None
+
+  @property
+  def wildcard(self) -> bool:
+    return self.address in WILDCARDS
+
+  def endpoint(self) -> str:
+    return f"[{self.address}]:{self.port}" if ":" in self.address else f"{self.address}:{self.port}"
+
+
+def _decode_address(text: str) -> Tuple[str, int]:
+  # Addresses are hex of the in-kernel 32-bit words in host (little-endian) order.
+  host, port = text.split(":")
+  raw = bytes.fromhex(host)
+  if len(raw) == 4:
+    return socket.inet_ntop(socket.AF_INET, raw[::-1]), int(port, 16)
+  words = b"".join(raw[offset:offset + 4][::-1] for offset in range(0, 16, 4))
+  address = socket.inet_ntop(socket.AF_INET6, words)
+  if address.startswith("::ffff:") and "." in address:
+    address = address[7:]
+  return address, int(port, 16)
+
+
+def _parse_table(path: str, protocol: str) -> List[Listener]:
+  state = TCP_LISTEN if protocol.startswith("tcp") else UDP_UNCONNECTED
+  listeners = []
+  with open(path, encoding="ascii") as handle:
+    next(handle, None)
+    for line in handle:
+      fields = line.split(None, 10)
+      # Only listening TCP / unconnected UDP sockets are of interest; the state
+      # test comes first so established connections cost one split each.
+      if len(fields) < 10 or fields[3] != state:
+        continue
+      if protocol.startswith("udp") and not fields[2].endswith(":0000"):
+        continue
+      address, port = _decode_address(fields[1])
+      listeners.append(Listener(protocol, address, port, int(fields[9]), int(fields[7])))
+  return listeners
+
+
+def _socket_owners(proc_root: str, inodes: Collection[int], workers: int) -> Dict[int, int]:
+  """Map socket inodes to the first pid holding them, in one parallel pass over /proc/*/fd."""
+  wanted = {f"socket:[{inode}]": inode for inode in inodes}
+  owners: Dict[int, int] = {}
+  lock = threading.Lock()
+  done = threading.Event()
+
+  def _scan(pid: int) -> None:
+    if done.is_set():
+      return
+    try:
+      entries = os.scandir(f"{proc_root}/{pid}/fd")
+    except OSError:
+      # Process exited or belongs to another user (needs root).
+      return
+    found = []
+    visited = 0
+    with entries:
+      for entry in entries:
+        visited += 1
+        try:
+          target = os.readlink(entry.path)
+        except OSError:
+          continue
+        inode = wanted.get(target)
+        if inode is not None:
+          found.append(inode)
+    throttle_scan(visited)
+    if found:
+      with lock:
+        for inode in found:
+          owners.setdefault(inode, pid)
+        if len(owners) == len(wanted):
+          done.set()
+
+  pids = [int(name) for name in os.listdir(proc_root) if name.isdigit()]
+  with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="procnet") as pool:
+    list(pool.map(_scan, pids))
+  return owners
+
+
+def _process_info(proc_root: str, pid: int) -> Tuple[str | None, str | None]:
+  try:
+    with open(f"{proc_root}/{pid}/comm", encoding="utf-8", errors="replace") as handle:
+      name = handle.read().strip() or None
+  except OSError:
+    name = None
+  try:
+    executable = os.readlink(f"{proc_root}/{pid}/exe")
+  except OSError:
+    executable = None
+  return name, executable
+
+
+def listeners(proc_root: str = "/proc", protocols: Iterable[str] = PROTOCOLS, workers: int = DEFAULT_WORKERS) -> List[Listener]:
+  """Listening sockets with owning process where visible, sorted by protocol, port and address.
+
+  Raises OSError when /proc/net cannot be read at all (non-Linux hosts).
+  """
+  found: List[Listener] = []
+  readable = False
+  for protocol in protocols:
+    try:
+      found.extend(_parse_table(f"{proc_root}/net/{protocol}", protocol))
+      readable = True
+    except FileNotFoundError:
+      # e.g. IPv6 disabled.
+      continue
+  if not readable:
+    raise FileNotFoundError(f"{proc_root}/net has no socket tables")
+
+  owners = _socket_owners(proc_root, {listener.inode for listener in found if listener.inode}, workers) if found else {}
+  info: Dict[int, Tuple[str | None, str | None]] = {}
+  for listener in found:
+    pid = owners.get(listener.inode)
+    if pid is None:
+      continue
+    if pid not in info:
+      info[pid] = _process_info(proc_root, pid)
+    listener.pid = pid
+    listener.process, listener.executable = info[pid]
+  found.sort(key=lambda listener: (listener.protocol, listener.port, listener.address))
+  return found
+
+
+__all__ = ["Listener", "PROTOCOLS", "listeners"]
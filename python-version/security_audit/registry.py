@@ -0,0 +1,161 @@
+"""
+Check metadata that can be read without importing any check module.
+
+Kept free of heavy imports (no dataclasses/typing/asyncio) so that
+`--list-checks` and check selection stay cheap at interpreter start-up.
+"""
+
+from __future__ import annotations
+
+
+class CheckSpec:
+  """Describes a single security check.
+
+  `requires` lists commands (bare names), absolute paths or `$ENV_VARS`; when
+  none of them is present the orchestrator logs `section`/`skip_message` itself and never
+  imports the module.
+
+  Checks with a `cache_ttl` (seconds) have their findings cached on disk and
+  replayed while the result is younger than the TTL and every `cache_keys`
+  entry (`mtime:PATH`, `env:NAME`, `command:ARGS`, `option:NAME`,
+  `sshd_config:PATH`, `sudoers:PATH`) still has the same value; `option:`
+  keys name the RunOptions fields that change what a check reports.
+
+  `watch` names further files or directories whose changes make the daemon
+  re-run the check; the `mtime:` cache keys are watched as well.
+
+  `offline` checks only read files and can audit a root filesystem or image
+  (--root/--image); the others inspect the running host and are skipped there.
+  """
+
+  __slots__ = ("label", "module", "func_name", "requires", "section", "skip_message", "cache_ttl", "cache_keys", "watch", "offline")
+
+  def __init__(
+    self,
+    label: str,
+    module: str,
+    func_name: str = "run",
+    requires: tuple = (),
+    section: str = "",
+    skip_message: str = "",
+    cache_ttl: float = 0,
+    cache_keys: tuple = (),
+    watch: tuple = (),
+    offline: bool = False,
+  ):
+    self.label = label
+    self.module = module
+    self.func_name = func_name
+    self.requires = requires
+    self.section = section
+    self.skip_message = skip_message
+    self.cache_ttl = cache_ttl
+    self.cache_keys = cache_keys
+    self.watch = watch
+    self.offline = offline
+
+  @property
+  def name(self) -> str:
+    """Short selector name, e.g. 'os' for security_audit.checks.check_os."""
+    return self.module.rsplit(".", 1)[-1].replace("check_", "", 1)
+
+  @property
+  def watch_paths(self) -> tuple:
+    """Paths (possibly `~`-relative) the check reads: `watch` plus the `mtime:` cache keys."""
+    return self.watch + tuple(key[len("mtime:"):] for key in self.cache_keys if key.startswith("mtime:"))
+
+  def matches(self, selector: str) -> bool:
+    selector = selector.strip().lower()
+    return selector in (self.name, self.label.lower(), self.module)
+
+  def __repr__(self) -> str:
+    return f"CheckSpec(label={self.label!r}, module={self.module!r})"
+
+
+CHECKS = (
+  CheckSpec(
+    label="OS",
+    module="security_audit.checks.check_os",
+    watch=("/etc/os-release", "/var/run/reboot-required"),
+    offline=True,
+  ),
+  CheckSpec(
+    label="updates",
+    module="security_audit.checks.check_updates",
+    cache_ttl=900,
+    cache_keys=(
+      "mtime:/var/lib/dpkg/status",
+      "mtime:/var/cache/apt/pkgcache.bin",
+      "mtime:/var/lib/apt/lists",
+      "mtime:/var/lib/rpm",
+      "mtime:/var/cache/dnf",
+    ),
+    offline=True,
+  ),
+  CheckSpec(label="filesystem", module="security_audit.checks.check_filesystem", offline=True),
+  CheckSpec(label="network/firewall", module="security_audit.checks.check_network"),
+  CheckSpec(label="logging/audit", module="security_audit.checks.check_logging"),
+  CheckSpec(
+    label="SSH",
+    module="security_audit.checks.check_ssh",
+    requires=("/etc/ssh/sshd_config",),
+    section="SSH configuration",
+    skip_message="No /etc/ssh/sshd_config found (sshd may not be running on this host).",
+    cache_ttl=3600,
+    cache_keys=("sshd_config:/etc/ssh/sshd_config", "option:sshd_test"),
+    watch=("/etc/ssh/sshd_config", "/etc/ssh/sshd_config.d"),
+    offline=True,
+  ),
+  CheckSpec(
+    label="sudo/users",
+    module="security_audit.checks.check_sudo",
+    cache_ttl=3600,
+    cache_keys=("sudoers:/etc/sudoers", "mtime:/etc/passwd", "mtime:/etc/shadow", "option:nss_timeout"),
+    watch=("/etc/sudoers", "/etc/sudoers.d"),
+    offline=True,
+  ),
+  CheckSpec(
+    label="Docker",
+    module="security_audit.checks.check_docker",
+    requires=("docker", "/var/run/docker.sock", "$DOCKER_HOST"),
+    section="Docker / container runtime",
+    skip_message="Docker CLI not found – skipping Docker checks.",
+  ),
+  CheckSpec(
+    label="Kubernetes",
+    module="security_audit.checks.check_k8s",
+    requires=("kubectl",),
+    section="Kubernetes checks",
+    skip_message="kubectl not found – skipping Kubernetes checks.",
+    cache_ttl=300,
+    # The list's resourceVersion moves with every write in the cluster, so a new pod invalidates the result.
+    cache_keys=(
+      "env:KUBECONFIG",
+      "mtime:~/.kube/config",
+      "command:kubectl config current-context",
+      "command:kubectl get --raw /api/v1/pods?limit=1",
+    ),
+  ),
+)
+
+
+def split_selectors(values) -> list:
+  """Flatten repeated/comma-separated --only/--skip values."""
+  return [part for value in values or () for part in value.split(",") if part.strip()]
+
+
+def select(only=None, skip=None, checks=CHECKS) -> tuple:
+  """Filter checks by --only/--skip selectors (short name, label or module), keeping order."""
+  only = split_selectors(only)
+  skip = split_selectors(skip)
+  unknown = [value for value in only + skip if not any(spec.matches(value) for spec in checks)]
+  if unknown:
+    raise ValueError(f"Unknown check(s): {', '.join(unknown)}")
+  return tuple(
+    spec
+    for spec in checks
+    if (not only or any(spec.matches(value) for value in only)) and not any(spec.matches(value) for value in skip)
+  )
+
+
+__all__ = ["CHECKS", "CheckSpec", "select", "split_selectors"]
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shlex
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+from .config import RunOptions, cache_dir
+from .facts import HostFacts
+from .findings import Finding
+from .logging_utils import CheckContext, LogBuffer
+from .registry import CheckSpec
+from .utils import run_command
+
+
+KEY_COMMAND_TIMEOUT = 10
+
+
+def _digest(value) -> str:
+  return hashlib.sha256(json.dumps(value).encode("utf-8")).hexdigest()
+
+
+def _key_value(key: str, facts: HostFacts, options: RunOptions | None = None) -> str | None:
+  """Current value of one invalidation key, or None when it cannot be determined.
+
+  Keys are `mtime:PATH` (inode, mtime and size; `~` is expanded),
+  `env:NAME`, `command:ARGS` (SHA-256 of stdout), `option:NAME` (a
+  RunOptions field the check reads, such as --nss-accounts), or `sshd_config:PATH` /
+  `sudoers:PATH`: the inode, mtime and size of that file and of every file it
+  includes (and, for sshd_config, what each Include glob matches). A
+  directory's mtime does not change when a file in it is edited in place,
+  so drop-in directories are not keyed by their own mtime.
+  """
+  kind, _, arg = key.partition(":")
+  if kind == "option":
+    return json.dumps(getattr(options or RunOptions(), arg), default=str)
+  if kind == "sshd_config":
+    from . import sshconfig
+
+    try:
+      config = sshconfig.load(Path(arg), cache_dir() / sshconfig.CACHE_NAME)
+    except (OSError, sshconfig.SshConfigError):
+      return None
+    return _digest(config.stamps)
+  if kind == "sudoers":
+    from . import sudoers
+
+    cache = sudoers.ParseCache.load(cache_dir() / sudoers.CACHE_NAME)
+    policy = sudoers.load(Path(arg), cache)
+    try:
+      cache.save()
+    except OSError:
+      pass
+    return _digest([policy.stamps, policy.problems])
+  if kind == "mtime":
+    try:
+      st = os.stat(os.path.expanduser(arg))
+    except FileNotFoundError:
+      return "-"
+    except OSError:
+      return None
+    return f"{st.st_ino}:{st.st_mtime_ns}:{st.st_size}"
+  if kind == "env":
+    return os.environ.get(arg, "")
+  if kind == "command":
+    args = shlex.split(arg)
+    if not facts.has_command(args[0]):
+      return "-"
+    try:
+      result = run_command(args, timeout=KEY_COMMAND_TIMEOUT)
+    except Exception:  # pylint: disable=broad-except
+      return None
+    if result.returncode != 0:
+      return None
+    return hashlib.sha256(result.stdout.encode("utf-8", "surrogateescape")).hexdigest()
+  raise ValueError(f"Unknown cache key {key!r}")
+
+
+class ResultCache:
+  """On-disk findings of checks that declare `cache_ttl`, one JSON file per check."""
+
+  VERSION = 1
+
+  def __init__(self, directory: Path):
+    self.directory = directory / "results"
+    self.hits = 0
+    self.misses = 0
+
+  def _path(self, spec: CheckSpec) -> Path:
+    return self.directory / f"{spec.name}.json"
+
+  def keys(self, spec: CheckSpec, facts: HostFacts, options: RunOptions | None = None) -> Dict[str, str] | None:
+    """Invalidation key values for `spec`; None means this run must not use or store the cache."""
+    values = {}
+    for key in spec.cache_keys:
+      value = _key_value(key, facts, options)
+      if value is None:
+        return None
+      values[key] = value
+    return values
+
+  def replay(self, spec: CheckSpec, keys: Dict[str, str], context: CheckContext) -> bool:
+    """Feed a still-valid cached result into `context`; False when there is none."""
+    try:
+      data = json.loads(self._path(spec).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+      data = None
+    if (
+      not isinstance(data, dict)
+      or data.get("version") != self.VERSION
+      or data.get("module") != spec.module
+      or data.get("keys") != keys
+      or not 0 <= time.time() - data.get("stored", 0) <= spec.cache_ttl
+    ):
+      self.misses += 1
+      return False
+
+    for method, args in data["entries"]:
+      if method == "finding":
+        context.logger.finding(Finding(**args))
+      else:
+        getattr(context.logger, method)(*args)
+    context.warn_count = data["warn"]
+    context.crit_count = data["crit"]
+    context.metrics.cached_at = data["stored"]
+    self.hits += 1
+    return True
+
+  def store(self, spec: CheckSpec, keys: Dict[str, str], context: CheckContext) -> None:
+    """Atomically save the buffered output of a check that just ran."""
+    if not isinstance(context.logger, LogBuffer):
+      return
+    entries = []
+    for method, args in context.logger.entries:
+      if method == "debug":
+        continue
+      if method == "finding":
+        finding = args[0]
+        entries.append(
+          ["finding", {"check": finding.check, "severity": finding.severity, "message": finding.message, "rule": finding.rule, "attrs": finding.attrs}]
+        )
+      else:
+        entries.append([method, list(args)])
+    record = {
+      "version": self.VERSION,
+      "module": spec.module,
+      "stored": time.time(),
+      "keys": keys,
+      "warn": context.warn_count,
+      "crit": context.crit_count,
+      "entries": entries,
+    }
+    self.directory.mkdir(parents=True, exist_ok=True)
+    path = self._path(spec)
+    fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f".{path.name}.")
+    try:
+      with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        json.dump(record, handle, default=str)
+      os.replace(tmp, path)
+    except BaseException:
+      os.unlink(tmp)
+      raise
+
+
+__all__ = ["ResultCache"]
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import atexit
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import List, TextIO
+
+
+FLUSH_BYTES = 64 * 1024
+FLUSH_INTERVAL = 1.0
+
+_STOP = object()
+
+
+class LogSink:
+  """Destination for finished log lines (each already newline-terminated)."""
+
+  def write(self, line: str) -> None:
+    raise NotImplementedError
+
+  def flush(self) -> None:
+    pass
+
+  def close(self) -> None:
+    pass
+
+
+class StreamSink(LogSink):
+  """Writes straight to an already open text stream such as stdout."""
+
+  def __init__(self, stream: TextIO):
+    self.stream = stream
+
+  def write(self, line: str) -> None:
+    self.stream.write(line)
+
+  def flush(self) -> None:
+    self.stream.flush()
+
+  def close(self) -> None:
+    self.stream.flush()
+
+
+class BackgroundFileSink(LogSink):
+  """Appends to a file from a writer thread, batching lines into few large writes.
+
+  A batch is written once it reaches `flush_bytes` or `flush_interval`
+  seconds after its first line. Pending lines are written on close(), which
+  also runs at interpreter exit if the owner never got to call it.
+  """
+
+  def __init__(self, path: Path, flush_bytes: int = FLUSH_BYTES, flush_interval: float = FLUSH_INTERVAL):
+    self.path = path
+    self.flush_bytes = flush_bytes
+    self.flush_interval = flush_interval
+    self._queue: "queue.SimpleQueue[object]" = queue.SimpleQueue()
+    self._handle = path.open("a", encoding="utf-8")
+    self._closed = False
+    self._error: BaseException | None = None
+    self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+    self._thread.start()
+    atexit.register(self.close)
+
+  def write(self, line: str) -> None:
+    if self._closed:
+      raise ValueError(f"write to closed log sink {self.path}")
+    self._queue.put(line)
+
+  def flush(self) -> None:
+    """Block until everything written so far is on disk (in the OS page cache)."""
+    if self._closed:
+      return
+    done = threading.Event()
+    self._queue.put(done)
+    done.wait()
+
+  def close(self) -> None:
+    if self._closed:
+      return
+    self._closed = True
+    atexit.unregister(self.close)
+    self._queue.put(_STOP)
+    self._thread.join()
+    self._handle.close()
+    if self._error is not None:
+      raise self._error
+
+  def _run(self) -> None:
+    batch: List[str] = []
+    size = 0
+    deadline = 0.0
+    while True:
+      try:
+        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()) if batch else None)
+      except queue.Empty:
+        item = None
+
+      if isinstance(item, str):
+        if not batch:
+          deadline = time.monotonic() + self.flush_interval
+        batch.append(item)
+        size += len(item)
+        if size < self.flush_bytes:
+          continue
+
+      # Size or time limit reached, flush requested, or stopping.
+      if batch:
+        self._write_batch(batch)
+        batch = []
+        size = 0
+      if isinstance(item, threading.Event):
+        item.set()
+      elif item is _STOP:
+        return
+
+  def _write_batch(self, batch: List[str]) -> None:
+    try:
+      self._handle.write("".join(batch))
+      self._handle.flush()
+    except BaseException as exc:  # pylint: disable=broad-except
+      # Surface the failure to the owning thread on close().
+      self._error = exc
+
+
+__all__ = ["BackgroundFileSink", "LogSink", "StreamSink"]
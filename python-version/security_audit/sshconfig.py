@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import glob
+import json
+import os
+import re
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .config import rooted
+from .utils import run_command
+
+
+SSHD_CONFIG = Path("/etc/ssh/sshd_config")
+# Parse cache file name below cache_dir().
+CACHE_NAME = "sshd_config.json"
+# sshd refuses deeper Include nesting (SERVCONF_MAX_DEPTH).
+MAX_INCLUDE_DEPTH = 16
+SSHD_TEST_TIMEOUT = 15
+# Keywords sshd accumulates over every occurrence; all others keep the first value.
+MULTI_VALUED = frozenset(
+  (
+    "acceptenv",
+    "allowgroups",
+    "allowusers",
+    "denygroups",
+    "denyusers",
+    "hostcertificate",
+    "hostkey",
+    "listenaddress",
+    "permitlisten",
+    "permitopen",
+    "port",
+    "setenv",
+    "subsystem",
+  )
+)
+# `Keyword value`, `Keyword=value` or `Keyword = value`.
+_LINE_RE = re.compile(r"([^\s=]+)(?:\s*=\s*|\s+)(.*)")
+
+Options = Dict[str, List[str]]
+# ["file", path, "ino:mtime:size" or "-"] or ["glob", pattern, [matches]].
+Stamp = list
+
+
+class SshConfigError(Exception):
+  """The effective configuration could not be obtained."""
+
+
+def _add(options: Options, keyword: str, value: str) -> None:
+  values = options.get(keyword)
+  if values is None:
+    options[keyword] = [value]
+  elif keyword in MULTI_VALUED:
+    values.append(value)
+
+
+@dataclass
+class MatchBlock:
+  """Settings that only apply to connections matching `criteria`."""
+
+  criteria: str
+  source: str
+  options: Options = field(default_factory=dict)
+
+  def get(self, keyword: str) -> str | None:
+    values = self.options.get(keyword.lower())
+    return values[0] if values else None
+
+
+@dataclass
+class SshdConfig:
+  """Effective global sshd settings, keyed by lower-case keyword, plus Match blocks.
+
+  As in sshd, the first occurrence of a keyword wins (see MULTI_VALUED for
+  the exceptions); Match blocks are kept apart and do not affect `get`.
+  """
+
+  source: str
+  options: Options = field(default_factory=dict)
+  matches: List[MatchBlock] = field(default_factory=list)
+  files: List[str] = field(default_factory=list)
+  stamps: List[Stamp] = field(default_factory=list)
+
+  def get(self, keyword: str) -> str | None:
+    values = self.options.get(keyword.lower())
+    return values[0] if values else None
+
+  def get_all(self, keyword: str) -> List[str]:
+    return list(self.options.get(keyword.lower(), ()))
+
+  def overrides(self, keyword: str) -> List[Tuple[MatchBlock, str]]:
+    """Match blocks that set `keyword`, with the value each sets."""
+    return [(block, value) for block in self.matches if (value := block.get(keyword)) is not None]
+
+  def to_json(self) -> dict:
+    return {
+      "source": self.source,
+      "options": self.options,
+      "matches": [[block.criteria, block.source, block.options] for block in self.matches],
+      "files": self.files,
+      "stamps": self.stamps,
+    }
+
+  @classmethod
+  def from_json(cls, data: dict) -> "SshdConfig":
+    matches = [MatchBlock(criteria, source, options) for criteria, source, options in data["matches"]]
+    return cls(data["source"], data["options"], matches, data["files"], data["stamps"])
+
+
+def _file_stamp(path: str) -> str:
+  try:
+    st = os.stat(path)
+  except OSError:
+    return "-"
+  return f"{st.st_ino}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def _expand(pattern: str) -> List[str]:
+  # sshd sorts glob(3) results; a pattern that matches nothing is not an error.
+  return sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+
+
+class _Parser:
+  def __init__(self, path: Path, root: Path | None):
+    self.base = path.parent
+    self.root = root
+    self.config = SshdConfig(str(path))
+
+  def parse_file(self, path: str, block: MatchBlock | None, depth: int) -> None:
+    if depth > MAX_INCLUDE_DEPTH:
+      raise SshConfigError(f"{path}: Include nested too deeply")
+    self.config.stamps.append(["file", path, _file_stamp(path)])
+    try:
+      handle = open(path, encoding="utf-8", errors="ignore")  # pylint: disable=consider-using-with
+    except FileNotFoundError:
+      return
+    self.config.files.append(path)
+    with handle:
+      # A Match block started in this file ends with it; the includer's context resumes.
+      for lineno, line in enumerate(handle, 1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+          continue
+        parsed = _LINE_RE.match(stripped)
+        if parsed is None:
+          continue
+        keyword, value = parsed.group(1).lower(), parsed.group(2).strip()
+        if keyword == "match":
+          block = MatchBlock(value, f"{path}:{lineno}")
+          self.config.matches.append(block)
+        elif keyword == "include":
+          for pattern in value.split():
+            pattern = pattern.strip("\"'")
+            pattern = str(rooted(pattern, self.root)) if os.path.isabs(pattern) else str(self.base / pattern)
+            matched = _expand(pattern)
+            if glob.has_magic(pattern):
+              self.config.stamps.append(["glob", pattern, matched])
+            for included in matched:
+              self.parse_file(included, block, depth + 1)
+        else:
+          _add(block.options if block is not None else self.config.options, keyword, value)
+
+
+def parse(path: Path = SSHD_CONFIG, root: Path | None = None) -> SshdConfig:
+  """Read `path` and every file it Includes in one pass; absolute Includes are resolved inside `root`."""
+  parser = _Parser(path, root)
+  parser.parse_file(str(path), None, 0)
+  return parser.config
+
+
+def _unchanged(config: SshdConfig) -> bool:
+  for kind, target, recorded in config.stamps:
+    current = _file_stamp(target) if kind == "file" else _expand(target)
+    if current != recorded:
+      return False
+  return True
+
+
+_memo: Dict[Tuple[str, str], SshdConfig] = {}
+_memo_lock = threading.Lock()
+
+
+def _read_cache(cache_path: Path, path: Path) -> SshdConfig | None:
+  try:
+    with cache_path.open(encoding="utf-8") as handle:
+      data = json.load(handle)
+    return SshdConfig.from_json(data) if data.get("root") == str(path) else None
+  except (OSError, ValueError, KeyError, TypeError, AttributeError):
+    return None
+
+
+def _write_cache(cache_path: Path, path: Path, config: SshdConfig) -> None:
+  cache_path.parent.mkdir(parents=True, exist_ok=True)
+  fd, tmp = tempfile.mkstemp(dir=cache_path.parent, prefix=f".{cache_path.name}.")
+  try:
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+      json.dump({"root": str(path), **config.to_json()}, handle)
+    os.replace(tmp, cache_path)
+  except BaseException:
+    os.unlink(tmp)
+    raise
+
+
+def load(path: Path = SSHD_CONFIG, cache_path: Path | None = None, root: Path | None = None) -> SshdConfig:
+  """Parsed config, reused from memory or `cache_path` while no file or Include glob changed."""
+  key = (str(path), str(root))
+  with _memo_lock:
+    config = _memo.get(key)
+  if config is not None and _unchanged(config):
+    return config
+  config = _read_cache(cache_path, path) if cache_path is not None else None
+  if config is None or not _unchanged(config):
+    config = parse(path, root)
+    if cache_path is not None:
+      try:
+        _write_cache(cache_path, path, config)
+      except OSError:
+        pass
+  with _memo_lock:
+    _memo[key] = config
+  return config
+
+
+def effective(timeout: float | None = SSHD_TEST_TIMEOUT) -> SshdConfig:
+  """Global settings as sshd itself resolves them (`sshd -T`, defaults included; usually needs root)."""
+  try:
+    result = run_command(["sshd", "-T"], timeout=timeout)
+  except Exception as exc:  # pylint: disable=broad-except
+    raise SshConfigError(f"sshd -T failed: {exc}") from exc
+  if result.returncode != 0:
+    detail = (result.stderr or "").strip().splitlines()
+    raise SshConfigError(f"sshd -T exited with {result.returncode}" + (f": {detail[-1]}" if detail else ""))
+  config = SshdConfig("sshd -T")
+  for line in result.stdout.splitlines():
+    keyword, _, value = line.strip().partition(" ")
+    if keyword:
+      _add(config.options, keyword.lower(), value.strip())
+  return config
+
+
+__all__ = ["MatchBlock", "SshConfigError", "SshdConfig", "effective", "load", "parse"]
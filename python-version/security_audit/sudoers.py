@@ -0,0 +1,421 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterator, List, Sequence, Set, Tuple
+
+from .config import rooted
+
+
+SUDOERS = Path("/etc/sudoers")
+# Parse cache file name below cache_dir().
+CACHE_NAME = "sudoers.json"
+# sudo gives up on deeper include nesting.
+MAX_INCLUDE_DEPTH = 128
+ALIAS_KINDS = {"user": "user", "runas": "runas", "host": "host", "cmnd": "cmnd", "cmd": "cmnd"}
+# Tags come in pairs; the later one of a pair overrides the earlier for following commands.
+TAG_PAIRS = {
+  "NOPASSWD": "PASSWD",
+  "NOEXEC": "EXEC",
+  "SETENV": "NOSETENV",
+  "LOG_INPUT": "NOLOG_INPUT",
+  "LOG_OUTPUT": "NOLOG_OUTPUT",
+  "MAIL": "NOMAIL",
+  "FOLLOW": "NOFOLLOW",
+  "INTERCEPT": "NOINTERCEPT",
+}
+TAGS = frozenset(TAG_PAIRS) | frozenset(TAG_PAIRS.values())
+_OPPOSITE = {**TAG_PAIRS, **{off: on for on, off in TAG_PAIRS.items()}}
+
+_INCLUDE_RE = re.compile(r"[#@](include|includedir)\s+(.+)")
+_ALIAS_RE = re.compile(r"(User|Runas|Host|Cmnd|Cmd)_Alias\s+(.+)", re.S)
+_DEFAULTS_RE = re.compile(r"Defaults(?:([@:!>])\s*((?:[^\s,]+\s*,\s*)*[^\s,]+))?\s+(.+)", re.S)
+_USERS_RE = re.compile(r"((?:[^\s,]+\s*,\s*)*[^\s,]+)\s+(.+)", re.S)
+_TAG_END_RE = re.compile(r"(?:^|[\s,):=])(" + "|".join(sorted(TAGS)) + r")$")
+_RUNAS_RE = re.compile(r"\(([^)]*)\)\s*")
+_OPTION_RE = re.compile(r"(?:ROLE|TYPE|TIMEOUT|CWD|CHROOT|NOTBEFORE|NOTAFTER|APPARMOR_PROFILE|PRIVS|LIMITPRIVS)=\S+\s*")
+_TAG_RE = re.compile(r"(" + "|".join(sorted(TAGS)) + r")\s*:\s*")
+_DIGEST_RE = re.compile(r"sha(?:224|256|384|512):\S+\s+")
+_ALIAS_NAME_RE = re.compile(r"[A-Z][A-Z0-9_]*")
+
+# JSON-friendly parse of one file, in file order:
+#   ["include", "file"|"dir", path, lineno]
+#   ["alias", kind, name, members, lineno]
+#   ["defaults", scope_type, scope, settings, lineno]
+#   ["spec", users, [[hosts, [[runas_users, runas_groups, tags, command], ...]], ...], lineno, text]
+Entry = list
+FileKey = Tuple[int, int, int]
+
+
+def _split(text: str, sep: str) -> List[str]:
+  """Split on `sep` outside quotes and parentheses, honouring backslash escapes."""
+  parts, start, depth, quoted, index = [], 0, 0, False, 0
+  while index < len(text):
+    char = text[index]
+    if char == "\\":
+      index += 2
+      continue
+    if char == '"':
+      quoted = not quoted
+    elif not quoted:
+      if char == "(":
+        depth += 1
+      elif char == ")":
+        depth = max(0, depth - 1)
+      elif char == sep and depth == 0:
+        parts.append(text[start:index].strip())
+        start = index + 1
+    index += 1
+  parts.append(text[start:].strip())
+  return [part for part in parts if part]
+
+
+def _strip_comment(line: str) -> str:
+  # `#` followed by digits is a uid (`#0`), not a comment.
+  for index, char in enumerate(line):
+    if char == "#" and (index == 0 or line[index - 1] in " \t,=:(!") and not line[index + 1:index + 2].isdigit():
+      return line[:index]
+  return line
+
+
+def _logical_lines(handle) -> Iterator[Tuple[int, str]]:
+  """Lines with backslash-newline continuations joined, numbered by their first physical line."""
+  pending, first = "", 0
+  for lineno, line in enumerate(handle, 1):
+    line = line.rstrip("\n")
+    if not pending:
+      first = lineno
+    trailing = len(line) - len(line.rstrip("\\"))
+    if trailing % 2:
+      pending += line[:-1] + " "
+      continue
+    yield first, pending + line
+    pending = ""
+  if pending:
+    yield first, pending
+
+
+def _host_sections(text: str) -> List[str]:
+  """Split `hosts = cmnds : hosts = cmnds` on colons that are neither escaped, in a Runas spec nor ending a tag."""
+  sections, start, depth, index = [], 0, 0, 0
+  while index < len(text):
+    char = text[index]
+    if char == "\\":
+      index += 2
+      continue
+    if char == "(":
+      depth += 1
+    elif char == ")":
+      depth = max(0, depth - 1)
+    elif char == ":" and depth == 0 and not _TAG_END_RE.search(text[start:index].rstrip()):
+      sections.append(text[start:index].strip())
+      start = index + 1
+    index += 1
+  sections.append(text[start:].strip())
+  return [section for section in sections if section]
+
+
+def _parse_cmnd_specs(text: str) -> List[list]:
+  specs = []
+  runas_users: List[str] | None = None
+  runas_groups: List[str] = []
+  tags: Dict[str, str] = {}
+  for item in _split(text, ","):
+    runas = _RUNAS_RE.match(item)
+    if runas:
+      users, _, groups = runas.group(1).partition(":")
+      runas_users, runas_groups = _split(users, ","), _split(groups, ",")
+      item = item[runas.end():]
+    while True:
+      option = _OPTION_RE.match(item) or _DIGEST_RE.match(item)
+      if option:
+        item = item[option.end():]
+        continue
+      tag = _TAG_RE.match(item)
+      if not tag:
+        break
+      name = tag.group(1)
+      tags.pop(_OPPOSITE[name], None)
+      tags[name] = name
+      item = item[tag.end():]
+    # Without a Runas spec the command runs as root (runas_default).
+    users = runas_users if runas_users is not None else ([] if runas_groups else ["root"])
+    specs.append([users, runas_groups, sorted(tags), item.strip()])
+  return specs
+
+
+def parse_file(path: str) -> List[Entry]:
+  """Parse one sudoers file without following its includes."""
+  entries: List[Entry] = []
+  with open(path, encoding="utf-8", errors="ignore") as handle:
+    for lineno, line in _logical_lines(handle):
+      stripped = line.strip()
+      include = _INCLUDE_RE.fullmatch(stripped)
+      if include:
+        entries.append(["include", "dir" if include.group(1) == "includedir" else "file", include.group(2).strip().strip('"'), lineno])
+        continue
+      stripped = _strip_comment(stripped).strip()
+      if not stripped:
+        continue
+      alias = _ALIAS_RE.fullmatch(stripped)
+      if alias:
+        kind = ALIAS_KINDS[alias.group(1).lower()]
+        for definition in _split(alias.group(2), ":"):
+          name, _, members = definition.partition("=")
+          entries.append(["alias", kind, name.strip(), _split(members, ","), lineno])
+        continue
+      defaults = _DEFAULTS_RE.fullmatch(stripped)
+      if defaults:
+        scope = _split(defaults.group(2) or "", ",")
+        entries.append(["defaults", defaults.group(1) or "", scope, _split(defaults.group(3), ","), lineno])
+        continue
+      spec = _USERS_RE.fullmatch(stripped)
+      if spec is None:
+        continue
+      sections = []
+      for section in _host_sections(spec.group(2)):
+        hosts, equals, cmnds = section.partition("=")
+        if equals:
+          sections.append([_split(hosts, ","), _parse_cmnd_specs(cmnds)])
+      if sections:
+        entries.append(["spec", _split(spec.group(1), ","), sections, lineno, " ".join(stripped.split())])
+  return entries
+
+
+class ParseCache:
+  """Parsed sudoers files keyed by path and (st_ino, st_mtime_ns, st_size), optionally kept on disk."""
+
+  VERSION = 1
+
+  def __init__(self, path: Path | None = None, entries: Dict[str, list] | None = None):
+    self.path = path
+    self._entries: Dict[str, list] = entries or {}
+    self._used: Set[str] = set()
+    self.hits = 0
+    self.misses = 0
+
+  @classmethod
+  def load(cls, path: Path) -> "ParseCache":
+    try:
+      with path.open(encoding="utf-8") as handle:
+        data = json.load(handle)
+      if data.get("version") != cls.VERSION:
+        return cls(path)
+      return cls(path, data["files"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+      return cls(path)
+
+  def get(self, path: str, key: FileKey) -> List[Entry]:
+    self._used.add(path)
+    cached = self._entries.get(path)
+    if cached is not None and tuple(cached[0]) == key:
+      self.hits += 1
+      return cached[1]
+    self.misses += 1
+    entries = parse_file(path)
+    self._entries[path] = [list(key), entries]
+    return entries
+
+  def save(self) -> None:
+    """Atomically write the entries of files used since loading; no-op without a path or changes."""
+    if self.path is None or (not self.misses and set(self._entries) == self._used):
+      return
+    files = {path: self._entries[path] for path in self._used}
+    self.path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+    try:
+      with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        json.dump({"version": self.VERSION, "files": files}, handle)
+      os.replace(tmp, self.path)
+    except BaseException:
+      os.unlink(tmp)
+      raise
+
+
+@dataclass(frozen=True)
+class Rule:
+  """One command a set of principals may run, with aliases expanded.
+
+  Negated members keep their `!` prefix; `users`/`runas` are what the
+  sudoers entry names, not a resolved list of accounts.
+  """
+
+  users: Tuple[str, ...]
+  hosts: Tuple[str, ...]
+  runas: Tuple[str, ...]
+  runas_groups: Tuple[str, ...]
+  command: str
+  tags: FrozenSet[str]
+  source: str
+  entry: str
+
+  @property
+  def path(self) -> str:
+    return self.source.rsplit(":", 1)[0]
+
+
+@dataclass
+class Policy:
+  """Compiled sudoers policy: rules with aliases expanded, Defaults and what was read."""
+
+  files: List[str] = field(default_factory=list)
+  # (path, (st_ino, st_mtime_ns, st_size)) of every file read, includes first seen first.
+  stamps: List[Tuple[str, FileKey]] = field(default_factory=list)
+  rules: List[Rule] = field(default_factory=list)
+  aliases: Dict[Tuple[str, str], List[str]] = field(default_factory=dict)
+  defaults: List[Tuple[str, Tuple[str, ...], str, str]] = field(default_factory=list)
+  # (path, "unreadable"/"missing"/reason) for files that could not be parsed.
+  problems: List[Tuple[str, str]] = field(default_factory=list)
+  by_command: Dict[str, List[Rule]] = field(default_factory=dict)
+  by_user: Dict[str, List[Rule]] = field(default_factory=dict)
+  # Principals covered by `Defaults:USERS !authenticate`; None once it applies to everybody.
+  no_auth_users: Set[str] | None = field(default_factory=set)
+
+  def add_default(self, kind: str, scope: Tuple[str, ...], setting: str, source: str) -> None:
+    self.defaults.append((kind, scope, setting, source))
+    compact = setting.replace(" ", "")
+    if compact not in ("!authenticate", "authenticate") or kind in ("!", ">"):
+      return
+    if kind != ":":
+      self.no_auth_users = None if compact == "!authenticate" else set()
+    elif self.no_auth_users is not None:
+      if compact == "!authenticate":
+        self.no_auth_users.update(scope)
+      else:
+        self.no_auth_users.difference_update(scope)
+
+  def authenticate_disabled(self) -> List[Tuple[str, Tuple[str, ...], str]]:
+    """Defaults entries turning authentication off: (scope type, scope, source)."""
+    return [(kind, scope, source) for kind, scope, setting, source in self.defaults if setting.replace(" ", "") == "!authenticate"]
+
+  def passwordless(self, rule: Rule) -> bool:
+    if "NOPASSWD" in rule.tags:
+      return True
+    if "PASSWD" in rule.tags:
+      return False
+    return self.no_auth_users is None or any(user in self.no_auth_users for user in rule.users)
+
+  def rules_for(self, command: str) -> List[Rule]:
+    return list(self.by_command.get(command, ()))
+
+  def nopasswd_rules(self) -> List[Rule]:
+    return [rule for rule in self.rules if self.passwordless(rule)]
+
+  def nopasswd_all(self) -> Dict[str, List[Rule]]:
+    """Principals that may run ALL commands without a password, with the granting rules."""
+    principals: Dict[str, List[Rule]] = {}
+    for rule in self.by_command.get("ALL", ()):
+      if self.passwordless(rule):
+        for user in rule.users:
+          if not user.startswith("!"):
+            principals.setdefault(user, []).append(rule)
+    return principals
+
+
+def _file_key(path: str) -> FileKey:
+  st = os.stat(path)
+  return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _includedir_files(directory: str) -> List[str]:
+  # sudo skips names ending in `~` or containing a `.` (editor backups, .rpmsave...).
+  try:
+    with os.scandir(directory) as entries:
+      names = [entry.name for entry in entries if entry.is_file() and not entry.name.endswith("~") and "." not in entry.name]
+  except OSError:
+    return []
+  return [os.path.join(directory, name) for name in sorted(names)]
+
+
+def _collect(path: str, root: Path | None, cache: ParseCache, policy: Policy, out: List[Tuple[str, Entry]], stack: List[str], depth: int) -> None:
+  real = os.path.realpath(path)
+  if depth > MAX_INCLUDE_DEPTH or real in stack:
+    policy.problems.append((path, "include loop or nesting too deep"))
+    return
+  try:
+    key = _file_key(path)
+    entries = cache.get(path, key)
+  except FileNotFoundError:
+    policy.problems.append((path, "missing"))
+    return
+  except PermissionError:
+    policy.problems.append((path, "unreadable"))
+    return
+  except OSError as exc:
+    policy.problems.append((path, str(exc)))
+    return
+  policy.files.append(path)
+  policy.stamps.append((path, key))
+  stack.append(real)
+  base = os.path.dirname(path)
+  for entry in entries:
+    if entry[0] != "include":
+      out.append((path, entry))
+      continue
+    target = str(rooted(entry[2], root)) if os.path.isabs(entry[2]) else os.path.join(base, entry[2])
+    targets = _includedir_files(target) if entry[1] == "dir" else [target]
+    for included in targets:
+      _collect(included, root, cache, policy, out, stack, depth + 1)
+  stack.pop()
+
+
+def _expand(aliases: Dict[Tuple[str, str], List[str]], kind: str, items: Sequence[str], seen: Tuple[str, ...] = ()) -> List[str]:
+  expanded: List[str] = []
+  for item in items:
+    negated = item.startswith("!")
+    name = item.lstrip("!").strip()
+    members = aliases.get((kind, name))
+    if members is None or name in seen or not _ALIAS_NAME_RE.fullmatch(name):
+      expanded.append(item)
+      continue
+    for member in _expand(aliases, kind, members, seen + (name,)):
+      if negated:
+        member = member[1:] if member.startswith("!") else "!" + member
+      expanded.append(member)
+  return expanded
+
+
+def load(path: Path = SUDOERS, cache: ParseCache | None = None, root: Path | None = None) -> Policy:
+  """Parse `path` and everything it includes, then expand aliases into an indexed rule list.
+
+  Absolute include paths are resolved inside `root` when auditing a root filesystem.
+  """
+  cache = cache if cache is not None else ParseCache()
+  policy = Policy()
+  ordered: List[Tuple[str, Entry]] = []
+  _collect(str(path), root, cache, policy, ordered, [], 0)
+
+  # Aliases are global to the policy, whatever file defines them.
+  for _, entry in ordered:
+    if entry[0] == "alias":
+      policy.aliases[(entry[1], entry[2])] = entry[3]
+
+  for source, entry in ordered:
+    if entry[0] == "defaults":
+      _, kind, scope, settings, lineno = entry
+      scope_kind = {"": "", "@": "host", ":": "user", "!": "cmnd", ">": "runas"}[kind]
+      scope = tuple(_expand(policy.aliases, scope_kind, scope)) if scope_kind else ()
+      for setting in settings:
+        policy.add_default(kind, scope, setting, f"{source}:{lineno}")
+    elif entry[0] == "spec":
+      _, users, sections, lineno, text = entry
+      users = tuple(_expand(policy.aliases, "user", users))
+      for hosts, cmnds in sections:
+        hosts = tuple(_expand(policy.aliases, "host", hosts))
+        for runas_users, runas_groups, tags, command in cmnds:
+          runas = tuple(_expand(policy.aliases, "runas", runas_users))
+          groups = tuple(_expand(policy.aliases, "runas", runas_groups))
+          for expanded in _expand(policy.aliases, "cmnd", [command]):
+            rule = Rule(users, hosts, runas, groups, expanded, frozenset(tags), f"{source}:{lineno}", text)
+            policy.rules.append(rule)
+            policy.by_command.setdefault(expanded, []).append(rule)
+            for user in users:
+              policy.by_user.setdefault(user, []).append(rule)
+  return policy
+
+
+__all__ = ["ParseCache", "Policy", "Rule", "load", "parse_file"]
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import resource
+import shlex
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+
+@dataclass
+class ProcessSpan:
+  """One child process started while a check was running."""
+
+  command: str
+  start: float
+  duration: float = 0.0
+  returncode: int | None = None
+
+
+@dataclass
+class CheckMetrics:
+  """Resource usage of one check.
+
+  `cpu` is process CPU time when checks run one at a time (so helper threads
+  such as the filesystem walker count) and the check thread's own CPU time
+  under --jobs, where process-wide counters would overlap. `peak_rss_kb` is
+  the process high-water mark when the check finished. `cached_at` is the
+  time.time() at which a replayed cached result was produced.
+  """
+
+  start: float = 0.0
+  wall: float = 0.0
+  cpu: float = 0.0
+  peak_rss_kb: int = 0
+  thread_id: int = 0
+  thread_name: str = ""
+  processes: List[ProcessSpan] = field(default_factory=list)
+  cached_at: float | None = None
+
+  @property
+  def process_time(self) -> float:
+    return sum(span.duration for span in self.processes)
+
+  def slowest(self, count: int = 5) -> List[ProcessSpan]:
+    return sorted(self.processes, key=lambda span: span.duration, reverse=True)[:count]
+
+
+_current: contextvars.ContextVar[CheckMetrics | None] = contextvars.ContextVar("security_audit_metrics", default=None)
+
+
+@contextmanager
+def measure(metrics: CheckMetrics, per_thread_cpu: bool = False) -> Iterator[CheckMetrics]:
+  """Time a check and collect the processes it starts.
+
+  The metrics are bound to a context variable, so asyncio tasks and
+  asyncio.to_thread helpers started by the check are attributed to it.
+  """
+  cpu_clock = time.thread_time if per_thread_cpu else time.process_time
+  thread = threading.current_thread()
+  metrics.thread_id = thread.ident or 0
+  metrics.thread_name = thread.name
+  metrics.start = time.perf_counter()
+  cpu_start = cpu_clock()
+  token = _current.set(metrics)
+  try:
+    yield metrics
+  finally:
+    _current.reset(token)
+    metrics.wall = time.perf_counter() - metrics.start
+    metrics.cpu = cpu_clock() - cpu_start
+    metrics.peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def process_started(args: Sequence[str]) -> ProcessSpan | None:
+  metrics = _current.get()
+  if metrics is None:
+    return None
+  span = ProcessSpan(" ".join(shlex.quote(str(part)) for part in args), time.perf_counter())
+  metrics.processes.append(span)
+  return span
+
+
+def process_finished(span: ProcessSpan | None, returncode: int | None) -> None:
+  if span is None:
+    return
+  span.duration = time.perf_counter() - span.start
+  span.returncode = returncode
+
+
+def _us(seconds: float) -> int:
+  return int(seconds * 1_000_000)
+
+
+def write_chrome_trace(path: Path, checks: Iterable[Tuple[str, CheckMetrics]], origin: float) -> None:
+  """Write a Chrome/Perfetto trace: one slice per check, async slices per process."""
+  pid = os.getpid()
+  events: List[dict] = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "security_orchestrator"}}]
+  named_threads = set()
+  span_id = 0
+  for label, metrics in checks:
+    if metrics.thread_id not in named_threads:
+      named_threads.add(metrics.thread_id)
+      events.append(
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": metrics.thread_id, "args": {"name": metrics.thread_name}}
+      )
+    events.append(
+      {
+        "name": label,
+        "cat": "check",
+        "ph": "X",
+        "pid": pid,
+        "tid": metrics.thread_id,
+        "ts": _us(metrics.start - origin),
+        "dur": _us(metrics.wall),
+        "args": {"cpu_s": round(metrics.cpu, 6), "peak_rss_kb": metrics.peak_rss_kb, "subprocesses": len(metrics.processes)},
+      }
+    )
+    # Processes started by one check can overlap, so they go on async tracks.
+    for span in metrics.processes:
+      span_id += 1
+      common = {"name": span.command, "cat": "subprocess", "id": span_id, "pid": pid, "tid": metrics.thread_id}
+      events.append({**common, "ph": "b", "ts": _us(span.start - origin), "args": {"check": label, "returncode": span.returncode}})
+      events.append({**common, "ph": "e", "ts": _us(span.start + span.duration - origin)})
+
+  path.parent.mkdir(parents=True, exist_ok=True)
+  with path.open("w", encoding="utf-8") as handle:
+    json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, handle)
+
+
+__all__ = ["CheckMetrics", "ProcessSpan", "measure", "process_finished", "process_started", "write_chrome_trace"]
@@ -1,12 +1,25 @@
 from __future__ import annotations
 
 import json
+import locale
 import os
 import shlex
 import shutil
+import signal
 import subprocess
+import threading
 from pathlib import Path
-from typing import Iterable, Sequence
+from typing import IO, TYPE_CHECKING, Iterator, Sequence
+
+from . import tracing
+
+if TYPE_CHECKING:
+  import asyncio
+
+
+# Caps concurrent child processes across threads (--jobs) and asyncio tasks.
+MAX_CONCURRENT_PROCESSES = int(os.environ.get("SECURITY_AUDIT_MAX_PROCS", "8"))
+_PROCESS_SLOTS = threading.BoundedSemaphore(max(1, MAX_CONCURRENT_PROCESSES))
 
 
 def command_exists(cmd: str) -> bool:
@@ -21,14 +34,200 @@ def run_command(
   timeout: int | None = None,
   env: dict[str, str] | None = None,
 ) -> subprocess.CompletedProcess:
-  return subprocess.run(  # noqa: S603
-    args,
-    check=check,
-    capture_output=capture,
-    text=True,
-    timeout=timeout,
-    env=env,
-  )
+  with _PROCESS_SLOTS:
+    span = tracing.process_started(args)
+    returncode = None
+    try:
+      result = subprocess.run(  # noqa: S603
+        args,
+        check=check,
+        capture_output=capture,
+        text=True,
+        timeout=timeout,
+        env=env,
+      )
+      returncode = result.returncode
+    except subprocess.CalledProcessError as exc:
+      returncode = exc.returncode
+      raise
+    finally:
+      tracing.process_finished(span, returncode)
+    return result
+
+
+async def _acquire_process_slot() -> None:
+  import asyncio
+
+  # Poll instead of blocking so the event loop keeps running and a cancelled
+  # waiter never ends up owning a slot.
+  while not _PROCESS_SLOTS.acquire(blocking=False):
+    await asyncio.sleep(0.01)
+
+
+async def _kill_process(proc: asyncio.subprocess.Process) -> None:
+  if proc.returncode is not None:
+    return
+  try:
+    proc.kill()
+  except ProcessLookupError:
+    pass
+  await proc.wait()
+
+
+def _decode(data: bytes | None) -> str | None:
+  if data is None:
+    return None
+  return data.decode(locale.getpreferredencoding(False), errors="replace")
+
+
+async def run_command_async(
+  args: Sequence[str],
+  *,
+  check: bool = False,
+  capture: bool = True,
+  timeout: float | None = None,
+  env: dict[str, str] | None = None,
+) -> subprocess.CompletedProcess:
+  """Async counterpart of run_command; the child is killed on timeout or cancellation."""
+  import asyncio
+
+  await _acquire_process_slot()
+  span = tracing.process_started(args)
+  proc = None
+  try:
+    pipe = asyncio.subprocess.PIPE if capture else None
+    proc = await asyncio.create_subprocess_exec(*args, stdout=pipe, stderr=pipe, env=env)
+    try:
+      stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+      await _kill_process(proc)
+      raise subprocess.TimeoutExpired(list(args), timeout) from None
+    except asyncio.CancelledError:
+      await _kill_process(proc)
+      raise
+  finally:
+    tracing.process_finished(span, proc.returncode if proc else None)
+    _PROCESS_SLOTS.release()
+
+  result = subprocess.CompletedProcess(list(args), proc.returncode, _decode(stdout), _decode(stderr))
+  if check:
+    result.check_returncode()
+  return result
+
+
+class CommandStream:
+  """Iterates a command's stdout line by line while it runs.
+
+  Once `max_lines` lines have been yielded and another one arrives, the child
+  is terminated and `truncated` is set, so callers that only show the head of
+  a large output never read (or buffer) the rest. `stdout` is also available
+  for callers that parse the raw stream themselves.
+  """
+
+  def __init__(
+    self,
+    args: Sequence[str],
+    *,
+    max_lines: int | None = None,
+    timeout: float | None = None,
+    env: dict[str, str] | None = None,
+  ):
+    self.args = list(args)
+    self.max_lines = max_lines
+    self.timeout = timeout
+    self.env = env
+    self.truncated = False
+    self.timed_out = False
+    self.returncode: int | None = None
+    self.stdout: IO[str] | None = None
+    self._proc: subprocess.Popen | None = None
+    self._timer: threading.Timer | None = None
+    self._span: tracing.ProcessSpan | None = None
+
+  def __enter__(self) -> "CommandStream":
+    _PROCESS_SLOTS.acquire()
+    self._span = tracing.process_started(self.args)
+    try:
+      self._proc = subprocess.Popen(  # noqa: S603
+        self.args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        errors="replace",
+        env=self.env,
+        # Own process group so helpers spawned by the child are stopped too.
+        start_new_session=True,
+      )
+    except BaseException:
+      tracing.process_finished(self._span, None)
+      _PROCESS_SLOTS.release()
+      raise
+    self.stdout = self._proc.stdout
+    if self.timeout is not None:
+      self._timer = threading.Timer(self.timeout, self._expire)
+      self._timer.daemon = True
+      self._timer.start()
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    try:
+      if self._timer:
+        self._timer.cancel()
+      if self._proc:
+        if exc_type is not None or self.truncated:
+          self._stop()
+        if self._proc.stdout:
+          self._proc.stdout.close()
+        self.returncode = self._proc.wait()
+    finally:
+      tracing.process_finished(self._span, self.returncode)
+      _PROCESS_SLOTS.release()
+    return False
+
+  def __iter__(self) -> Iterator[str]:
+    if self.stdout is None:
+      raise RuntimeError("CommandStream must be used as a context manager")
+    count = 0
+    for line in self.stdout:
+      if self.max_lines is not None and count >= self.max_lines:
+        self.truncated = True
+        self._stop()
+        return
+      count += 1
+      yield line.rstrip("\n")
+    if self.timed_out:
+      raise subprocess.TimeoutExpired(self.args, self.timeout)
+
+  def _expire(self) -> None:
+    self.timed_out = True
+    self._stop()
+
+  def _stop(self) -> None:
+    if self._proc is None or self._proc.poll() is not None:
+      return
+    self._signal(signal.SIGTERM)
+    try:
+      self._proc.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+      self._signal(signal.SIGKILL)
+      self._proc.wait()
+
+  def _signal(self, signum: int) -> None:
+    try:
+      os.killpg(self._proc.pid, signum)
+    except ProcessLookupError:
+      pass
+
+
+def stream_command(
+  args: Sequence[str],
+  *,
+  max_lines: int | None = None,
+  timeout: float | None = None,
+  env: dict[str, str] | None = None,
+) -> CommandStream:
+  """Usage: `with stream_command(args, max_lines=20) as stream: lines = list(stream)`."""
+  return CommandStream(args, max_lines=max_lines, timeout=timeout, env=env)
 
 
 def tail_text(text: str, max_lines: int) -> str:
@@ -8,7 +8,64 @@ from __future__ import annotations
 import argparse
 import sys
 
-from security_audit.orchestrator import DEFAULT_CHECKS, run_checks
+from security_audit.registry import CHECKS, select
+
+
+# What --gentle selects.
+GENTLE_NICE = 19
+GENTLE_SCAN_RATE = 20000
+
+
+def _path(value: str):
+  # pathlib is only needed once checks actually run; keep --list-checks lean.
+  from pathlib import Path
+
+  return Path(value)
+
+
+def _ports(value: str) -> frozenset:
+  try:
+    return frozenset(int(part) for part in value.split(",") if part.strip())
+  except ValueError as exc:
+    raise argparse.ArgumentTypeError(f"expected comma-separated port numbers, got {value!r}") from exc
+
+
+def _niceness(value: str) -> int:
+  number = int(value)
+  if not 0 <= number <= 19:
+    raise argparse.ArgumentTypeError(f"niceness must be between 0 and 19, got {number}")
+  return number
+
+
+def _rate(value: str) -> int:
+  # Bytes per second, with an optional binary K/M/G suffix.
+  scale = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}.get(value[-1:].upper(), 1)
+  try:
+    number = float(value[:-1] if scale > 1 else value) * scale
+  except ValueError as exc:
+    raise argparse.ArgumentTypeError(f"expected bytes per second such as 20M, got {value!r}") from exc
+  if number < 1:
+    raise argparse.ArgumentTypeError(f"rate must be positive, got {value!r}")
+  return int(number)
+
+
+def _positive(value: str) -> float:
+  number = float(value)
+  if number <= 0:
+    raise argparse.ArgumentTypeError(f"expected a positive number, got {value!r}")
+  return number
+
+
+def _when(value: str) -> str:
+  if value == "last":
+    return value
+  from security_audit.history import parse_time
+
+  try:
+    parse_time(value)
+  except ValueError as exc:
+    raise argparse.ArgumentTypeError(str(exc)) from exc
+  return value
 
 
 def parse_args() -> argparse.Namespace:
@@ -16,19 +73,381 @@ def parse_args() -> argparse.Namespace:
   parser.add_argument(
     "--list-checks",
     action="store_true",
-    help="Show available checks and exit.",
+    help="Show available checks (after --only/--skip) and exit.",
+  )
+  parser.add_argument(
+    "--only",
+    action="append",
+    metavar="CHECKS",
+    help="Run only these checks (short name, label or module; repeatable or comma-separated).",
+  )
+  parser.add_argument(
+    "--skip",
+    action="append",
+    metavar="CHECKS",
+    help="Skip these checks (same selectors as --only).",
+  )
+  parser.add_argument(
+    "--jobs",
+    "-j",
+    type=int,
+    default=1,
+    metavar="N",
+    help="Run up to N checks concurrently; output is still logged in check order (default: 1).",
+  )
+  parser.add_argument(
+    "--full-rescan",
+    action="store_true",
+    help="Ignore the cached directory index and rescan filesystem trees from scratch.",
+  )
+  parser.add_argument(
+    "--no-cache",
+    action="store_true",
+    help="Ignore cached check results and run every check afresh (fresh results are still cached).",
+  )
+  parser.add_argument(
+    "--nss-accounts",
+    type=float,
+    dest="nss_timeout",
+    metavar="SECONDS",
+    help="Also enumerate NSS accounts (LDAP/SSSD) for the UID 0 check, giving up after SECONDS; default reads only /etc/passwd.",
+  )
+  parser.add_argument(
+    "--sshd-t",
+    dest="sshd_test",
+    action="store_true",
+    help="Take SSH settings from `sshd -T` (needs root) instead of parsing sshd_config and its includes.",
+  )
+  parser.add_argument(
+    "--allowed-ports",
+    type=_ports,
+    metavar="PORTS",
+    help="Comma-separated ports allowed to listen on all interfaces; other wildcard listeners are reported as WARN.",
+  )
+  parser.add_argument(
+    "--trace",
+    type=_path,
+    metavar="FILE",
+    help="Write per-check and per-subprocess timings as Chrome/Perfetto trace JSON.",
+  )
+  parser.add_argument(
+    "--format",
+    choices=("text", "ndjson"),
+    default="text",
+    help="Console output: text log lines or one JSON finding per line (the text log file is always written).",
+  )
+  parser.add_argument(
+    "--ndjson",
+    type=_path,
+    metavar="FILE",
+    help="Also append findings as NDJSON records to FILE.",
+  )
+  history = parser.add_argument_group("run history")
+  history.add_argument(
+    "--history",
+    type=_path,
+    metavar="FILE",
+    help="SQLite database each run's findings are appended to (default: LOG_DIR/history.sqlite3); query it with `python -m security_audit.history`.",
+  )
+  history.add_argument(
+    "--no-history",
+    action="store_true",
+    help="Do not record this run in the history database.",
+  )
+  history.add_argument(
+    "--diff-since",
+    nargs="?",
+    const="last",
+    type=_when,
+    metavar="WHEN",
+    help="Report only WARN/CRIT findings new or resolved since the previous run, or since the last run before WHEN "
+    "(ISO date/time or age such as 24h, 7d); exits 2/1 for new CRIT/WARN findings, else 0.",
+  )
+  offline = parser.add_argument_group("offline mode")
+  offline.add_argument(
+    "--root",
+    type=_path,
+    metavar="PATH",
+    help="Audit the extracted or mounted root filesystem at PATH instead of this host (file-based checks only).",
+  )
+  offline.add_argument(
+    "--image",
+    action="append",
+    metavar="TARBALL",
+    help="Audit a `docker save`/OCI image tarball without extracting it (repeatable).",
+  )
+  offline.add_argument(
+    "--image-jobs",
+    type=int,
+    default=0,
+    metavar="N",
+    help="Audit up to N images in parallel processes (default: one per CPU).",
+  )
+  governor = parser.add_argument_group("resource governor", "Limits for this process and every command it runs, so audits can run beside production load.")
+  governor.add_argument(
+    "--nice",
+    type=_niceness,
+    metavar="N",
+    help="Lower CPU priority to niceness N (0-19).",
+  )
+  governor.add_argument(
+    "--ionice-idle",
+    action="store_true",
+    help="Use the idle IO scheduling class: disk access only when nothing else needs the disk.",
+  )
+  governor.add_argument(
+    "--cpu-limit",
+    type=_positive,
+    metavar="PERCENT",
+    help="Run in a transient cgroup v2 capped at PERCENT of one CPU (needs root or a delegated cgroup).",
+  )
+  governor.add_argument(
+    "--io-limit",
+    type=_rate,
+    metavar="RATE",
+    help="Run in a transient cgroup v2 capped at RATE bytes/s (suffix K, M, G) read and written on the root filesystem's disk.",
+  )
+  governor.add_argument(
+    "--scan-rate",
+    type=_positive,
+    metavar="N",
+    help="Let the built-in filesystem and /proc scanners visit at most N entries per second.",
+  )
+  governor.add_argument(
+    "--gentle",
+    action="store_true",
+    help="Shorthand for --nice 19 --ionice-idle --scan-rate 20000 (explicit options take precedence).",
+  )
+  fleet = parser.add_argument_group("fleet mode")
+  fleet.add_argument(
+    "--fleet",
+    metavar="FILE",
+    help="Audit every target listed in FILE (one per line, '-' for stdin) instead of this host.",
+  )
+  fleet.add_argument(
+    "--transport",
+    choices=("ssh", "local", "chroot"),
+    default="ssh",
+    help="How targets are reached: ssh with connection multiplexing, chroot into a root directory, or local runs for testing (default: ssh).",
+  )
+  fleet.add_argument(
+    "--fleet-jobs",
+    type=int,
+    default=32,
+    metavar="N",
+    help="Audit up to N targets at once (default: 32).",
+  )
+  fleet.add_argument(
+    "--host-timeout",
+    type=float,
+    default=600,
+    metavar="SECONDS",
+    help="Give up on a target after SECONDS, upload included (default: 600).",
+  )
+  daemon = parser.add_argument_group("daemon mode")
+  daemon.add_argument(
+    "--daemon",
+    action="store_true",
+    help="Keep running: re-run checks when the files they read change, and serve the current posture on a unix socket.",
+  )
+  daemon.add_argument(
+    "--socket",
+    type=_path,
+    metavar="PATH",
+    help="Unix socket of the daemon (default: daemon.sock in the cache directory).",
+  )
+  daemon.add_argument(
+    "--sweep-interval",
+    type=float,
+    default=3600,
+    metavar="SECONDS",
+    help="Re-run every check this often, changed or not (default: 3600).",
+  )
+  daemon.add_argument(
+    "--status",
+    action="store_true",
+    help="Print the posture held by a running daemon (findings as NDJSON with --format ndjson) and exit with its exit code; 3 when no daemon answers.",
   )
   return parser.parse_args()
 
 
+def _forwarded_args(args: argparse.Namespace, selected) -> list:
+  """Command line for each fleet target: the check selection and per-check switches."""
+  # History is recorded once, by the fleet runner, not on every target.
+  forwarded = ["--only", ",".join(check.name for check in selected), "--no-history"]
+  if args.full_rescan:
+    forwarded.append("--full-rescan")
+  if args.no_cache:
+    forwarded.append("--no-cache")
+  if args.allowed_ports is not None:
+    forwarded.extend(["--allowed-ports", ",".join(str(port) for port in sorted(args.allowed_ports))])
+  if args.nss_timeout is not None:
+    forwarded.extend(["--nss-accounts", str(args.nss_timeout)])
+  if args.sshd_test:
+    forwarded.append("--sshd-t")
+  if args.jobs > 1:
+    forwarded.extend(["--jobs", str(args.jobs)])
+  governor = _governor_options(args)
+  if governor.nice:
+    forwarded.extend(["--nice", str(governor.nice)])
+  if governor.ionice_idle:
+    forwarded.append("--ionice-idle")
+  if governor.cpu_percent:
+    forwarded.extend(["--cpu-limit", f"{governor.cpu_percent:g}"])
+  if governor.io_bps:
+    forwarded.extend(["--io-limit", str(governor.io_bps)])
+  if governor.scan_rate:
+    forwarded.extend(["--scan-rate", f"{governor.scan_rate:g}"])
+  return forwarded
+
+
+def _governor_options(args: argparse.Namespace):
+  from security_audit.config import GovernorOptions
+
+  gentle = args.gentle
+  return GovernorOptions(
+    nice=args.nice if args.nice is not None else (GENTLE_NICE if gentle else None),
+    ionice_idle=args.ionice_idle or gentle,
+    cpu_percent=args.cpu_limit,
+    io_bps=args.io_limit,
+    scan_rate=args.scan_rate or (GENTLE_SCAN_RATE if gentle else None),
+  )
+
+
+def _history(args: argparse.Namespace):
+  from security_audit.config import history_file
+
+  return None if args.no_history else args.history or history_file()
+
+
+def _run_fleet(args: argparse.Namespace, selected) -> int:
+  from security_audit.config import FleetOptions
+  from security_audit.fleet import read_targets, run_fleet_checks
+
+  try:
+    targets = read_targets(args.fleet)
+  except OSError as exc:
+    print(f"Cannot read targets: {exc}", file=sys.stderr)
+    return 2
+  options = FleetOptions(
+    transport=args.transport,
+    jobs=max(1, args.fleet_jobs),
+    host_timeout=args.host_timeout if args.host_timeout > 0 else None,
+    format=args.format,
+    ndjson_file=args.ndjson,
+    history=_history(args),
+  )
+  return run_fleet_checks(targets, _forwarded_args(args, selected), options, [check.label for check in selected])
+
+
+def _run_images(args: argparse.Namespace, selected) -> int:
+  import os
+
+  from security_audit.config import RunOptions
+  from security_audit.fleet import FleetReport
+  from security_audit.image import audit_images
+
+  offline = [check for check in selected if check.offline]
+  names = [check.name for check in offline]
+  report = FleetReport(args.format, args.ndjson, _history(args), [check.label for check in offline])
+  try:
+    options = RunOptions(allowed_ports=args.allowed_ports)
+    for result in audit_images(args.image, names, options, workers=args.image_jobs or os.cpu_count() or 1):
+      report.add(result)
+  finally:
+    worst = report.close(f"Image summary ({len(args.image)} images)")
+  return worst
+
+
+def _run_daemon(args: argparse.Namespace, selected, options) -> int:
+  from security_audit.config import DaemonOptions
+  from security_audit.daemon import AuditDaemon, DaemonError
+
+  daemon_options = DaemonOptions(socket=args.socket, sweep_interval=max(1.0, args.sweep_interval))
+  try:
+    return AuditDaemon(selected, options, daemon_options).serve()
+  except DaemonError as exc:
+    print(f"Cannot start daemon: {exc}", file=sys.stderr)
+    return 2
+
+
+def _daemon_status(args: argparse.Namespace) -> int:
+  import json
+
+  from security_audit.daemon import STATUS_UNAVAILABLE, DaemonError, default_socket, format_posture, query
+
+  path = args.socket or default_socket()
+  try:
+    posture = json.loads(query(path, "status"))
+    if args.format == "ndjson":
+      sys.stdout.write(query(path, "findings"))
+    else:
+      print(format_posture(posture))
+  except (DaemonError, ValueError) as exc:
+    print(f"Cannot query daemon: {exc}", file=sys.stderr)
+    return STATUS_UNAVAILABLE
+  return posture["exit"]
+
+
+def _dispatch(args: argparse.Namespace, selected) -> int:
+  if args.fleet:
+    return _run_fleet(args, selected)
+  if args.image:
+    return _run_images(args, selected)
+
+  from security_audit.orchestrator import RunOptions, run_checks
+
+  options = RunOptions(
+    jobs=max(1, args.jobs),
+    full_rescan=args.full_rescan,
+    trace=args.trace,
+    format=args.format,
+    ndjson_file=args.ndjson,
+    use_cache=not args.no_cache,
+    sshd_test=args.sshd_test,
+    nss_timeout=args.nss_timeout,
+    allowed_ports=args.allowed_ports,
+    root=args.root,
+    diff_since=args.diff_since,
+  )
+  if args.daemon:
+    return _run_daemon(args, selected, options)
+  options.history = _history(args)
+  return run_checks(checks=selected, options=options)
+
+
 def main() -> int:
   args = parse_args()
+  try:
+    selected = select(args.only, args.skip)
+  except ValueError as exc:
+    names = ", ".join(check.name for check in CHECKS)
+    print(f"{exc} (available: {names})", file=sys.stderr)
+    return 2
   if args.list_checks:
-    for check in DEFAULT_CHECKS:
-      print(f"{check.label}: {check.module}")
+    for check in selected:
+      print(f"{check.name:<12} {check.label}: {check.module}")
     return 0
+  if args.root is not None and (args.fleet or args.image):
+    print("--root audits one root filesystem on this host; for several roots use --fleet with --transport chroot.", file=sys.stderr)
+    return 2
+  if args.diff_since and (args.fleet or args.image or args.daemon or args.status or args.no_history):
+    print("--diff-since applies to single-host runs with history; use `python -m security_audit.history diff` otherwise.", file=sys.stderr)
+    return 2
+  if args.status:
+    return _daemon_status(args)
+
+  from security_audit.governor import start_governor
 
-  return run_checks()
+  # Before any thread or child process exists, so all of them inherit the limits.
+  governor = start_governor(_governor_options(args))
+  if governor is not None and governor.failed:
+    print(f"Resource governor: not applied: {'; '.join(governor.failed)}", file=sys.stderr)
+  try:
+    return _dispatch(args, selected)
+  finally:
+    if governor is not None:
+      governor.release()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from security_audit import debpkg
+
+
+MIRROR = "deb.debian.org_debian_dists"
+SECURITY = "security.debian.org_debian-security_dists"
+
+
+def _stanza(name: str, version: str, extra: str = "") -> str:
+  return f"Package: {name}\nArchitecture: amd64\nVersion: {version}\n{extra}\n"
+
+
+class UpgradableTest(unittest.TestCase):
+  def setUp(self) -> None:
+    self._tmp = tempfile.TemporaryDirectory()
+    self.addCleanup(self._tmp.cleanup)
+    self.root = Path(self._tmp.name)
+    self.lists = self.root / "lists"
+    self.lists.mkdir()
+    self.status = self.root / "status"
+    self.status.write_text(
+      "".join(
+        _stanza(name, version, "Status: install ok installed\n")
+        for name, version in (("curl", "7.88.1-10"), ("openssl", "3.0.11-1"), ("cockpit", "300-1~bpo12+1"), ("vim", "2:9.0.1378-2"))
+      ),
+      encoding="utf-8",
+    )
+    self._suite(MIRROR, "bookworm", "", [("curl", "7.88.1-10"), ("openssl", "3.0.11-1"), ("vim", "2:9.0.1378-2"), ("cockpit", "287-1")])
+    self._suite(SECURITY, "bookworm-security", "", [("openssl", "3.0.13-1~deb12u1")])
+    self._suite(
+      MIRROR,
+      "bookworm-backports",
+      "NotAutomatic: yes\nButAutomaticUpgrades: yes\n",
+      [("curl", "8.5.0-2~bpo12+1"), ("cockpit", "310-1~bpo12+1")],
+    )
+    self._suite(MIRROR, "experimental", "NotAutomatic: yes\n", [("vim", "2:9.1.0-1")])
+
+  def _suite(self, site: str, suite: str, release: str, packages) -> None:
+    prefix = f"{site}_{suite}"
+    (self.lists / f"{prefix}_InRelease").write_text(
+      f"-----BEGIN PGP SIGNED MESSAGE-----\nHash: SHA512\n\nOrigin: Debian\nSuite: {suite}\n{release}SHA256:\n abc 1 main/Packages\n",
+      encoding="utf-8",
+    )
+    text = "".join(_stanza(name, version) for name, version in packages)
+    (self.lists / f"{prefix}_main_binary-amd64_Packages").write_text(text, encoding="utf-8")
+
+  def test_not_automatic_suites_follow_apt_priorities(self) -> None:
+    upgrades = {upgrade.name: upgrade for upgrade in debpkg.upgradable(self.status, self.lists)}
+    # Backports only upgrade what was installed from backports; experimental never.
+    self.assertEqual(sorted(upgrades), ["cockpit", "openssl"])
+    self.assertEqual(upgrades["cockpit"].candidate, "310-1~bpo12+1")
+    self.assertEqual(upgrades["cockpit"].suite, "bookworm-backports")
+    self.assertTrue(upgrades["openssl"].security)
+    self.assertFalse(upgrades["cockpit"].security)
+
+  def test_release_priorities(self) -> None:
+    priorities = {index.suite: index.priority for index in debpkg.package_indexes(self.lists)}
+    self.assertEqual(
+      priorities,
+      {"bookworm": 500, "bookworm-security": 500, "bookworm-backports": 100, "experimental": 1},
+    )
+
+
+if __name__ == "__main__":
+  unittest.main()
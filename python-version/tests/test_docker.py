@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.fixtures import FakeDockerDaemon
+from security_audit.checks import check_docker
+from security_audit.logging_utils import CheckContext, LogBuffer
+
+
+class SocketPermissionsTest(unittest.TestCase):
+  def test_reports_the_socket_from_docker_host(self) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+      path = Path(directory) / "engine.sock"
+      context = CheckContext("Docker", LogBuffer())
+      with FakeDockerDaemon(path, 2), mock.patch.dict(os.environ, {"DOCKER_HOST": f"unix://{path}"}):
+        path.chmod(0o660)
+        asyncio.run(check_docker.run(context))
+    findings = [args[0] for method, args in context.logger.entries if method == "finding"]
+    perms = [finding for finding in findings if "perms" in finding.message]
+    self.assertEqual(len(perms), 1)
+    self.assertTrue(perms[0].message.startswith("engine.sock perms: 0o660 "))
+    self.assertEqual(perms[0].attrs["path"], str(path))
+
+
+if __name__ == "__main__":
+  unittest.main()
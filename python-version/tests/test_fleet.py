@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List, Sequence
+
+from security_audit import fleet
+
+
+# Stands in for the orchestrator: target "noisy" writes an oversized line first.
+SCRIPT = """
+import sys
+if sys.argv[1] == "noisy":
+  sys.stdout.write("x" * (2 << 20))
+  sys.stderr.write("y" * (2 << 20))
+  sys.stdout.flush()
+  sys.stderr.flush()
+  sys.stdout.write("\\n")
+print('{"check": "demo", "severity": "WARN", "message": "ok"}')
+sys.exit(1)
+"""
+
+
+class FakeTransport(fleet.LocalTransport):
+  def command(self, target: str, args: Sequence[str]) -> List[str]:
+    return [sys.executable, "-c", SCRIPT, target]
+
+
+class OversizedRecordTest(unittest.TestCase):
+  def test_oversized_line_does_not_abort_the_fleet(self) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+      transport = FakeTransport(Path(directory))
+
+      async def _run() -> List[fleet.HostResult]:
+        return [result async for result in fleet.run_fleet(["noisy", "quiet"], transport, [], 2, 60)]
+
+      results = {result.target: result for result in asyncio.run(_run())}
+    self.assertEqual(sorted(results), ["noisy", "quiet"])
+    for result in results.values():
+      self.assertEqual(result.exit_code, 1, result.error)
+      self.assertEqual([record["check"] for record in result.records], ["demo"])
+
+
+if __name__ == "__main__":
+  unittest.main()
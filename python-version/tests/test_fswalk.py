@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from security_audit import fswalk
+
+
+class DirIndexTest(unittest.TestCase):
+  def setUp(self) -> None:
+    self._tmp = tempfile.TemporaryDirectory()
+    self.root = Path(self._tmp.name)
+    self.index_path = self.root / "fs_index.json"
+    self.addCleanup(self._tmp.cleanup)
+
+  def _scan(self, targets) -> dict:
+    index = fswalk.DirIndex.load(self.index_path)
+    found = fswalk.scan(targets, index=index)
+    index.save()
+    return found
+
+  def test_chmod_suid_is_reported_despite_index(self) -> None:
+    binary = self.root / "bin" / "sub" / "tool"
+    binary.parent.mkdir(parents=True)
+    binary.write_text("")
+    binary.chmod(0o755)
+    targets = {str(self.root / "bin"): (fswalk.SUID_SGID,)}
+    self.assertEqual(self._scan(targets)["suid_sgid"], [])
+    binary.chmod(0o4755)
+    self.assertEqual(self._scan(targets)["suid_sgid"], [str(binary)])
+
+  def test_chmod_directory_is_reported_from_index(self) -> None:
+    directory = self.root / "tmp" / "a" / "b"
+    directory.mkdir(parents=True)
+    directory.chmod(0o755)
+    targets = {str(self.root / "tmp"): (fswalk.WORLD_WRITABLE,)}
+    self.assertEqual(self._scan(targets)["world_writable"], [])
+    directory.chmod(0o777)
+    index = fswalk.DirIndex.load(self.index_path)
+    self.assertEqual(fswalk.scan(targets, index=index)["world_writable"], [str(directory)])
+    self.assertGreater(index.reused, 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from security_audit import history
+
+
+class QueryPlanTest(unittest.TestCase):
+  def test_time_only_queries_use_the_ts_index(self) -> None:
+    with tempfile.TemporaryDirectory() as directory, history.History(Path(directory) / "history.sqlite3") as store:
+      store.record_run("web1", 1_700_000_000, 1, ["SSH"], [{"check": "SSH", "severity": "WARN", "message": "demo"}])
+      for clause, params in (("", ()), (" WHERE ts >= ?", (0,)), (" WHERE ts >= ? AND ts < ?", (0, 2_000_000_000))):
+        with self.subTest(clause=clause):
+          plan = store.conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT id FROM findings{clause} ORDER BY ts DESC, id DESC LIMIT 100", params
+          ).fetchall()
+          details = " ".join(row[-1] for row in plan)
+          self.assertIn("findings_ts", details)
+          self.assertNotIn("TEMP B-TREE", details)
+      self.assertEqual([finding.message for finding in store.query(since=0)], ["demo"])
+
+
+if __name__ == "__main__":
+  unittest.main()
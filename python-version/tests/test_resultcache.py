@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from security_audit import registry
+from security_audit.config import RunOptions
+from security_audit.facts import HostFacts
+from security_audit.resultcache import ResultCache, _key_value
+
+
+class IncludeKeyTest(unittest.TestCase):
+  def setUp(self) -> None:
+    self._tmp = tempfile.TemporaryDirectory()
+    self.addCleanup(self._tmp.cleanup)
+    self.root = Path(self._tmp.name)
+    patcher = mock.patch.dict(os.environ, {"SECURITY_AUDIT_CACHE_DIR": str(self.root / "cache")})
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def _edit_in_place(self, path: Path, text: str) -> None:
+    # Rewriting an existing file keeps its inode and leaves the directory's mtime alone.
+    before = os.stat(path.parent).st_mtime_ns
+    with path.open("r+", encoding="utf-8") as handle:
+      handle.write(text)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    self.assertEqual(os.stat(path.parent).st_mtime_ns, before)
+
+  def test_sshd_config_drop_in_edit_changes_key(self) -> None:
+    main = self.root / "sshd_config"
+    drop_ins = self.root / "sshd_config.d"
+    drop_ins.mkdir()
+    (drop_ins / "10-root.conf").write_text("PermitRootLogin no\n", encoding="utf-8")
+    main.write_text(f"Include {drop_ins}/*.conf\n", encoding="utf-8")
+    key = f"sshd_config:{main}"
+    before = _key_value(key, HostFacts())
+    self.assertEqual(_key_value(key, HostFacts()), before)
+    self._edit_in_place(drop_ins / "10-root.conf", "PermitRootLogin yes")
+    self.assertNotEqual(_key_value(key, HostFacts()), before)
+
+  def test_sudoers_include_outside_drop_in_dir_changes_key(self) -> None:
+    main = self.root / "sudoers"
+    extra = self.root / "elsewhere" / "ops"
+    extra.parent.mkdir()
+    extra.write_text("ops ALL=(ALL) ALL\n", encoding="utf-8")
+    main.write_text(f"root ALL=(ALL) ALL\n#include {extra}\n", encoding="utf-8")
+    key = f"sudoers:{main}"
+    before = _key_value(key, HostFacts())
+    self.assertEqual(_key_value(key, HostFacts()), before)
+    self._edit_in_place(extra, "ops ALL=NOPASSWD: ALL\n")
+    self.assertNotEqual(_key_value(key, HostFacts()), before)
+
+
+class OptionKeyTest(unittest.TestCase):
+  def test_nss_timeout_is_part_of_the_key(self) -> None:
+    plain = _key_value("option:nss_timeout", HostFacts(), RunOptions())
+    nss = _key_value("option:nss_timeout", HostFacts(), RunOptions(nss_timeout=5))
+    self.assertNotEqual(plain, nss)
+
+  def test_sshd_test_is_part_of_the_key(self) -> None:
+    plain = _key_value("option:sshd_test", HostFacts(), RunOptions())
+    effective = _key_value("option:sshd_test", HostFacts(), RunOptions(sshd_test=True))
+    self.assertNotEqual(plain, effective)
+
+
+class KubernetesKeyTest(unittest.TestCase):
+  def test_new_pod_changes_key(self) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+      root = Path(directory)
+      version = root / "resource-version"
+      version.write_text("100", encoding="utf-8")
+      kubectl = root / "kubectl"
+      kubectl.write_text(
+        f'#!/bin/sh\ncase "$*" in\n  *pods*) printf \'{{"metadata":{{"resourceVersion":"%s"}}}}\' "$(cat {version})";;\n  *) echo demo;;\nesac\n',
+        encoding="utf-8",
+      )
+      kubectl.chmod(0o755)
+      spec = next(spec for spec in registry.CHECKS if spec.label == "Kubernetes")
+      cache = ResultCache(root)
+      with mock.patch.dict(os.environ, {"PATH": f"{root}:{os.environ.get('PATH', '')}", "KUBECONFIG": ""}):
+        before = cache.keys(spec, HostFacts())
+        self.assertEqual(cache.keys(spec, HostFacts()), before)
+        version.write_text("101", encoding="utf-8")
+        self.assertNotEqual(cache.keys(spec, HostFacts()), before)
+
+
+if __name__ == "__main__":
+  unittest.main()
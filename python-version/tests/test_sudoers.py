@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from security_audit import sudoers
+
+
+# line -> (reported as NOPASSWD, principal that may run ALL without a password)
+CORPUS = {
+  "%wheel ALL=NOPASSWD: ALL": (True, "%wheel"),
+  "erin ALL=NOPASSWD:ALL": (True, "erin"),
+  "x ALL=NOPASSWD: EVERYTHING": (True, None),
+  "app ALL=(ALL) NOPASSWD: ALL": (True, "app"),
+  "ops ALL=(root:root) NOPASSWD:ALL": (True, "ops"),
+  "deploy ALL=(ALL) NOPASSWD: /usr/bin/systemctl restart app": (True, None),
+  "root ALL=(ALL:ALL) ALL": (False, None),
+  "%sudo ALL=(ALL) PASSWD: ALL": (False, None),
+  "backup ALL=(ALL) NOPASSWD: /usr/bin/rsync, PASSWD: ALL": (True, None),
+}
+
+
+class SudoersCorpusTest(unittest.TestCase):
+  def _load(self, text: str) -> sudoers.Policy:
+    with tempfile.TemporaryDirectory() as directory:
+      path = Path(directory) / "sudoers"
+      path.write_text(text + "\n", encoding="utf-8")
+      return sudoers.load(path, sudoers.ParseCache())
+
+  def test_corpus(self) -> None:
+    for line, (nopasswd, principal) in CORPUS.items():
+      with self.subTest(line=line):
+        policy = self._load(line)
+        self.assertEqual(bool(policy.nopasswd_rules()), nopasswd)
+        self.assertEqual(list(policy.nopasswd_all()), [principal] if principal else [])
+
+
+if __name__ == "__main__":
+  unittest.main()